@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
 import shutil
-import uuid
 from datetime import datetime
-from app.core.database import get_db
-from app.models.compliance import ComplianceExpediente
-from app.schemas.compliance import ComplianceExpedienteResponse, ComplianceExpedienteCreate, ComplianceExpedienteUpdate
+from app.core.database import get_async_db, get_db
+from app.models.compliance import ComplianceExpediente, ComplianceUpload
+from app.schemas.compliance import (
+    ComplianceExpedienteResponse,
+    ComplianceExpedienteCreate,
+    ComplianceExpedienteUpdate,
+    ComplianceUploadCreate,
+    ComplianceUploadResponse
+)
+from app.services import compliance_uploads, zip_stream
+from app.services.file_delivery import content_disposition
 
 router = APIRouter()
 
-# Directorio base para documentos de cumplimiento
-UPLOAD_DIR = "/Users/jordangonzalez/Downloads/Project Manager/micsa-os/docs/compliance_seil"
-
 @router.post("/", response_model=ComplianceExpedienteResponse, status_code=status.HTTP_201_CREATED)
 def crear_expediente(expediente: ComplianceExpedienteCreate, db: Session = Depends(get_db)):
     db_expediente = ComplianceExpediente(**expediente.dict())
@@ -63,44 +71,238 @@ def actualizar_expediente(id: str, expediente_update: ComplianceExpedienteUpdate
     db.refresh(db_expediente)
     return db_expediente
 
+def _save_file(file: UploadFile, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, 1024 * 1024)
+
+def _registrar_documento(expediente: ComplianceExpediente, category: str, field: str, path: str) -> None:
+    # Copia: reasignar el mismo dict no marca la columna JSON como modificada
+    docs = {k: dict(v or {}) for k, v in (expediente.documents or {}).items()}
+    docs.setdefault(category, {})[field] = path
+    expediente.documents = docs
+
 @router.post("/{id}/upload", response_model=ComplianceExpedienteResponse)
 async def upload_document(
     id: str,
     category: str = Form(...), # e.g., "02_FACTURA"
     field: str = Form(...),    # e.g., "factura_pdf"
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    db_expediente = db.query(ComplianceExpediente).filter(ComplianceExpediente.id == id).first()
+    db_expediente = await db.get(ComplianceExpediente, id, with_for_update=True)
     if not db_expediente:
         raise HTTPException(status_code=404, detail="Expediente no encontrado")
     
-    # Crear carpeta para el expediente si no existe
-    # Estructura: UPLOAD_DIR / OC_XXXXXX / category / filename
-    safe_oc = db_expediente.oc_number.replace("/", "_").replace(" ", "_")
-    folder_path = os.path.join(UPLOAD_DIR, safe_oc, category)
-    os.makedirs(folder_path, exist_ok=True)
-    
-    file_extension = os.path.splitext(file.filename)[1]
-    filename = f"{field}_{uuid.uuid4().hex}{file_extension}"
-    file_path = os.path.join(folder_path, filename)
+    # Estructura: COMPLIANCE_STORAGE_PATH / OC_XXXXXX / category / filename
+    try:
+        file_path = compliance_uploads.destination(db_expediente.oc_number, category, field, file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Escritura en el threadpool: una subida lenta no bloquea el event loop
+    await run_in_threadpool(_save_file, file, file_path)
     
     # Actualizar JSON de documentos
-    docs = db_expediente.documents or {}
-    if category not in docs:
-        docs[category] = {}
-    docs[category][field] = file_path
-    
-    db_expediente.documents = docs
+    _registrar_documento(db_expediente, category, field, file_path)
     # Marcar la fase como lista si todos los documentos requeridos están (esto es lógica del frontend usualmente, pero podemos ayudar)
     
-    db.commit()
-    db.refresh(db_expediente)
+    await db.commit()
+    await db.refresh(db_expediente)
     return db_expediente
 
+# ========== SUBIDAS POR PARTES (REANUDABLES) ==========
+# 1. POST /{id}/uploads abre la subida y devuelve su id.
+# 2. PUT /uploads/{upload_id} con el header Upload-Offset y los bytes desde ese offset
+#    (el archivo completo o partes de chunk_size).
+# 3. Si la conexión se corta, GET /uploads/{upload_id} devuelve el offset confirmado y
+#    se continúa desde ahí. La parte que completa el archivo lo mueve a OC/categoría/.
+
+@router.post("/{id}/uploads", response_model=ComplianceUploadResponse, status_code=status.HTTP_201_CREATED)
+async def iniciar_subida(id: str, datos: ComplianceUploadCreate, db: AsyncSession = Depends(get_async_db)):
+    db_expediente = await db.get(ComplianceExpediente, id)
+    if not db_expediente:
+        raise HTTPException(status_code=404, detail="Expediente no encontrado")
+    try:
+        compliance_uploads.destination(db_expediente.oc_number, datos.category, datos.field, datos.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    await compliance_uploads.purge_stale(db)
+    upload = ComplianceUpload(
+        expediente_id=id,
+        category=datos.category,
+        field=datos.field,
+        filename=datos.filename,
+        size=datos.size,
+        offset=0,
+        sha256_esperado=datos.sha256.lower() if datos.sha256 else None,
+        status="RECIBIENDO"
+    )
+    db.add(upload)
+    await db.commit()
+    await db.refresh(upload)
+    return upload
+
+@router.get("/uploads/{upload_id}", response_model=ComplianceUploadResponse)
+async def estado_subida(upload_id: str, response: Response, db: AsyncSession = Depends(get_async_db)):
+    upload = await db.get(ComplianceUpload, upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+@router.put("/uploads/{upload_id}", response_model=ComplianceUploadResponse)
+async def subir_parte(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    upload = await db.get(ComplianceUpload, upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    if upload.status == "COMPLETADO":
+        raise HTTPException(status_code=409, detail="La subida ya se completó")
+    if upload_offset != upload.offset:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Offset incorrecto: la subida continúa desde el byte {upload.offset}",
+            headers={"Upload-Offset": str(upload.offset)}
+        )
+    # Reclamar la subida en la base antes de tocar el archivo parcial: un solo escritor
+    # entre todos los workers. El commit además suelta la conexión mientras llegan los bytes.
+    token = await compliance_uploads.claim(db, upload_id, upload_offset)
+    if token is None:
+        raise HTTPException(status_code=409, detail="Ya se está recibiendo una parte de esta subida")
+    try:
+        try:
+            offset, desconectado = await compliance_uploads.append(
+                upload, upload_offset, compliance_uploads.renewing(db, upload_id, token, request.stream())
+            )
+        except compliance_uploads.UploadTooLarge:
+            raise HTTPException(status_code=413, detail="La parte excede el tamaño declarado del archivo")
+        except compliance_uploads.ClaimLost:
+            raise HTTPException(status_code=409, detail="La subida cambió mientras se recibía esta parte")
+        except ValueError:
+            await db.execute(
+                update(ComplianceUpload)
+                .where(ComplianceUpload.id == upload_id, ComplianceUpload.recibiendo_por == token)
+                .values(offset=0)
+            )
+            await db.commit()
+            raise HTTPException(
+                status_code=409,
+                detail="Se perdió el archivo parcial; reinicia la subida desde el byte 0",
+                headers={"Upload-Offset": "0"}
+            )
+        
+        # Condicional: solo avanza quien todavía tiene la subida reclamada
+        result = await db.execute(
+            update(ComplianceUpload)
+            .where(
+                ComplianceUpload.id == upload_id,
+                ComplianceUpload.offset == upload_offset,
+                ComplianceUpload.recibiendo_por == token,
+            )
+            .values(offset=offset)
+        )
+        if result.rowcount != 1:
+            await db.rollback()
+            raise HTTPException(status_code=409, detail="La subida cambió mientras se recibía esta parte")
+        await db.commit()
+        upload.offset = offset
+        
+        if offset == upload.size and not desconectado:
+            await _completar_subida(db, upload)
+    finally:
+        await compliance_uploads.release(db, upload_id, token)
+    
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+async def _completar_subida(db: AsyncSession, upload: ComplianceUpload) -> None:
+    digest = await compliance_uploads.digest_of(upload)
+    if upload.sha256_esperado and digest != upload.sha256_esperado:
+        await compliance_uploads.discard_part(upload.id)
+        await db.execute(update(ComplianceUpload).where(ComplianceUpload.id == upload.id).values(offset=0))
+        await db.commit()
+        raise HTTPException(
+            status_code=422,
+            detail="El SHA-256 del archivo recibido no coincide; la subida se reinició",
+            headers={"Upload-Offset": "0"}
+        )
+    
+    db_expediente = await db.get(ComplianceExpediente, upload.expediente_id, with_for_update=True)
+    if not db_expediente:
+        raise HTTPException(status_code=404, detail="Expediente no encontrado")
+    file_path = compliance_uploads.destination(db_expediente.oc_number, upload.category, upload.field, upload.filename)
+    await compliance_uploads.move_into_place(upload, file_path)
+    
+    _registrar_documento(db_expediente, upload.category, upload.field, file_path)
+    upload.status = "COMPLETADO"
+    upload.sha256 = digest
+    upload.file_path = file_path
+    await db.commit()
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancelar_subida(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+    upload = await db.get(ComplianceUpload, upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    if upload.status != "COMPLETADO":
+        await compliance_uploads.discard_part(upload_id)
+    await db.delete(upload)
+    await db.commit()
+
+# ========== PAQUETE ZIP ==========
+
+def _miembros_paquete(archivos: List[Tuple[str, str]]) -> List[zip_stream.ZipMember]:
+    """Solo entran archivos dentro de la raíz de cumplimiento (o una raíz anterior
+    permitida); cualquier otra ruta guardada en documents se omite."""
+    permitidos = []
+    for path, arcname in archivos:
+        real = compliance_uploads.stored_path(path)
+        if real is not None:
+            permitidos.append((real, arcname))
+    return zip_stream.members_for(permitidos)
+
+@router.get("/{id}/package.zip")
+async def descargar_paquete(id: str, db: AsyncSession = Depends(get_async_db)):
+    """ZIP con todos los documentos del expediente por categoría, generado al vuelo"""
+    db_expediente = await db.get(ComplianceExpediente, id)
+    if not db_expediente:
+        raise HTTPException(status_code=404, detail="Expediente no encontrado")
+    
+    archivos = []
+    for category, fields in sorted((db_expediente.documents or {}).items()):
+        if not isinstance(fields, dict):
+            continue
+        for field, path in sorted(fields.items()):
+            if not isinstance(path, str) or not path:
+                continue
+            try:
+                archivos.append((path, f"{compliance_uploads.safe_segment(category)}/{os.path.basename(path)}"))
+            except ValueError:
+                continue
+    safe_oc = db_expediente.oc_number.replace("/", "_").replace(" ", "_")
+    # El envío puede tardar minutos: no retener la conexión a la base de datos
+    await db.commit()
+    
+    members = await run_in_threadpool(_miembros_paquete, archivos)
+    if not members:
+        raise HTTPException(status_code=404, detail="El expediente no tiene documentos cargados")
+    
+    return StreamingResponse(
+        zip_stream.stream_zip(members),
+        media_type="application/zip",
+        headers={
+            "Content-Length": str(zip_stream.content_length(members)),
+            "Content-Disposition": content_disposition(f"expediente_{safe_oc}.zip")
+        }
+    )
+
 @router.post("/{id}/send", response_model=ComplianceExpedienteResponse)
 def enviar_expediente(id: str, db: Session = Depends(get_db)):
     db_expediente = db.query(ComplianceExpediente).filter(ComplianceExpediente.id == id).first()
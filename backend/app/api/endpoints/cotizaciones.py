@@ -1,39 +1,42 @@
 # MICSA OS - Cotización Endpoints
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import insert
+from typing import Dict, Any, Optional, Union
+from datetime import date, datetime, time
+import uuid
 from app.core.database import get_db
 from app.models.cotizacion import Cotizacion
-from app.models.epp import EppItem
-from app.schemas.cotizacion import QuoteCreate, QuoteResponse
+from app.schemas.cotizacion import (
+    QuoteCreate, QuoteResponse, QuoteBatchCreate, QuoteBatchResponse, QuoteSweepRequest,
+    QuoteSimulationSpec, QuoteSimulationRequest, GoalSeekRequest
+)
 from app.services.calculator import QuotationCalculator
-from app.core.config import settings
+from app.services.batch_calculator import BatchQuotationCalculator
+from app.services.sweep import check_grid_size, sweep_grid, iter_sweep_ndjson, SweepTooLarge
+from app.services.simulation import simulate_margin
+from app.services.goal_seek import GoalSeeker, GoalSeekError
+from app.services.pricing_rules import get_active_rules, get_rules_version
+from app.services.epp_catalog import get_epp_catalog
+from app.services.quote_cache import cached_compute, quote_cache
+from app.services.dashboard_snapshot import record_bulk_quotes
+from app.services.kpi_rollups import record_bulk_quote_rollups
+from app.services.change_bus import mark_changed
+from app.services.quote_listing import parse_fields, list_quote_rows, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.quote_patch import merge_quote_input, changed_fields, json_changes
 
 router = APIRouter()
 
-# Default rules as seen in reproduce_issue.js
-DEFAULT_RULES = {
-    "labor": {"weekly": 6489.25, "weeksMonth": 4},
-    "welding": {"per10Month": {"cost": 18446.96, "price": 21213}},
-    "weldingConsumablesPerWelderMonth": 3800,
-    "dc3": {"sell": 500, "package": 1500, "cost": 100},
-    "medical": {"cost": 250, "sell": 350},
-    "managementPct": 0.15,
-    "platformPM": {"feePerPersonMonth": 180},
-    "iso": {"feePerProjectMonth": 3500},
-    "commercialization": {"defaultMarginPct": 0.20},
-    "epp": {"markupPct": 0.25, "workingDaysMonth": 26}
-}
-
 @router.post("/", response_model=QuoteResponse, status_code=status.HTTP_201_CREATED)
 def create_quote(quote_in: QuoteCreate, db: Session = Depends(get_db)):
-    # 1. Fetch EPP catalog for calculation
-    epp_items = db.query(EppItem).all()
-    catalog_epp = {it.sku: it for it in epp_items}
+    # 1. EPP catalog for calculation (cached per process, reloaded when its version changes)
+    catalog = get_epp_catalog(db)
     
-    # 2. Run calculator
-    calc = QuotationCalculator(rules=DEFAULT_RULES, catalog_epp=catalog_epp)
-    result = calc.compute(quote_in.dict())
+    # 2. Run calculator with the active (cached, compiled) rule set; identical inputs hit the cache
+    rules = get_active_rules(db)
+    calc = QuotationCalculator(rules=rules, catalog_epp=catalog.items)
+    result = cached_compute(db, calc, quote_in.dict(), catalog.version)
     
     # 3. Save to DB
     db_quote = Cotizacion(
@@ -48,6 +51,7 @@ def create_quote(quote_in: QuoteCreate, db: Session = Depends(get_db)):
         subtotal=result["totals"]["subtotal"],
         iva=result["totals"]["iva"],
         total=result["totals"]["total"],
+        rules_version=rules.version,
         status="DRAFT"
     )
     db.add(db_quote)
@@ -62,6 +66,7 @@ def create_quote(quote_in: QuoteCreate, db: Session = Depends(get_db)):
         "input_data": db_quote.input_data,
         "clientQuote": db_quote.client_quote,
         "internal_data": db_quote.internal_data,
+        "rules_version": db_quote.rules_version,
         "totals": {
             "subtotal": db_quote.subtotal,
             "iva": db_quote.iva,
@@ -69,26 +74,240 @@ def create_quote(quote_in: QuoteCreate, db: Session = Depends(get_db)):
         }
     }
 
-@router.get("/", response_model=List[QuoteResponse])
-def list_quotes(db: Session = Depends(get_db)):
-    quotes = db.query(Cotizacion).all()
-    # Need to map to schema because DB fields names slightly differ from schema names
-    results = []
-    for q in quotes:
-        results.append({
-            "id": q.id,
-            "createdAt": q.created_at,
-            "status": q.status,
-            "input_data": q.input_data,
-            "clientQuote": q.client_quote,
-            "internal_data": q.internal_data,
-            "totals": {
-                "subtotal": q.subtotal,
-                "iva": q.iva,
-                "total": q.total
-            }
+@router.post("/preview")
+def preview_quote(quote_in: QuoteCreate, db: Session = Depends(get_db)):
+    """Price a quote without saving it (live estimator)"""
+    catalog = get_epp_catalog(db)
+    calc = QuotationCalculator(rules=get_active_rules(db), catalog_epp=catalog.items)
+    result = cached_compute(db, calc, quote_in.dict(), catalog.version)
+    db.commit()
+    return result
+
+@router.get("/cache/stats")
+def get_quote_cache_stats():
+    return quote_cache.stats()
+
+@router.post("/batch", response_model=QuoteBatchResponse, status_code=status.HTTP_201_CREATED)
+def create_quotes_batch(batch: QuoteBatchCreate, db: Session = Depends(get_db)):
+    catalog_epp = get_epp_catalog(db).items
+
+    # One columnar pass over every variant (same results as compute())
+    inputs = [q.dict() for q in batch.quotes]
+    rules = get_active_rules(db)
+    calc = BatchQuotationCalculator(rules=rules, catalog_epp=catalog_epp)
+    results = calc.compute_many(inputs)
+
+    rows = []
+    for quote_in, data, result in zip(batch.quotes, inputs, results):
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "nombre_proyecto": quote_in.projectName,
+            "ubicacion": quote_in.location,
+            "tipo_trabajo": quote_in.workType,
+            "duracion_meses": quote_in.durationMonths,
+            "condiciones_pago": quote_in.paymentTerms,
+            "input_data": data,
+            "client_quote": result["clientQuote"],
+            "internal_data": result["internal"],
+            "subtotal": result["totals"]["subtotal"],
+            "iva": result["totals"]["iva"],
+            "total": result["totals"]["total"],
+            "rules_version": rules.version,
+            "status": "DRAFT"
         })
-    return results
+
+    # Single bulk INSERT (executemany) instead of one flush per ORM object
+    db.execute(insert(Cotizacion), rows)
+    record_bulk_quotes(db, rows)
+    record_bulk_quote_rollups(db, rows)
+    mark_changed(db, "quotes")
+    db.commit()
+
+    return {
+        "count": len(rows),
+        "quotes": [
+            {"id": row["id"], "projectName": row["nombre_proyecto"], "totals": result["totals"]}
+            for row, result in zip(rows, results)
+        ]
+    }
+
+@router.post("/sweep")
+def sweep_quote(req: QuoteSweepRequest, db: Session = Depends(get_db)):
+    """Grid of subtotal/total/marginPct for every combination of the given ranges (NDJSON stream)"""
+    catalog_epp = get_epp_catalog(db).items
+
+    try:
+        ranges = [(f"peopleByRole.{role}", rng) for role, rng in req.peopleByRole.items()]
+        for name in ("durationMonths", "weldersCount", "managementPct", "eppMarkupPct"):
+            rng = getattr(req, name)
+            if rng is not None:
+                ranges.append((name, rng))
+        # Tamaño de la malla antes de construir cualquier eje
+        check_grid_size(rng.count() for _, rng in ranges)
+        axes = [(name, rng.expand()) for name, rng in ranges]
+        calc = BatchQuotationCalculator(rules=get_active_rules(db), catalog_epp=catalog_epp)
+        grid = sweep_grid(calc, req.base.dict(), axes)
+    except (ValueError, SweepTooLarge) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return StreamingResponse(
+        iter_sweep_ndjson(grid),
+        media_type="application/x-ndjson",
+        headers={"X-Sweep-Cells": str(len(grid["total"]))}
+    )
+
+@router.post("/simulate")
+def simulate_quote(req: QuoteSimulationRequest, db: Session = Depends(get_db)):
+    """Monte Carlo margin risk for an unsaved quote (live estimator)"""
+    catalog_epp = get_epp_catalog(db).items
+
+    calc = BatchQuotationCalculator(rules=get_active_rules(db), catalog_epp=catalog_epp)
+    try:
+        return simulate_margin(calc, req.base.dict(), req.distributions(), draws=req.draws, seed=req.seed)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=422, detail=f"Distribución inválida: {e}")
+
+@router.post("/goal-seek")
+def goal_seek_quote(req: GoalSeekRequest, db: Session = Depends(get_db)):
+    """Value of one lever (all other inputs fixed) that hits each target total/subtotal/marginPct"""
+    catalog_epp = get_epp_catalog(db).items
+
+    calc = BatchQuotationCalculator(rules=get_active_rules(db), catalog_epp=catalog_epp)
+    try:
+        results = GoalSeeker(calc, req.base.dict()).solve(
+            req.lever, req.metric, req.targets, bounds=tuple(req.bounds) if req.bounds else None
+        )
+    except GoalSeekError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"lever": req.lever, "metric": req.metric, "results": results}
+
+@router.post("/{quote_id}/simulate")
+def simulate_saved_quote(quote_id: str, spec: QuoteSimulationSpec, db: Session = Depends(get_db)):
+    """Monte Carlo margin risk for a saved quote; the result is stored in simulation_data"""
+    q = db.query(Cotizacion).filter(Cotizacion.id == quote_id).first()
+    if not q:
+        raise HTTPException(status_code=404, detail="Quotation not found")
+
+    catalog_epp = get_epp_catalog(db).items
+
+    calc = BatchQuotationCalculator(rules=get_rules_version(db, q.rules_version), catalog_epp=catalog_epp)
+    try:
+        result = simulate_margin(calc, q.input_data, spec.distributions(), draws=spec.draws,
+                                 seed=spec.seed, quoted_subtotal=q.subtotal)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=422, detail=f"Distribución inválida: {e}")
+
+    q.simulation_data = result
+    db.commit()
+    return result
+
+# input field -> Cotizacion column mirrored from it
+HEADER_COLUMNS = {
+    "projectName": "nombre_proyecto",
+    "location": "ubicacion",
+    "workType": "tipo_trabajo",
+    "durationMonths": "duracion_meses",
+    "paymentTerms": "condiciones_pago",
+}
+
+@router.patch("/{quote_id}")
+def patch_quote(quote_id: str, patch: Dict[str, Any], db: Session = Depends(get_db)):
+    """Apply a partial input diff. Only the divisions that depend on the changed fields are
+    recomputed (EPP and commercialization lines are reused otherwise) and only the columns
+    whose content changed are written. Returns the changed JSON paths."""
+    q = db.query(Cotizacion).filter(Cotizacion.id == quote_id).first()
+    if not q:
+        raise HTTPException(status_code=404, detail="Quotation not found")
+
+    try:
+        new_input = QuoteCreate(**merge_quote_input(q.input_data, patch)).dict()
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    fields = changed_fields(q.input_data, new_input)
+    if not fields:
+        return {"id": q.id, "changedFields": [], "changes": []}
+
+    try:
+        rules = get_rules_version(db, q.rules_version)
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    calc = QuotationCalculator(rules=rules, catalog_epp=get_epp_catalog(db).items)
+    result = calc.recompute(new_input, q.internal_data or {}, set(fields))
+
+    current = {
+        "input_data": q.input_data,
+        "client_quote": q.client_quote,
+        "internal_data": q.internal_data,
+        "totals": {"subtotal": q.subtotal, "iva": q.iva, "total": q.total},
+    }
+    updated = {
+        "input_data": new_input,
+        "client_quote": result["clientQuote"],
+        "internal_data": result["internal"],
+        "totals": result["totals"],
+    }
+
+    changes = []
+    for column, new_value in updated.items():
+        diff = json_changes(current[column], new_value, column)
+        if not diff:
+            continue
+        changes.extend(diff)
+        if column == "totals":
+            for key, value in new_value.items():
+                setattr(q, key, value)
+        else:
+            # JSON columns are rewritten whole only when something inside them changed
+            setattr(q, column, new_value)
+    for field in fields:
+        if field in HEADER_COLUMNS:
+            setattr(q, HEADER_COLUMNS[field], new_input[field])
+    db.commit()
+
+    return {
+        "id": q.id,
+        "changedFields": sorted(fields),
+        "changes": [{"path": path, "value": value} for path, value in changes],
+    }
+
+@router.get("/")
+def list_quotes(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    cliente_id: Optional[str] = None,
+    desde: Optional[Union[datetime, date]] = None,
+    hasta: Optional[Union[datetime, date]] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Cotizaciones, más recientes primero. Sin `limit` ni `cursor` se devuelven todas, como
+    siempre. Con `limit` (o `cursor`) se pagina por cursor: la siguiente página se pide
+    con el valor del header X-Next-Cursor. `fields` (ej. "id,status,totals") limita
+    las columnas leídas; sin él se devuelve la respuesta completa. El rango es
+    desde <= created_at < hasta.
+    """
+    # A bare date means midnight
+    if desde is not None and not isinstance(desde, datetime):
+        desde = datetime.combine(desde, time.min)
+    if hasta is not None and not isinstance(hasta, datetime):
+        hasta = datetime.combine(hasta, time.min)
+    try:
+        selected = parse_fields(fields)
+        if limit is None and cursor is not None:
+            limit = DEFAULT_PAGE_SIZE
+        items, next_cursor = list_quote_rows(
+            db, selected, limit, cursor=cursor, status=status_filter,
+            cliente_id=cliente_id, desde=desde, hasta=hasta
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 @router.get("/{quote_id}", response_model=QuoteResponse)
 def get_quote(quote_id: str, db: Session = Depends(get_db)):
@@ -102,6 +321,8 @@ def get_quote(quote_id: str, db: Session = Depends(get_db)):
         "input_data": q.input_data,
         "clientQuote": q.client_quote,
         "internal_data": q.internal_data,
+        "simulation_data": q.simulation_data,
+        "rules_version": q.rules_version,
         "totals": {
             "subtotal": q.subtotal,
             "iva": q.iva,
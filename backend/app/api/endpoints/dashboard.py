@@ -1,41 +1,58 @@
 # MICSA OS - Dashboard Endpoints
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import List, Optional
+from datetime import date
 from app.core.database import get_db
-from app.models.cotizacion import Cotizacion
-from app.models.proyecto import Proyecto, FirmaRequest
+from app.services.dashboard_snapshot import get_dashboard_snapshot, rebuild_dashboard_snapshot, ceo_kpis
+from app.services.kpi_rollups import get_trends
+from app.services.live_dashboard import live_dashboard
 
-from app.schemas.dashboard import CEODashboardResponse
+from app.schemas.dashboard import CEODashboardResponse, TrendPoint
 
 router = APIRouter()
 
 @router.get("/ceo", response_model=CEODashboardResponse)
 def get_ceo_dashboard(db: Session = Depends(get_db)):
-    total_cotizado = db.query(func.sum(Cotizacion.total)).scalar() or 0
-    # Utilidad is stored in internal_data JSON, harder to sum in SQL directly with SQLite easily
-    # Let's do a simple loop for now or store it as a column if needed
-    quotes = db.query(Cotizacion).all()
-    total_utilidad = sum([q.internal_data.get("totals", {}).get("grossProfitBeforeIva", 0) for q in quotes if q.internal_data])
-    
-    proyectos_activos = db.query(Proyecto).filter(Proyecto.status == "ACTIVE").count()
-    proyectos_cerrados = db.query(Proyecto).filter(Proyecto.status == "CLOSED").count()
-    
-    # Cierres bloqueados: proyectos activos con firmas pendientes
-    proyectos = db.query(Proyecto).filter(Proyecto.status == "ACTIVE").all()
-    cierres_bloqueados = 0
-    for p in proyectos:
-        pending = db.query(FirmaRequest).filter(FirmaRequest.proyecto_id == p.id, FirmaRequest.status == "PENDING").count()
-        if pending > 0:
-            cierres_bloqueados += 1
+    # Materialized snapshot, kept current by session events (see services/dashboard_snapshot.py)
+    return ceo_kpis(get_dashboard_snapshot(db))
 
-    return {
-        "quotes": len(quotes),
-        "projects": proyectos_activos + proyectos_cerrados,
-        "proyectosActivos": proyectos_activos,
-        "proyectosCerrados": proyectos_cerrados,
-        "totalCotizado": round(total_cotizado, 2),
-        "totalUtilidad": round(total_utilidad, 2),
-        "marginPromedio": round((total_utilidad / total_cotizado * 100), 2) if total_cotizado > 0 else 0.0,
-        "cierresBloqueados": cierres_bloqueados
-    }
+@router.post("/ceo/rebuild", response_model=CEODashboardResponse)
+def rebuild_ceo_dashboard(db: Session = Depends(get_db)):
+    """Reconstruye el snapshot desde las tablas fuente"""
+    snapshot = rebuild_dashboard_snapshot(db)
+    db.commit()
+    return ceo_kpis(snapshot)
+
+@router.get("/trends", response_model=List[TrendPoint])
+def get_dashboard_trends(
+    period: str = "month",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    status: Optional[str] = None,
+    cliente_id: Optional[str] = None,
+    group_by: Optional[str] = Query(None, description="status | cliente"),
+    db: Session = Depends(get_db)
+):
+    """
+    Tendencias por mes o semana (UTC). Solo lee las tablas de rollups
+    (reconstruibles con rebuild_kpi_rollups.py).
+    """
+    try:
+        return get_trends(db, period=period, desde=desde, hasta=hasta, status=status,
+                          cliente_id=cliente_id, group_by=group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/stream")
+async def stream_dashboard():
+    """
+    KPIs en vivo (Server-Sent Events): un evento `snapshot` al conectar y luego
+    eventos `delta` con solo los valores que cambiaron (secciones ceo, firmas, compliance).
+    """
+    return StreamingResponse(
+        live_dashboard.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
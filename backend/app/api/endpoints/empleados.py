@@ -5,6 +5,7 @@ from typing import List, Optional
 from app.core.database import get_db
 from app.models.empleado import Empleado, EmpleadoDocumento
 from app.schemas.empleado import Empleado as EmpleadoSchema, EmpleadoCreate, EmpleadoUpdate, EmpleadoStats
+from app.services.stats import get_stats
 
 router = APIRouter()
 
@@ -30,19 +31,7 @@ def listar_empleados(
 
 @router.get("/stats", response_model=EmpleadoStats)
 def obtener_estadisticas_empleados(db: Session = Depends(get_db)):
-    total = db.query(Empleado).count()
-    activos = db.query(Empleado).filter(Empleado.activo == True).count()
-    en_proyectos = db.query(Empleado).filter(Empleado.proyecto_id != None).count()
-    repse_rojo = db.query(Empleado).filter(Empleado.estatus_repse == "ROJO").count()
-    repse_amarillo = db.query(Empleado).filter(Empleado.estatus_repse == "AMARILLO").count()
-    
-    return {
-        "total_empleados": total,
-        "empleados_activos": activos,
-        "empleados_en_proyectos": en_proyectos,
-        "alertas_repse_rojo": repse_rojo,
-        "alertas_repse_amarillo": repse_amarillo
-    }
+    return get_stats("empleados", db)
 
 @router.get("/{id}", response_model=EmpleadoSchema)
 def obtener_empleado(id: str, db: Session = Depends(get_db)):
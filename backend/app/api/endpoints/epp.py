@@ -5,6 +5,7 @@ from typing import List, Dict
 from pydantic import BaseModel
 from app.core.database import get_db
 from app.models.epp import EppItem
+from app.services.epp_catalog import bump_epp_catalog_version
 
 router = APIRouter()
 
@@ -32,5 +33,7 @@ def upsert_epp(data: EppUpsert, db: Session = Depends(get_db)):
         else:
             db_item = EppItem(**item.dict())
             db.add(db_item)
+    # Workers reload their cached catalog on the next quote
+    bump_epp_catalog_version(db)
     db.commit()
     return {"ok": True, "count": len(data.items)}
@@ -1,14 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+from typing import List, Optional
 import os
 import uuid
 import shutil
 from datetime import datetime
 import base64
+import zipfile
 
-from app.core.database import get_db
-from app.models.firma_electronica import DocumentoFirma, Firmante, HistorialFirma
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.models.firma_electronica import DocumentoFirma, Firmante, HistorialFirma, LoteFirma
+from app.services.blob_store import decode_base64_image, media_type, signature_blobs
+from app.services.change_bus import mark_changed
+from app.services.file_delivery import file_response, save_hashed, sha256_file
+from app.services.firma_expiration import is_expired
+from app.services.firma_lotes import missing_files, parse_manifest, process_lote
+from app.services.firma_signing import add_history, count_signature, mark_signed
+from app.services.notification_templates import enqueue_template
+from app.services.signed_pdf import signed_pdf_engine
+from app.services.stats import get_stats
 from app.schemas.firma_electronica import (
     DocumentoFirmaCreate,
     DocumentoFirmaResponse,
@@ -16,52 +30,52 @@ from app.schemas.firma_electronica import (
     DocumentoFirmaStats,
     DocumentoPublicoResponse,
     FirmaData,
-    FirmanteResponse
+    FirmanteResponse,
+    LoteFirmaResponse
 )
 
+# Endpoints async sobre AsyncSession (get_async_db): las consultas no bloquean el event
+# loop y la escritura de archivos va al threadpool. Los servicios síncronos (stats,
+# plantillas, UPDATEs de firma) corren sobre la misma conexión con db.run_sync.
+# Un servicio llamado con run_sync no debe consultar la base con un threading.Lock tomado.
 router = APIRouter()
 
 UPLOAD_DIR = "docs/firmas_electronicas"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+async def _load_documento(db: AsyncSession, documento_id: str) -> Optional[DocumentoFirma]:
+    """Documento con sus firmantes ya cargados (la respuesta no puede hacer lazy loads)"""
+    result = await db.execute(
+        select(DocumentoFirma)
+        .options(selectinload(DocumentoFirma.firmantes))
+        .where(DocumentoFirma.id == documento_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalar_one_or_none()
+
+
 # ========== ENDPOINTS ADMINISTRATIVOS ==========
 
 @router.get("/stats", response_model=DocumentoFirmaStats)
-async def get_firma_stats(db: Session = Depends(get_db)):
+async def get_firma_stats(db: AsyncSession = Depends(get_async_db)):
     """Obtener estadísticas del sistema de firmas"""
-    total = db.query(DocumentoFirma).count()
-    pendientes = db.query(DocumentoFirma).filter(DocumentoFirma.status == "PENDIENTE").count()
-    en_proceso = db.query(DocumentoFirma).filter(DocumentoFirma.status == "EN_PROCESO").count()
-    completados = db.query(DocumentoFirma).filter(DocumentoFirma.status == "COMPLETADO").count()
-    cancelados = db.query(DocumentoFirma).filter(DocumentoFirma.status == "CANCELADO").count()
-    
-    firmantes_pendientes = db.query(Firmante).filter(Firmante.status.in_(["PENDIENTE", "NOTIFICADO"])).count()
-    firmantes_completados = db.query(Firmante).filter(Firmante.status == "FIRMADO").count()
-    
-    return DocumentoFirmaStats(
-        total_documentos=total,
-        pendientes=pendientes,
-        en_proceso=en_proceso,
-        completados=completados,
-        cancelados=cancelados,
-        firmantes_pendientes=firmantes_pendientes,
-        firmantes_completados=firmantes_completados
-    )
+    return DocumentoFirmaStats(**await db.run_sync(lambda session: get_stats("firmas", session)))
 
 
 @router.get("/", response_model=List[DocumentoFirmaResponse])
 async def list_documentos(
     status: str = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Listar todos los documentos de firma"""
-    query = db.query(DocumentoFirma)
+    # Firmantes in one extra query instead of one per document
+    query = select(DocumentoFirma).options(selectinload(DocumentoFirma.firmantes))
     if status:
-        query = query.filter(DocumentoFirma.status == status)
+        query = query.where(DocumentoFirma.status == status)
     
-    docs = query.order_by(DocumentoFirma.created_at.desc()).all()
-    return docs
+    result = await db.execute(query.order_by(DocumentoFirma.created_at.desc()))
+    return result.scalars().all()
 
 
 @router.post("/", response_model=DocumentoFirmaResponse)
@@ -73,7 +87,7 @@ async def create_documento(
     requiere_orden: bool = False,
     firmantes_json: str = "[]",  # JSON string de firmantes
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crear un nuevo documento para firma"""
     import json
@@ -84,8 +98,7 @@ async def create_documento(
     filename = f"{doc_id}_original{file_ext}"
     filepath = os.path.join(UPLOAD_DIR, filename)
     
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    archivo_sha256 = await run_in_threadpool(save_hashed, file.file, filepath)
     
     # Parsear firmantes
     firmantes_data = json.loads(firmantes_json)
@@ -99,6 +112,7 @@ async def create_documento(
         proyecto_id=proyecto_id,
         requiere_orden=requiere_orden,
         archivo_pdf=filepath,
+        archivo_sha256=archivo_sha256,
         total_firmantes=len(firmantes_data),
         status="PENDIENTE"
     )
@@ -125,16 +139,70 @@ async def create_documento(
     )
     db.add(historial)
     
-    db.commit()
-    db.refresh(documento)
+    await db.commit()
+    
+    return await _load_documento(db, doc_id)
+
+
+def _save_upload(file: UploadFile, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer, 1024 * 1024)
+
+
+@router.post("/lotes", response_model=LoteFirmaResponse, status_code=202)
+async def create_lote(
+    background_tasks: BackgroundTasks,
+    archivo_zip: UploadFile = File(...),
+    manifiesto: UploadFile = File(...),
+    tipo_documento: str = Form(None),
+    proyecto_id: str = Form(None),
+    requiere_orden: bool = Form(False),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Crear documentos de firma en lote (ZIP de PDFs + manifiesto CSV/JSON de firmantes)"""
+    try:
+        entries = parse_manifest(manifiesto.filename or "", await manifiesto.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    lote = LoteFirma(id=str(uuid.uuid4()), total=len(entries), procesados=0, creados=0, errores=[])
+    zip_path = os.path.join(UPLOAD_DIR, "lotes", f"{lote.id}.zip")
+    await run_in_threadpool(_save_upload, archivo_zip, zip_path)
+    try:
+        faltantes = await run_in_threadpool(missing_files, zip_path, entries)
+    except zipfile.BadZipFile:
+        os.remove(zip_path)
+        raise HTTPException(status_code=400, detail="El archivo no es un ZIP válido")
+    if faltantes:
+        os.remove(zip_path)
+        raise HTTPException(
+            status_code=400,
+            detail=f"Archivos del manifiesto que no están en el ZIP: {', '.join(faltantes[:20])}"
+        )
+    
+    db.add(lote)
+    await db.commit()
+    await db.refresh(lote)
     
-    return documento
+    options = {"tipo_documento": tipo_documento, "proyecto_id": proyecto_id, "requiere_orden": requiere_orden}
+    background_tasks.add_task(process_lote, lote.id, zip_path, entries, options, UPLOAD_DIR)
+    return lote
+
+
+@router.get("/lotes/{lote_id}", response_model=LoteFirmaResponse)
+async def get_lote(lote_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Progreso de una creación en lote"""
+    lote = await db.get(LoteFirma, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote no encontrado")
+    return lote
 
 
 @router.get("/{documento_id}", response_model=DocumentoFirmaResponse)
-async def get_documento(documento_id: str, db: Session = Depends(get_db)):
+async def get_documento(documento_id: str, db: AsyncSession = Depends(get_async_db)):
     """Obtener detalles de un documento"""
-    doc = db.query(DocumentoFirma).filter(DocumentoFirma.id == documento_id).first()
+    doc = await _load_documento(db, documento_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     return doc
@@ -144,10 +212,10 @@ async def get_documento(documento_id: str, db: Session = Depends(get_db)):
 async def update_documento(
     documento_id: str,
     update: DocumentoFirmaUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualizar un documento"""
-    doc = db.query(DocumentoFirma).filter(DocumentoFirma.id == documento_id).first()
+    doc = await _load_documento(db, documento_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     
@@ -155,45 +223,59 @@ async def update_documento(
         setattr(doc, key, value)
     
     doc.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(doc)
+    await db.commit()
     
-    return doc
+    return await _load_documento(db, documento_id)
 
 
 @router.post("/{documento_id}/notify")
-async def notify_firmantes(documento_id: str, db: Session = Depends(get_db)):
+async def notify_firmantes(documento_id: str, db: AsyncSession = Depends(get_async_db)):
     """Enviar notificaciones a todos los firmantes pendientes"""
-    doc = db.query(DocumentoFirma).filter(DocumentoFirma.id == documento_id).first()
+    doc = await db.get(DocumentoFirma, documento_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     
-    firmantes = db.query(Firmante).filter(
-        Firmante.documento_id == documento_id,
-        Firmante.status == "PENDIENTE"
-    ).all()
-    
-    notificados = 0
-    for firmante in firmantes:
-        # TODO: Integrar con servicio de email
-        # send_email(firmante.email, f"http://localhost:3001/firmar/{firmante.token_acceso}")
-        
-        firmante.status = "NOTIFICADO"
-        firmante.notificado_at = datetime.utcnow()
-        
-        historial = HistorialFirma(
-            documento_id=documento_id,
-            firmante_id=firmante.id,
-            accion="notificado",
-            detalles={"email": firmante.email}
+    if is_expired(doc):
+        raise HTTPException(status_code=400, detail="El documento ha expirado")
+    
+    firmantes = (await db.execute(
+        select(Firmante.id, Firmante.nombre, Firmante.email, Firmante.token_acceso).where(
+            Firmante.documento_id == documento_id,
+            Firmante.status == "PENDIENTE"
         )
-        db.add(historial)
-        notificados += 1
+    )).all()
+    
+    # Un INSERT para el outbox y otro para el historial; el envío lo hace el worker
+    now = datetime.utcnow()
+    sign_url = settings.FIRMAS_SIGN_URL.rstrip('/')
+    recipients = [
+        {
+            "to": f.email,
+            "context": {"nombre": f.nombre, "enlace": f"{sign_url}/{f.token_acceso}"},
+            "referencia": f"firmante:{f.id}"
+        }
+        for f in firmantes
+    ]
+    common = {"documento": {"titulo": doc.titulo}, "empresa": settings.EMPRESA_NOMBRE}
+    await db.run_sync(lambda session: enqueue_template(session, "firma_invitacion", recipients, common=common))
+    if firmantes:
+        await db.execute(insert(HistorialFirma.__table__), [
+            {"id": str(uuid.uuid4()), "documento_id": documento_id, "firmante_id": f.id,
+             "accion": "notificado", "detalles": {"email": f.email}, "created_at": now}
+            for f in firmantes
+        ])
+        await db.execute(
+            update(Firmante).where(Firmante.id.in_([f.id for f in firmantes]))
+            .values(status="NOTIFICADO", notificado_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        mark_changed(db.sync_session, "firmas")
+    notificados = len(firmantes)
     
     if doc.status == "PENDIENTE":
         doc.status = "EN_PROCESO"
     
-    db.commit()
+    await db.commit()
     
     return {"message": f"{notificados} firmantes notificados", "notificados": notificados}
 
@@ -201,9 +283,13 @@ async def notify_firmantes(documento_id: str, db: Session = Depends(get_db)):
 # ========== ENDPOINTS PÚBLICOS (PARA FIRMANTES) ==========
 
 @router.get("/public/{token}", response_model=DocumentoPublicoResponse)
-async def get_documento_publico(token: str, request: Request, db: Session = Depends(get_db)):
+async def get_documento_publico(token: str, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Obtener documento para firmar (acceso público con token)"""
-    firmante = db.query(Firmante).filter(Firmante.token_acceso == token).first()
+    firmante = (await db.execute(
+        select(Firmante)
+        .options(joinedload(Firmante.documento).selectinload(DocumentoFirma.firmantes))
+        .where(Firmante.token_acceso == token)
+    )).scalar_one_or_none()
     if not firmante:
         raise HTTPException(status_code=404, detail="Token inválido")
     
@@ -219,7 +305,7 @@ async def get_documento_publico(token: str, request: Request, db: Session = Depe
             detalles={"ip": request.client.host}
         )
         db.add(historial)
-        db.commit()
+        await db.commit()
     
     # Preparar lista de otros firmantes (sin datos sensibles)
     otros_firmantes = [
@@ -247,25 +333,35 @@ async def get_documento_publico(token: str, request: Request, db: Session = Depe
     )
 
 
+async def _file_sha256(db: AsyncSession, documento_id: str, column, path: str) -> str:
+    """Hash of a file stored before hashes were recorded; computed once and saved."""
+    sha256 = await run_in_threadpool(sha256_file, path)
+    await db.execute(
+        update(DocumentoFirma).where(DocumentoFirma.id == documento_id)
+        .values({column: sha256})
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return sha256
+
+
 @router.get("/public/{token}/pdf")
-async def get_pdf_publico(token: str, db: Session = Depends(get_db)):
-    """Descargar PDF del documento (acceso público con token)"""
-    from fastapi.responses import FileResponse
-    
-    firmante = db.query(Firmante).filter(Firmante.token_acceso == token).first()
-    if not firmante:
+async def get_pdf_publico(token: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Descargar PDF del documento (acceso público con token; ETag y Range)"""
+    # Token -> documento en una sola consulta, solo las columnas necesarias
+    row = (await db.execute(
+        select(DocumentoFirma.id, DocumentoFirma.titulo, DocumentoFirma.archivo_pdf, DocumentoFirma.archivo_sha256)
+        .join(Firmante, Firmante.documento_id == DocumentoFirma.id)
+        .where(Firmante.token_acceso == token)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Token inválido")
     
-    documento = firmante.documento
-    
-    if not os.path.exists(documento.archivo_pdf):
+    if not os.path.exists(row.archivo_pdf):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
-    return FileResponse(
-        documento.archivo_pdf,
-        media_type="application/pdf",
-        filename=f"{documento.titulo}.pdf"
-    )
+    sha256 = row.archivo_sha256 or await _file_sha256(db, row.id, DocumentoFirma.archivo_sha256, row.archivo_pdf)
+    return file_response(request, row.archivo_pdf, sha256, f"{row.titulo}.pdf")
 
 
 @router.post("/public/{token}/firmar")
@@ -273,99 +369,142 @@ async def firmar_documento(
     token: str,
     firma_data: FirmaData,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Registrar firma de un documento"""
-    firmante = db.query(Firmante).filter(Firmante.token_acceso == token).first()
-    if not firmante:
+    row = (await db.execute(
+        select(
+            Firmante.id, Firmante.status, DocumentoFirma.id.label("documento_id"),
+            DocumentoFirma.status.label("documento_status"), DocumentoFirma.expira_en, DocumentoFirma.requiere_orden
+        )
+        .join(DocumentoFirma, Firmante.documento_id == DocumentoFirma.id)
+        .where(Firmante.token_acceso == token)
+    )).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Token inválido")
     
-    if firmante.status == "FIRMADO":
+    if row.status == "FIRMADO":
         raise HTTPException(status_code=400, detail="Ya has firmado este documento")
     
-    documento = firmante.documento
+    # El barrido periódico marca EXPIRADO; entre barridos se valida expira_en directamente
+    if row.documento_status == "EXPIRADO" or (row.expira_en and row.expira_en <= datetime.utcnow()):
+        raise HTTPException(status_code=400, detail="El documento ha expirado")
+    
+    try:
+        imagen = decode_base64_image(firma_data.firma_imagen)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Imagen de firma inválida")
+    
+    # La imagen va al blob store (idempotente por hash); la fila solo guarda el hash
+    firma_sha256 = await run_in_threadpool(signature_blobs.put, imagen)
+    
+    # Firmante y contador se actualizan con UPDATEs condicionales: firmas concurrentes
+    # del mismo documento no pierden incrementos ni se saltan el orden
+    now = datetime.utcnow()
+    ip = request.client.host
+    user_agent = request.headers.get("user-agent")
+    firmado = await db.run_sync(mark_signed, row.id, row.requiere_orden, {
+        "firma_sha256": firma_sha256,
+        "firma_tipo": firma_data.firma_tipo,
+        "firma_metadata": {
+            **(firma_data.metadata or {}),
+            "ip": ip,
+            "user_agent": user_agent,
+            "timestamp": now.isoformat()
+        },
+        "firmado_at": now
+    })
+    if not firmado:
+        await db.rollback()
+        status = (await db.execute(select(Firmante.status).where(Firmante.id == row.id))).scalar()
+        if status == "FIRMADO":
+            raise HTTPException(status_code=400, detail="Ya has firmado este documento")
+        raise HTTPException(
+            status_code=400,
+            detail="Debes esperar a que los firmantes anteriores completen su firma"
+        )
     
-    # Verificar si requiere orden
-    if documento.requiere_orden:
-        firmantes_anteriores = db.query(Firmante).filter(
-            Firmante.documento_id == documento.id,
-            Firmante.orden < firmante.orden,
-            Firmante.status != "FIRMADO"
-        ).count()
-        
-        if firmantes_anteriores > 0:
-            raise HTTPException(
-                status_code=400,
-                detail="Debes esperar a que los firmantes anteriores completen su firma"
-            )
-    
-    # Registrar firma
-    firmante.firma_imagen = firma_data.firma_imagen
-    firmante.firma_tipo = firma_data.firma_tipo
-    firmante.firma_metadata = {
-        **(firma_data.metadata or {}),
-        "ip": request.client.host,
-        "user_agent": request.headers.get("user-agent"),
-        "timestamp": datetime.utcnow().isoformat()
-    }
-    firmante.status = "FIRMADO"
-    firmante.firmado_at = datetime.utcnow()
+    await db.run_sync(add_history, row.documento_id, row.id, "firmado",
+                      {"tipo_firma": firma_data.firma_tipo, "ip": ip}, now, ip, user_agent)
     
-    # Actualizar contador del documento
-    documento.firmantes_completados += 1
+    # Último statement antes del commit: el bloqueo de la fila del documento dura lo mínimo
+    conteo = await db.run_sync(count_signature, row.documento_id, now)
+    if conteo is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="El documento ya no admite firmas")
+    mark_changed(db.sync_session, "firmas")
+    await db.commit()
     
-    # Verificar si todos firmaron
-    if documento.firmantes_completados >= documento.total_firmantes:
-        documento.status = "COMPLETADO"
-        documento.completado_at = datetime.utcnow()
-        
-        # TODO: Generar PDF firmado con todas las firmas
-        # documento.archivo_firmado = generate_signed_pdf(documento)
-    
-    # Registrar en historial
-    historial = HistorialFirma(
-        documento_id=documento.id,
-        firmante_id=firmante.id,
-        accion="firmado",
-        detalles={
-            "tipo_firma": firma_data.firma_tipo,
-            "ip": request.client.host
-        },
-        ip_address=request.client.host,
-        user_agent=request.headers.get("user-agent")
-    )
-    db.add(historial)
-    
-    db.commit()
+    # El PDF firmado se genera en segundo plano (process pool)
+    completado = conteo.status == "COMPLETADO"
+    if completado:
+        signed_pdf_engine.enqueue(row.documento_id)
     
     return {
         "message": "Firma registrada exitosamente",
-        "documento_completado": documento.status == "COMPLETADO",
-        "firmantes_completados": documento.firmantes_completados,
-        "total_firmantes": documento.total_firmantes
+        "documento_completado": completado,
+        "firmantes_completados": conteo.firmantes_completados,
+        "total_firmantes": conteo.total_firmantes
     }
 
 
+@router.get("/imagenes/{sha256}")
+async def get_imagen_firma(sha256: str, request: Request):
+    """Imagen de firma por hash (contenido inmutable, cacheable indefinidamente)"""
+    if not signature_blobs.exists(sha256):
+        raise HTTPException(status_code=404, detail="Imagen no encontrada")
+    
+    headers = {"ETag": f'"{sha256}"', "Cache-Control": "public, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == f'"{sha256}"':
+        return Response(status_code=304, headers=headers)
+    
+    data = await run_in_threadpool(signature_blobs.get, sha256)
+    return Response(content=data, media_type=media_type(data), headers=headers)
+
+
 @router.get("/{documento_id}/download")
-async def download_documento_firmado(documento_id: str, db: Session = Depends(get_db)):
-    """Descargar documento con todas las firmas"""
-    from fastapi.responses import FileResponse
-    
-    doc = db.query(DocumentoFirma).filter(DocumentoFirma.id == documento_id).first()
+async def download_documento_firmado(documento_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Descargar documento con todas las firmas (ETag y Range)"""
+    doc = (await db.execute(
+        select(
+            DocumentoFirma.id, DocumentoFirma.titulo, DocumentoFirma.status,
+            DocumentoFirma.archivo_firmado, DocumentoFirma.archivo_firmado_sha256
+        ).where(DocumentoFirma.id == documento_id)
+    )).first()
     if not doc:
         raise HTTPException(status_code=404, detail="Documento no encontrado")
     
     if doc.status != "COMPLETADO":
         raise HTTPException(status_code=400, detail="El documento aún no está completamente firmado")
     
-    # Por ahora retornar el original, luego se generará el PDF con firmas
-    archivo = doc.archivo_firmado if doc.archivo_firmado else doc.archivo_pdf
+    if not doc.archivo_firmado:
+        signed_pdf_engine.enqueue(doc.id)
+        raise HTTPException(status_code=409, detail="El PDF firmado se está generando, intenta de nuevo en unos segundos")
     
-    if not os.path.exists(archivo):
+    if not os.path.exists(doc.archivo_firmado):
         raise HTTPException(status_code=404, detail="Archivo no encontrado")
     
-    return FileResponse(
-        archivo,
-        media_type="application/pdf",
-        filename=f"{doc.titulo}_firmado.pdf"
+    sha256 = doc.archivo_firmado_sha256 or await _file_sha256(
+        db, doc.id, DocumentoFirma.archivo_firmado_sha256, doc.archivo_firmado
     )
+    return file_response(request, doc.archivo_firmado, sha256, f"{doc.titulo}_firmado.pdf")
+
+
+@router.get("/verificar/{documento_id}")
+async def verificar_documento(documento_id: str, db: AsyncSession = Depends(get_async_db)):
+    """Verificación pública (destino del QR del PDF firmado)"""
+    doc = await _load_documento(db, documento_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Documento no encontrado")
+    
+    return {
+        "id": doc.id,
+        "titulo": doc.titulo,
+        "status": doc.status,
+        "completado_at": doc.completado_at,
+        "pdf_firmado": bool(doc.archivo_firmado),
+        "firmantes": [
+            {"nombre": f.nombre, "status": f.status, "firmado_at": f.firmado_at}
+            for f in sorted(doc.firmantes, key=lambda f: f.orden or 0)
+        ]
+    }
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import get_db
 from app.models.legal import ExpedienteLegal, MovimientoLegal
+from app.services.stats import get_stats
 from app.schemas.legal import ExpedienteLegal as ExpedienteSchema, ExpedienteLegalCreate, MovimientoLegal as MovimientoSchema, MovimientoLegalCreate
 
 router = APIRouter()
@@ -40,12 +41,4 @@ def agregar_movimiento(id: str, movimiento: MovimientoLegalCreate, db: Session =
 
 @router.get("/stats/summary")
 def get_legal_stats(db: Session = Depends(get_db)):
-    casos = db.query(ExpedienteLegal).all()
-    total_disputa = sum(c.monto_disputa for c in casos if c.estatus != 'CERRADO')
-    total_activos = len([c for c in casos if c.estatus == 'ABIERTO'])
-    
-    return {
-        "exposicion_total": total_disputa,
-        "casos_activos": total_activos,
-        "total_casos": len(casos)
-    }
+    return get_stats("legal", db)
@@ -1,7 +1,16 @@
 # MICSA OS - Notifications Endpoints
-from fastapi import APIRouter
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.core.database import get_db
+from app.models.notification import NotificationOutbox
 from app.services.notifications import NotificationService
+from app.services.notification_templates import (
+    TemplateError, enqueue_template, get_template, list_templates, render_batch, save_template
+)
+from app.services.outbox import enqueue_email
 
 router = APIRouter()
 
@@ -14,12 +23,105 @@ class WhatsAppRequest(BaseModel):
     to: str
     message: str
 
+class TemplateRecipient(BaseModel):
+    to: str
+    context: Dict[str, Any] = {}
+    locale: Optional[str] = None
+    referencia: Optional[str] = None
+
+class TemplateSendRequest(BaseModel):
+    recipients: List[TemplateRecipient]
+    common: Dict[str, Any] = {}
+    locale: Optional[str] = None
+
+class TemplatePreviewRequest(BaseModel):
+    context: Dict[str, Any] = {}
+    locale: Optional[str] = None
+
+class TemplateUpdate(BaseModel):
+    asunto: str
+    texto: str
+    html: Optional[str] = None
+
 @router.post("/email")
-def send_email(req: EmailRequest):
-    success = NotificationService.send_email(req.to, req.subject, req.body)
-    return {"ok": success}
+def send_email(req: EmailRequest, db: Session = Depends(get_db)):
+    notification_id = enqueue_email(db, req.to, req.subject, req.body)
+    db.commit()
+    return {"ok": True, "id": notification_id}
 
 @router.post("/whatsapp")
 def send_whatsapp(req: WhatsAppRequest):
     success = NotificationService.send_whatsapp_stub(req.to, req.message)
     return {"ok": success}
+
+@router.get("/outbox")
+def list_outbox(status: str = "DEAD", limit: int = 100, db: Session = Depends(get_db)):
+    rows = (
+        db.query(NotificationOutbox)
+        .filter(NotificationOutbox.status == status)
+        .order_by(NotificationOutbox.created_at.desc())
+        .limit(min(limit, 500))
+        .all()
+    )
+    return [
+        {
+            "id": r.id,
+            "destinatario": r.destinatario,
+            "asunto": r.asunto,
+            "referencia": r.referencia,
+            "status": r.status,
+            "intentos": r.intentos,
+            "proximoIntento": r.proximo_intento,
+            "ultimoError": r.ultimo_error,
+            "createdAt": r.created_at,
+            "enviadoAt": r.enviado_at,
+        }
+        for r in rows
+    ]
+
+@router.post("/outbox/{notification_id}/retry")
+def retry_notification(notification_id: str, db: Session = Depends(get_db)):
+    row = db.get(NotificationOutbox, notification_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Notificación no encontrada")
+    if row.status != "DEAD":
+        raise HTTPException(status_code=400, detail="Solo se pueden reintentar notificaciones en dead-letter")
+    row.status = "PENDIENTE"
+    row.intentos = 0
+    row.proximo_intento = datetime.utcnow()
+    db.commit()
+    return {"ok": True}
+
+# Templates
+
+@router.get("/templates")
+def get_templates(db: Session = Depends(get_db)):
+    return list_templates(db)
+
+@router.put("/templates/{nombre}/{locale}")
+def put_template(nombre: str, locale: str, data: TemplateUpdate, db: Session = Depends(get_db)):
+    try:
+        save_template(db, nombre, locale, data.asunto, data.texto, data.html)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return {"ok": True}
+
+@router.post("/templates/{nombre}/preview")
+def preview_template(nombre: str, req: TemplatePreviewRequest, db: Session = Depends(get_db)):
+    try:
+        template = get_template(db, nombre, req.locale)
+        rendered = render_batch(db, nombre, [{"to": "", "context": req.context}], locale=req.locale)[0]
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"locale": template.locale, "asunto": rendered.subject, "texto": rendered.text, "html": rendered.html}
+
+@router.post("/templates/{nombre}/send")
+def send_template(nombre: str, req: TemplateSendRequest, db: Session = Depends(get_db)):
+    """Render for every recipient and queue all messages in the outbox (one INSERT)"""
+    try:
+        count = enqueue_template(db, nombre, [r.model_dump() for r in req.recipients], req.common, req.locale)
+    except TemplateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
+    return {"ok": True, "encolados": count}
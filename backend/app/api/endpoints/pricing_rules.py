@@ -0,0 +1,43 @@
+# MICSA OS - Pricing Rules Endpoints
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from app.core.database import get_db
+from app.models.pricing import PricingRuleSet
+from app.schemas.pricing import PricingRuleSetCreate, PricingRuleSetResponse, ActivePricingRules
+from app.services.pricing_rules import DEFAULT_RULES, get_active_rules, create_rule_set
+
+router = APIRouter()
+
+@router.get("/", response_model=List[PricingRuleSetResponse])
+def list_rule_sets(db: Session = Depends(get_db)):
+    return db.query(PricingRuleSet).order_by(PricingRuleSet.version.desc()).all()
+
+@router.post("/", response_model=PricingRuleSetResponse, status_code=status.HTTP_201_CREATED)
+def create_rules(data: PricingRuleSetCreate, db: Session = Depends(get_db)):
+    """Las reglas son inmutables: cada cambio crea una nueva versión"""
+    try:
+        return create_rule_set(
+            db,
+            nombre=data.nombre,
+            descripcion=data.descripcion,
+            rules=data.rules,
+            effective_from=data.effective_from
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/active", response_model=ActivePricingRules)
+def get_active(db: Session = Depends(get_db)):
+    compiled = get_active_rules(db)
+    if compiled.version == 0:
+        return {"version": 0, "rules": DEFAULT_RULES}
+    row = db.query(PricingRuleSet).filter(PricingRuleSet.version == compiled.version).first()
+    return {"version": compiled.version, "rules": row.rules}
+
+@router.get("/{version}", response_model=PricingRuleSetResponse)
+def get_rule_set(version: int, db: Session = Depends(get_db)):
+    row = db.query(PricingRuleSet).filter(PricingRuleSet.version == version).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Versión de reglas no encontrada")
+    return row
@@ -10,6 +10,7 @@ import os
 from app.core.database import get_db
 from app.models.proyecto import Proyecto, FirmaRequest
 from app.models.cotizacion import Cotizacion
+from app.services.blob_store import decode_base64_image, signature_blobs
 from app.services.reports import ReportService
 from app.schemas.proyecto import ProyectoCreate, ProyectoResponse, FirmaRequestResponse, ComplianceCheck, ComplianceCheckResult, SigSign, SigRequestInit
 from fastapi.responses import Response
@@ -112,9 +113,14 @@ def sign_request(sig_id: str, data: SigSign, db: Session = Depends(get_db)):
     if sig.token_hash != token_hash:
         raise HTTPException(status_code=401, detail="Invalid token")
     
+    try:
+        signature = decode_base64_image(data.signatureBase64)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid signature image")
+    
     sig.status = "SIGNED"
     sig.signed_at = datetime.now()
-    sig.signature_base64 = data.signatureBase64
+    sig.signature_sha256 = signature_blobs.put(signature)
     db.commit()
     
     return {"ok": True, "message": "✅ Firmado"}
@@ -7,6 +7,8 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     DB_ECHO: bool = False
+    # Async endpoints: derived from DATABASE_URL (asyncpg / aiosqlite) unless set
+    ASYNC_DATABASE_URL: Optional[str] = None
     
     # Security
     SECRET_KEY: str
@@ -31,13 +33,66 @@ class Settings(BaseSettings):
     # Paths
     UPLOADS_PATH: str = "./uploads"
     OUTPUTS_PATH: str = "./outputs"
+    # Compliance documents root: <root>/<OC>/<category>/<file>
+    COMPLIANCE_STORAGE_PATH: str = "./docs/compliance_seil"
+    # Older storage roots still referenced by stored document paths, comma separated.
+    # Downloads only read files under COMPLIANCE_STORAGE_PATH or one of these.
+    COMPLIANCE_LEGACY_ROOTS: str = ""
 
-    # SMTP (Optional, stubs if missing)
+    # Compliance chunked uploads: suggested chunk size and hours before an abandoned
+    # upload session (and its partial file) is purged
+    COMPLIANCE_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024
+    COMPLIANCE_UPLOAD_EXPIRY_HOURS: int = 48
+    # Seconds a PUT holds its claim on an upload without renewing it (a crashed
+    # worker's claim lapses after this)
+    COMPLIANCE_UPLOAD_LEASE_SECONDS: int = 120
+
+    # Quote result cache (in-process LRU + optional DB layer)
+    QUOTE_CACHE_SIZE: int = 2048
+    QUOTE_CACHE_PERSIST: bool = False
+
+    # CEO dashboard snapshot: full rebuild every N seconds (0 = only on demand)
+    DASHBOARD_RECONCILE_SECONDS: int = 3600
+
+    # Live dashboard (SSE): burst coalescing window and cross-worker resync interval
+    LIVE_DASHBOARD_COALESCE_MS: int = 500
+    LIVE_DASHBOARD_RESYNC_SECONDS: int = 30
+
+    # Stats screens (firmas, empleados, legal): cache TTL, 0 disables
+    STATS_CACHE_TTL_SECONDS: float = 10
+
+    # Signed PDFs: rendering processes and base URL of the public verification page
+    SIGNED_PDF_WORKERS: int = 2
+    FIRMAS_VERIFY_URL: str = "http://localhost:8000/api/v1/firmas/verificar"
+
+    # SMTP (Optional, stubs if SMTP_HOST is missing; login only if SMTP_USER is set)
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: Optional[int] = 587
     SMTP_USER: Optional[str] = None
     SMTP_PASSWORD: Optional[str] = None
     SMTP_FROM: Optional[str] = None
+    SMTP_STARTTLS: bool = True
+
+    # Notification outbox worker: SMTP connections, claim batch, sends/second,
+    # attempts before dead-letter, first retry delay (doubles each time), idle poll
+    OUTBOX_POOL_SIZE: int = 3
+    OUTBOX_BATCH_SIZE: int = 50
+    OUTBOX_RATE_PER_SECOND: float = 10
+    OUTBOX_MAX_ATTEMPTS: int = 6
+    OUTBOX_RETRY_BASE_SECONDS: int = 30
+    OUTBOX_POLL_SECONDS: int = 10
+
+    # Notification templates: locale used when a recipient has none (or it is missing)
+    NOTIFICATIONS_DEFAULT_LOCALE: str = "es"
+
+    # Public signing page linked from the notification emails
+    FIRMAS_SIGN_URL: str = "http://localhost:3001/firmar"
+
+    # Envelope expiration sweep: interval (0 disables), rows per batch, and days before
+    # expira_en to remind pending signers (0 = no reminders)
+    FIRMAS_EXPIRY_SWEEP_SECONDS: int = 900
+    FIRMAS_EXPIRY_BATCH_SIZE: int = 500
+    FIRMAS_REMINDER_DAYS: int = 0
     
     class Config:
         env_file = ".env"
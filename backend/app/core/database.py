@@ -1,5 +1,7 @@
 # MICSA OS - Database Connection
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
@@ -20,3 +22,55 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------- Async (for async def endpoints) ----------
+# Same database through an asyncio driver. Its sessions are SessionLocal's session class
+# underneath, so the flush/commit hooks (change bus, dashboard deltas) fire for both.
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_config(url: str):
+    """DATABASE_URL -> (async URL, extra create_async_engine kwargs)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Sin driver async para {backend}; define ASYNC_DATABASE_URL")
+    options = {}
+    if backend == "postgresql" and "sslmode" in parsed.query:
+        # asyncpg takes ssl=<mode> instead of libpq's sslmode
+        options["connect_args"] = {"ssl": parsed.query["sslmode"]}
+        parsed = parsed.difference_update_query(["sslmode"])
+    if backend == "sqlite":
+        # aiosqlite opens a connection (and a non-daemon thread) per session; pooling them
+        # would keep threads alive past shutdown in scripts. Concurrent writers wait on
+        # the file lock instead, so give them longer than sqlite's 5 s default.
+        options["connect_args"] = {"timeout": 30}
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]), options
+
+
+if settings.ASYNC_DATABASE_URL:
+    _async_url, _async_options = settings.ASYNC_DATABASE_URL, {}
+else:
+    _async_url, _async_options = async_database_config(settings.DATABASE_URL)
+
+async_engine = create_async_engine(
+    _async_url,
+    echo=settings.DB_ECHO,
+    pool_pre_ping=True,
+    **_async_options
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    sync_session_class=SessionLocal.class_,
+    autoflush=False,
+    # Endpoints return ORM objects after commit; reloading them would need awaits
+    expire_on_commit=False
+)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
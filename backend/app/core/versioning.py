@@ -0,0 +1,24 @@
+# MICSA OS - Version Stamps
+# Cheap cross-worker cache invalidation: writers bump a per-key counter in the DB,
+# readers compare it with the version their in-process cache was built from.
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.version_stamp import VersionStamp
+
+
+def get_version(db: Session, key: str) -> int:
+    version = db.query(VersionStamp.version).filter(VersionStamp.key == key).scalar()
+    return version or 0
+
+
+def bump_version(db: Session, key: str) -> None:
+    """Increment the stamp inside the caller's transaction (visible once it commits)."""
+    result = db.execute(
+        update(VersionStamp)
+        .where(VersionStamp.key == key)
+        .values(version=VersionStamp.version + 1)
+    )
+    if result.rowcount == 0:
+        db.add(VersionStamp(key=key, version=1))
+        db.flush()
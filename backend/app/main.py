@@ -1,11 +1,17 @@
 # MICSA OS - Main Application
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.database import Base, engine
+from app.core.database import Base, async_engine, engine
+from app.services.dashboard_snapshot import reconcile_forever
+from app.services.firma_expiration import sweep_forever
+from app.services.live_dashboard import live_dashboard
+from app.services.outbox import outbox_worker
+from app.services.signed_pdf import signed_pdf_engine
 
 # Import routers
-from app.api.endpoints import clientes, cotizaciones, proyectos, epp, dashboard, notifications, legal, empleados, compliance, firmas
+from app.api.endpoints import clientes, cotizaciones, proyectos, epp, dashboard, notifications, legal, empleados, compliance, firmas, pricing_rules
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -39,6 +45,12 @@ app.include_router(
     tags=["Comercial - Cotizaciones"]
 )
 
+app.include_router(
+    pricing_rules.router,
+    prefix=f"{settings.API_V1_STR}/pricing-rules",
+    tags=["Comercial - Reglas de Precio"]
+)
+
 app.include_router(
     proyectos.router,
     prefix=f"{settings.API_V1_STR}/proyectos",
@@ -85,6 +97,24 @@ app.include_router(
 )
 
 
+@app.on_event("startup")
+async def start_background_jobs():
+    await live_dashboard.start()
+    await signed_pdf_engine.start()
+    await outbox_worker.start()
+    if settings.DASHBOARD_RECONCILE_SECONDS > 0:
+        asyncio.create_task(reconcile_forever(settings.DASHBOARD_RECONCILE_SECONDS))
+    if settings.FIRMAS_EXPIRY_SWEEP_SECONDS > 0:
+        asyncio.create_task(sweep_forever(settings.FIRMAS_EXPIRY_SWEEP_SECONDS))
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await signed_pdf_engine.stop()
+    await outbox_worker.stop()
+    await async_engine.dispose()
+
+
 @app.get("/")
 async def root():
     return {
@@ -5,5 +5,10 @@ from .proyecto import Proyecto, FirmaRequest
 from .epp import EppItem
 from .legal import ExpedienteLegal, MovimientoLegal
 from .empleado import Empleado, EmpleadoDocumento
-from .compliance import ComplianceExpediente
-from .firma_electronica import DocumentoFirma, Firmante, HistorialFirma
+from .compliance import ComplianceExpediente, ComplianceUpload
+from .firma_electronica import DocumentoFirma, Firmante, HistorialFirma, LoteFirma
+from .version_stamp import VersionStamp
+from .pricing import PricingRuleSet
+from .quote_cache import QuoteResultCache
+from .notification import NotificationOutbox, NotificationTemplate
+from .dashboard import DashboardSnapshot, DashboardProjectState, KpiQuoteRollup, KpiProjectRollup
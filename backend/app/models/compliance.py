@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Boolean, BigInteger
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -47,3 +47,29 @@ class ComplianceExpediente(Base):
     
     # Relationships
     proyecto = relationship("Proyecto")
+
+
+class ComplianceUpload(Base):
+    """Subida por partes (reanudable) de un documento de cumplimiento"""
+    __tablename__ = "compliance_uploads"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    expediente_id = Column(String(36), ForeignKey("compliance_expedientes.id"), nullable=False, index=True)
+    category = Column(String(100), nullable=False) # e.g., "07_NOMINAS_Y_SEGURIDAD_SOCIAL"
+    field = Column(String(100), nullable=False)    # e.g., "sua"
+    filename = Column(String(255), nullable=False)
+    
+    size = Column(BigInteger, nullable=False)        # Tamaño total declarado por el cliente
+    offset = Column(BigInteger, nullable=False, default=0) # Bytes confirmados en el archivo parcial
+    sha256_esperado = Column(String(64))             # Opcional: lo envía el cliente para verificar
+    sha256 = Column(String(64))                      # Calculado al recibir; se fija al completar
+    
+    status = Column(String(20), default="RECIBIENDO") # RECIBIENDO, COMPLETADO
+    file_path = Column(String)                        # Ruta final (OC/category/...) al completar
+    
+    # Petición que está escribiendo el archivo parcial (un solo escritor entre workers)
+    recibiendo_por = Column(String(32))
+    recibiendo_hasta = Column(DateTime)               # Vence si el worker cae sin liberarla
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
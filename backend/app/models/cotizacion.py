@@ -1,5 +1,5 @@
 # MICSA OS - Cotización Model
-from sqlalchemy import Column, String, Float, Integer, JSON, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, Float, Integer, JSON, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import uuid
@@ -8,6 +8,10 @@ from app.core.database import Base
 
 class Cotizacion(Base):
     __tablename__ = "cotizaciones"
+    __table_args__ = (
+        # Keyset pagination of list_quotes (ORDER BY created_at DESC, id DESC)
+        Index("ix_cotizaciones_created_at_id", "created_at", "id"),
+    )
     
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     
@@ -29,12 +33,16 @@ class Cotizacion(Base):
     # Resultados del cálculo
     client_quote = Column(JSON) # Lo que ve el cliente
     internal_data = Column(JSON) # Datos internos de costos y márgenes
+    simulation_data = Column(JSON) # Última simulación Monte Carlo de margen
     
     # Totales
     subtotal = Column(Float, default=0.0)
     iva = Column(Float, default=0.0)
     total = Column(Float, default=0.0)
     
+    # Versión de pricing_rule_sets con la que se calculó (0 = DEFAULT_RULES)
+    rules_version = Column(Integer, default=0)
+    
     # Status
     status = Column(String(20), default="DRAFT") # DRAFT, SENT, APPROVED, REJECTED, PROJECT
     
@@ -0,0 +1,65 @@
+# MICSA OS - Dashboard Models
+from sqlalchemy import Column, String, Float, Integer, Boolean, Date, DateTime, UniqueConstraint
+from datetime import datetime
+
+from app.core.database import Base
+
+class DashboardSnapshot(Base):
+    """KPIs del dashboard CEO, una sola fila (id=1) mantenida por eventos de sesión"""
+    __tablename__ = "dashboard_snapshot"
+
+    id = Column(Integer, primary_key=True, default=1)
+
+    quotes = Column(Integer, nullable=False, default=0)
+    total_cotizado = Column(Float, nullable=False, default=0.0)
+    total_utilidad = Column(Float, nullable=False, default=0.0)
+
+    proyectos_activos = Column(Integer, nullable=False, default=0)
+    proyectos_cerrados = Column(Integer, nullable=False, default=0)
+    cierres_bloqueados = Column(Integer, nullable=False, default=0)
+
+    # True when a write could not be applied as a delta; the next read rebuilds
+    stale = Column(Boolean, nullable=False, default=False)
+
+    rebuilt_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DashboardProjectState(Base):
+    """Estado por proyecto que alimenta cierresBloqueados (activo con firmas pendientes)"""
+    __tablename__ = "dashboard_project_state"
+
+    proyecto_id = Column(String(36), primary_key=True)
+    status = Column(String(20))
+    pending_firmas = Column(Integer, nullable=False, default=0)
+
+class KpiQuoteRollup(Base):
+    """Cotizaciones agregadas por periodo (month/week) × status × cliente"""
+    __tablename__ = "kpi_quote_rollups"
+    __table_args__ = (
+        UniqueConstraint("period", "bucket", "status", "cliente_id", name="uq_kpi_quote_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(String(10), nullable=False)  # month, week
+    bucket = Column(Date, nullable=False)  # primer día del mes / lunes de la semana (UTC)
+    status = Column(String(20), nullable=False)
+    cliente_id = Column(String(36), nullable=False, default="")  # "" = sin cliente
+
+    quotes = Column(Integer, nullable=False, default=0)
+    total_cotizado = Column(Float, nullable=False, default=0.0)
+    total_utilidad = Column(Float, nullable=False, default=0.0)
+
+class KpiProjectRollup(Base):
+    """Aperturas y cierres de proyectos por periodo × cliente"""
+    __tablename__ = "kpi_project_rollups"
+    __table_args__ = (
+        UniqueConstraint("period", "bucket", "cliente_id", name="uq_kpi_project_rollups_key"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    period = Column(String(10), nullable=False)
+    bucket = Column(Date, nullable=False)
+    cliente_id = Column(String(36), nullable=False, default="")
+
+    abiertos = Column(Integer, nullable=False, default=0)
+    cerrados = Column(Integer, nullable=False, default=0)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Boolean, Text, JSON, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -7,12 +7,19 @@ from app.core.database import Base
 class DocumentoFirma(Base):
     """Documento que requiere firmas electrónicas"""
     __tablename__ = "documentos_firma"
+    __table_args__ = (
+        # Barrido de expiración: documentos abiertos por fecha de expiración
+        Index("ix_documentos_firma_status_expira_en", "status", "expira_en"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     titulo = Column(String, nullable=False)
     descripcion = Column(Text)
     archivo_pdf = Column(String, nullable=False)  # Path al PDF original
     archivo_firmado = Column(String)  # Path al PDF con todas las firmas
+    # SHA-256 de cada archivo, calculado al escribirlo; sirve de ETag en las descargas
+    archivo_sha256 = Column(String(64))
+    archivo_firmado_sha256 = Column(String(64))
     
     # Metadata
     tipo_documento = Column(String)  # "contrato", "orden_compra", "convenio", etc.
@@ -20,7 +27,7 @@ class DocumentoFirma(Base):
     creado_por = Column(String, default="admin")
     
     # Estado del documento
-    status = Column(String, default="PENDIENTE")  # PENDIENTE, EN_PROCESO, COMPLETADO, CANCELADO
+    status = Column(String, default="PENDIENTE")  # PENDIENTE, EN_PROCESO, COMPLETADO, CANCELADO, EXPIRADO
     total_firmantes = Column(Integer, default=0)
     firmantes_completados = Column(Integer, default=0)
     
@@ -53,13 +60,13 @@ class Firmante(Base):
     
     # Orden y estado
     orden = Column(Integer, default=1)  # Orden en que debe firmar (si requiere_orden=True)
-    status = Column(String, default="PENDIENTE")  # PENDIENTE, NOTIFICADO, FIRMADO, RECHAZADO
+    status = Column(String, default="PENDIENTE")  # PENDIENTE, NOTIFICADO, FIRMADO, RECHAZADO, EXPIRADO
     
     # Token único para acceso
     token_acceso = Column(String, unique=True, default=lambda: str(uuid.uuid4()))
     
     # Datos de la firma
-    firma_imagen = Column(Text)  # Base64 de la firma dibujada
+    firma_sha256 = Column(String(64), index=True)  # Imagen de la firma en el blob store (services/blob_store.py)
     firma_tipo = Column(String)  # "dibujada", "tipografica", "imagen", "certificado_digital"
     firma_metadata = Column(JSON)  # IP, user agent, timestamp, etc.
     
@@ -75,12 +82,15 @@ class Firmante(Base):
 class HistorialFirma(Base):
     """Registro de auditoría de todas las acciones sobre documentos"""
     __tablename__ = "historial_firmas"
+    __table_args__ = (
+        Index("ix_historial_firmas_documento_accion", "documento_id", "accion"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     documento_id = Column(String, ForeignKey("documentos_firma.id"))
     firmante_id = Column(String, ForeignKey("firmantes.id"))
     
-    accion = Column(String, nullable=False)  # "creado", "notificado", "visto", "firmado", "rechazado", "cancelado"
+    accion = Column(String, nullable=False)  # "creado", "notificado", "visto", "firmado", "rechazado", "cancelado", "expirado", "recordatorio_expiracion"
     detalles = Column(JSON)  # Información adicional de la acción
     
     # Metadata de auditoría
@@ -88,3 +98,21 @@ class HistorialFirma(Base):
     user_agent = Column(String)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LoteFirma(Base):
+    """Creación masiva de documentos de firma (ZIP de PDFs + manifiesto)"""
+    __tablename__ = "lotes_firma"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, default="PENDIENTE")  # PENDIENTE, PROCESANDO, COMPLETADO, FALLIDO
+    creado_por = Column(String, default="admin")
+    
+    # Progreso
+    total = Column(Integer, default=0)  # Documentos en el manifiesto
+    procesados = Column(Integer, default=0)
+    creados = Column(Integer, default=0)
+    errores = Column(JSON, default=list)  # [{"archivo": ..., "error": ...}]
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    terminado_at = Column(DateTime)
@@ -0,0 +1,48 @@
+# MICSA OS - Notification Models
+from sqlalchemy import Column, String, Integer, Text, DateTime, Index, UniqueConstraint
+from datetime import datetime
+import uuid
+
+from app.core.database import Base
+
+class NotificationOutbox(Base):
+    """Correo pendiente de envío; lo entrega el worker de services/outbox.py"""
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next", "status", "proximo_intento"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    canal = Column(String(20), nullable=False, default="email")
+    destinatario = Column(String(255), nullable=False)
+    asunto = Column(String(255), nullable=False)
+    cuerpo = Column(Text, nullable=False)
+    cuerpo_html = Column(Text)  # Parte HTML opcional (multipart/alternative)
+    referencia = Column(String(100))  # e.g. "firmante:<id>", para auditoría
+
+    status = Column(String(20), nullable=False, default="PENDIENTE")  # PENDIENTE, ENVIANDO, ENVIADO, DEAD
+    intentos = Column(Integer, nullable=False, default=0)
+    proximo_intento = Column(DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_error = Column(Text)
+    # Claim token of the worker sending it; ENVIANDO rows past proximo_intento are reclaimed
+    reclamado_por = Column(String(36))
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    enviado_at = Column(DateTime)
+
+
+class NotificationTemplate(Base):
+    """Plantilla editable; tiene prioridad sobre la de app/templates/notifications"""
+    __tablename__ = "notification_templates"
+    __table_args__ = (
+        UniqueConstraint("nombre", "locale", name="uq_notification_templates_nombre_locale"),
+    )
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    nombre = Column(String(100), nullable=False)  # e.g. "firma_invitacion"
+    locale = Column(String(10), nullable=False)  # "es", "en", "es-MX"
+    asunto = Column(String(255), nullable=False)
+    texto = Column(Text, nullable=False)
+    html = Column(Text)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,24 @@
+# MICSA OS - Pricing Rule Set Model
+from sqlalchemy import Column, String, Integer, JSON, DateTime, Text
+from datetime import datetime
+import uuid
+
+from app.core.database import Base
+
+class PricingRuleSet(Base):
+    """Versión inmutable de las reglas de precio del cotizador"""
+    __tablename__ = "pricing_rule_sets"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    version = Column(Integer, unique=True, nullable=False, index=True)
+    nombre = Column(String(255), nullable=False)
+    descripcion = Column(Text)
+
+    # Mismo formato que DEFAULT_RULES (labor, welding, dc3, medical, epp, ...)
+    rules = Column(JSON, nullable=False)
+
+    # La versión activa es la de mayor effective_from <= ahora
+    effective_from = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    creado_por = Column(String, default="admin")
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -47,7 +47,7 @@ class FirmaRequest(Base):
     
     # Token for signing link (hashed in reproduce_issue.js, let's keep it simple or follow that)
     token_hash = Column(String(64), unique=True)
-    signature_base64 = Column(Text) # The actual signature image or data
+    signature_sha256 = Column(String(64)) # Signature image in the blob store (services/blob_store.py)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -0,0 +1,15 @@
+# MICSA OS - Quote Result Cache Model
+from sqlalchemy import Column, String, Integer, JSON, DateTime
+from datetime import datetime
+
+from app.core.database import Base
+
+class QuoteResultCache(Base):
+    """Resultados de QuotationCalculator.compute direccionados por contenido (sha256 de la entrada normalizada)"""
+    __tablename__ = "quote_result_cache"
+
+    key = Column(String(64), primary_key=True)
+    rules_version = Column(Integer)
+    catalog_version = Column(Integer)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
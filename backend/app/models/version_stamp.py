@@ -0,0 +1,13 @@
+# MICSA OS - Version Stamp Model
+from sqlalchemy import Column, String, Integer, DateTime
+from datetime import datetime
+
+from app.core.database import Base
+
+class VersionStamp(Base):
+    """Contador por recurso; se incrementa en cada escritura para invalidar cachés por proceso"""
+    __tablename__ = "version_stamps"
+
+    key = Column(String(50), primary_key=True)  # "pricing_rules", ...
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
+from app.core.config import settings
 
 class ComplianceExpedienteBase(BaseModel):
     proyecto_id: Optional[str] = None
@@ -52,3 +53,27 @@ class ComplianceExpedienteInDB(ComplianceExpedienteBase):
 
 class ComplianceExpedienteResponse(ComplianceExpedienteInDB):
     pass
+
+class ComplianceUploadCreate(BaseModel):
+    category: str # e.g., "07_NOMINAS_Y_SEGURIDAD_SOCIAL"
+    field: str    # e.g., "sua"
+    filename: str
+    size: int = Field(..., gt=0)
+    sha256: Optional[str] = Field(None, min_length=64, max_length=64) # Verificación opcional al completar
+
+class ComplianceUploadResponse(BaseModel):
+    id: str
+    expediente_id: str
+    category: str
+    field: str
+    filename: str
+    size: int
+    offset: int
+    status: str
+    sha256: Optional[str] = None
+    file_path: Optional[str] = None
+    chunk_size: int = settings.COMPLIANCE_UPLOAD_CHUNK_SIZE # Tamaño sugerido de cada PUT
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
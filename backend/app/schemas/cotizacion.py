@@ -1,4 +1,5 @@
 # MICSA OS - Quotation Schemas
+import math
 from pydantic import BaseModel, Field
 from typing import Dict, List, Optional, Any
 from datetime import datetime
@@ -68,7 +69,86 @@ class QuoteResponse(BaseModel):
     input_data: Dict[str, Any]
     clientQuote: Dict[str, Any]
     internal_data: Dict[str, Any]
+    simulation_data: Optional[Dict[str, Any]] = None
+    rules_version: Optional[int] = None
     totals: Dict[str, float]
 
     class Config:
         from_attributes = True
+
+class QuoteBatchCreate(BaseModel):
+    quotes: List[QuoteCreate] = Field(..., min_length=1, max_length=10000)
+
+class QuoteBatchItem(BaseModel):
+    id: str
+    projectName: str
+    totals: Dict[str, float]
+
+class QuoteBatchResponse(BaseModel):
+    count: int
+    quotes: List[QuoteBatchItem]
+
+class SweepRange(BaseModel):
+    """Explicit `values` or an inclusive `start`/`stop`/`step` range"""
+    values: Optional[List[float]] = None
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = None
+
+    def count(self) -> int:
+        """Number of points, without building them"""
+        if self.values is not None:
+            if not self.values:
+                raise ValueError("values no puede estar vacío")
+            return len(self.values)
+        if self.start is None or self.stop is None or not self.step or self.step <= 0 or self.stop < self.start:
+            raise ValueError("Rango inválido: se requiere start <= stop y step > 0")
+        points = (self.stop - self.start) / self.step + 1e-9
+        if not math.isfinite(points):
+            raise ValueError("Rango inválido: demasiados puntos")
+        return math.floor(points) + 1
+
+    def expand(self) -> List[float]:
+        count = self.count()
+        if self.values is not None:
+            return self.values
+        return [round(self.start + i * self.step, 10) for i in range(count)]
+
+class QuoteSweepRequest(BaseModel):
+    base: QuoteCreate
+    durationMonths: Optional[SweepRange] = None
+    peopleByRole: Dict[str, SweepRange] = {}
+    weldersCount: Optional[SweepRange] = None
+    managementPct: Optional[SweepRange] = None
+    eppMarkupPct: Optional[SweepRange] = None
+
+class Distribution(BaseModel):
+    kind: str = "fixed"  # fixed, uniform, triangular, normal
+    value: Optional[float] = None
+    low: Optional[float] = None
+    mode: Optional[float] = None
+    high: Optional[float] = None
+    mean: Optional[float] = None
+    sd: Optional[float] = None
+
+class QuoteSimulationSpec(BaseModel):
+    draws: int = Field(100_000, ge=100, le=1_000_000)
+    seed: Optional[int] = None
+    durationOverrunPct: Optional[Distribution] = None
+    headcountDriftPct: Optional[Distribution] = None
+    weldingConsumablesFactor: Optional[Distribution] = None
+    perDiemDays: Optional[Distribution] = None
+
+    def distributions(self) -> Dict[str, Dict[str, Any]]:
+        names = ("durationOverrunPct", "headcountDriftPct", "weldingConsumablesFactor", "perDiemDays")
+        return {name: getattr(self, name).dict(exclude_none=True) for name in names if getattr(self, name)}
+
+class QuoteSimulationRequest(QuoteSimulationSpec):
+    base: QuoteCreate
+
+class GoalSeekRequest(BaseModel):
+    base: QuoteCreate
+    lever: str  # managementPct, eppMarkupPct, commMarginPct, durationMonths, people, weldersCount, travelPeopleCount
+    metric: str = "total"  # total, subtotal, marginPct
+    targets: List[float] = Field(..., min_length=1, max_length=10000)
+    bounds: Optional[List[float]] = Field(None, min_length=2, max_length=2)  # [min, max] para palancas por bisección
@@ -1,5 +1,7 @@
 # MICSA OS - Dashboard Schemas
 from pydantic import BaseModel
+from typing import Optional
+from datetime import date
 
 class CEODashboardResponse(BaseModel):
     quotes: int
@@ -10,3 +12,14 @@ class CEODashboardResponse(BaseModel):
     totalUtilidad: float
     marginPromedio: float
     cierresBloqueados: int
+
+class TrendPoint(BaseModel):
+    bucket: date
+    status: Optional[str] = None
+    cliente: Optional[str] = None
+    quotes: int
+    totalCotizado: float
+    totalUtilidad: float
+    marginPct: float
+    proyectosAbiertos: int
+    proyectosCerrados: int
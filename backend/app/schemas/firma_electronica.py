@@ -22,6 +22,7 @@ class FirmanteInDB(FirmanteBase):
     notificado_at: Optional[datetime] = None
     firmado_at: Optional[datetime] = None
     visto_at: Optional[datetime] = None
+    firma_sha256: Optional[str] = None  # GET /firmas/imagenes/{firma_sha256}
     
     class Config:
         from_attributes = True
@@ -80,6 +81,7 @@ class DocumentoFirmaStats(BaseModel):
     en_proceso: int
     completados: int
     cancelados: int
+    expirados: int
     firmantes_pendientes: int
     firmantes_completados: int
 
@@ -98,3 +100,19 @@ class DocumentoPublicoResponse(BaseModel):
     firmante: FirmanteResponse
     otros_firmantes: List[dict]  # Solo nombre y status de otros firmantes
     expira_en: Optional[datetime] = None
+
+
+# ========== LOTES (CREACIÓN MASIVA) SCHEMAS ==========
+
+class LoteFirmaResponse(BaseModel):
+    id: str
+    status: str
+    total: int
+    procesados: int
+    creados: int
+    errores: List[dict] = []
+    created_at: datetime
+    terminado_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
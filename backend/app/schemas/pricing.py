@@ -0,0 +1,27 @@
+# MICSA OS - Pricing Rule Set Schemas
+from pydantic import BaseModel
+from typing import Dict, Any, Optional
+from datetime import datetime
+
+class PricingRuleSetCreate(BaseModel):
+    nombre: str
+    descripcion: Optional[str] = None
+    rules: Dict[str, Any]
+    effective_from: Optional[datetime] = None
+
+class PricingRuleSetResponse(BaseModel):
+    id: str
+    version: int
+    nombre: str
+    descripcion: Optional[str] = None
+    rules: Dict[str, Any]
+    effective_from: datetime
+    creado_por: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ActivePricingRules(BaseModel):
+    version: int
+    rules: Dict[str, Any]
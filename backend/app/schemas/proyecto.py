@@ -30,6 +30,7 @@ class FirmaRequestResponse(FirmaRequestBase):
     proyecto_id: str
     status: str
     signed_at: Optional[datetime] = None
+    signature_sha256: Optional[str] = None
     created_at: datetime
     
     class Config:
@@ -0,0 +1,428 @@
+# MICSA OS - Vectorized Quotation Calculator
+# Columnar (NumPy) version of QuotationCalculator.compute. Every formula keeps the
+# exact operation order of calculator.py so results match compute() to the centavo.
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Union
+
+from app.services.pricing_rules import CompiledRules, compile_rules
+
+# Same SKUs and order as QuotationCalculator.estimate_epp (the order matters for the float sum)
+EPP_KIT_SKUS = (
+    "CASCO_MATRACA",
+    "CHALECO_REF",
+    "BARBIQUEJO_2P",
+    "CALZADO_SEG",
+    "LENTE_BASICO",
+    "GUANTE_NITRILO",
+    "TAPON_DESECHABLE",
+)
+
+IVA_PCT = 0.16
+
+
+def round2(values) -> np.ndarray:
+    """Vectorized equivalent of Python's round(x, 2) (exact on ties, unlike np.round)."""
+    values = np.asarray(values, dtype=float)
+    scaled = values * 100
+    out = np.rint(scaled) / 100
+    frac = np.abs(scaled - np.trunc(scaled))
+    tol = 1e-12 + 8 * np.finfo(float).eps * np.abs(scaled)
+    near_tie = np.abs(frac - 0.5) <= tol
+    if near_tie.any():
+        flat_out = out.reshape(-1) if out.ndim else out.reshape(1)
+        flat_values = values.reshape(-1) if values.ndim else values.reshape(1)
+        idx = np.flatnonzero(near_tie)
+        flat_out[idx] = [round(v, 2) for v in flat_values[idx].tolist()]
+        out = flat_out.reshape(values.shape)
+    return out
+
+
+@dataclass
+class QuoteColumns:
+    """One array per calculator input. Fields only need to be broadcast-compatible,
+    so a sweep can pass grids instead of flat columns."""
+    people: np.ndarray
+    months: np.ndarray
+    welders: np.ndarray
+    dc3_people: np.ndarray
+    dc3_packages: np.ndarray
+    medical: np.ndarray
+    epp: np.ndarray
+    platform_pm: np.ndarray
+    iso: np.ndarray
+    # Commercialization arrives already priced per quote (rounded like compute())
+    comm_cost: np.ndarray
+    comm_price: np.ndarray
+    logistics: np.ndarray
+    travel_people: np.ndarray
+    people_per_room: np.ndarray
+    hotel_per_night: np.ndarray
+    hotel_nights: np.ndarray
+    per_diem_per_day: np.ndarray
+    per_diem_days: np.ndarray
+    round_trip: np.ndarray
+    # Pricing levers, taken from the rules unless a caller overrides them
+    management_pct: np.ndarray
+    epp_markup: np.ndarray
+    consumables_rate: np.ndarray
+
+
+@dataclass
+class CommercializationColumns:
+    """Flattened commercialization lines of a batch; `quote` maps each line to its row."""
+    quote: np.ndarray
+    qty: np.ndarray
+    vendor_cost: np.ndarray
+    margin: np.ndarray
+    items: List[Dict[str, Any]]
+
+
+class BatchQuotationCalculator:
+    def __init__(self, rules: Union[CompiledRules, Dict[str, Any]], catalog_epp: Dict[str, Any]):
+        self.rules = rules if isinstance(rules, CompiledRules) else compile_rules(rules)
+        self.catalog_epp = catalog_epp
+        self.epp_prices = np.array([
+            self.catalog_epp[sku].pricePlusIva if sku in self.catalog_epp else 0.0
+            for sku in EPP_KIT_SKUS
+        ])
+
+    # ---------- Column extraction ----------
+
+    def commercialization_columns(self, inputs: List[Dict[str, Any]]) -> CommercializationColumns:
+        quote_idx, qty, vendor_cost, margin, items = [], [], [], [], []
+        default_margin = self.rules.comm_default_margin
+        for i, data in enumerate(inputs):
+            comm = data.get("commercialization", {"enabled": False, "items": []})
+            if not comm.get("enabled"):
+                continue
+            for it in comm.get("items", []):
+                m = it.get("marginPct")
+                quote_idx.append(i)
+                qty.append(it.get("qty", 0))
+                vendor_cost.append(it.get("vendorCost", 0))
+                margin.append(default_margin if m is None else m)
+                items.append(it)
+        return CommercializationColumns(
+            quote=np.array(quote_idx, dtype=np.intp),
+            qty=np.array(qty, dtype=float),
+            vendor_cost=np.array(vendor_cost, dtype=float),
+            margin=np.array(margin, dtype=float),
+            items=items,
+        )
+
+    def price_commercialization_columns(self, comm: CommercializationColumns, n: int) -> Dict[str, np.ndarray]:
+        line_cost = comm.vendor_cost * comm.qty
+        line_price = line_cost * (1 + comm.margin)
+        # bincount adds sequentially in input order, same as the += loop in price_commercialization
+        cost_real = np.bincount(comm.quote, weights=line_cost, minlength=n)
+        price = np.bincount(comm.quote, weights=line_price, minlength=n)
+        return {
+            "line_cost": line_cost,
+            "line_price": line_price,
+            "cost_real": cost_real,
+            "price": price,
+        }
+
+    def columns(self, inputs: List[Dict[str, Any]], comm_cost: Optional[np.ndarray] = None,
+                comm_price: Optional[np.ndarray] = None) -> QuoteColumns:
+        n = len(inputs)
+        if comm_cost is None or comm_price is None:
+            comm = self.price_commercialization_columns(self.commercialization_columns(inputs), n)
+            comm_cost, comm_price = round2(comm["cost_real"]), round2(comm["price"])
+
+        logistics = [data.get("logistics", {"enabled": False}) for data in inputs]
+
+        def flag(section):
+            return np.array([bool(data.get(section, {}).get("enabled", True)) for data in inputs])
+
+        def logistic(key, default):
+            return np.array([lg.get(key, default) for lg in logistics], dtype=float)
+
+        return QuoteColumns(
+            people=np.array([sum(int(v) for v in data.get("peopleByRole", {}).values()) for data in inputs], dtype=np.int64),
+            months=np.array([float(data.get("durationMonths", 1)) for data in inputs]),
+            welders=np.array([int(data.get("weldersCount", 0)) for data in inputs], dtype=np.int64),
+            dc3_people=np.array([int(data.get("dc3PeopleCount", 0)) for data in inputs], dtype=np.int64),
+            dc3_packages=np.array([int(data.get("dc3PackageCount", 0)) for data in inputs], dtype=np.int64),
+            medical=flag("medical"),
+            epp=flag("epp"),
+            platform_pm=flag("platformPM"),
+            iso=flag("iso"),
+            comm_cost=comm_cost,
+            comm_price=comm_price,
+            logistics=np.array([bool(lg.get("enabled")) for lg in logistics]),
+            travel_people=logistic("travelPeopleCount", 0),
+            people_per_room=logistic("peoplePerRoom", 2),
+            hotel_per_night=logistic("hotelPerNight", 1200),
+            hotel_nights=logistic("hotelNights", 0),
+            per_diem_per_day=logistic("perDiemPerDay", 350),
+            per_diem_days=logistic("perDiemDays", 0),
+            round_trip=logistic("roundTripTravelPerPerson", 6342),
+            management_pct=np.full(n, self.rules.management_pct),
+            epp_markup=np.full(n, self.rules.epp_markup),
+            consumables_rate=np.full(n, float(self.rules.consumables_rate)),
+        )
+
+    # ---------- Formulas ----------
+
+    def epp_quantities(self, people, months) -> List[np.ndarray]:
+        working_days = self.rules.epp_working_days
+        return [
+            1 * people,
+            1 * people,
+            1 * people,
+            1 * people,
+            4 * people * months,
+            4 * people * months,
+            1 * people * (working_days * months),
+        ]
+
+    def evaluate(self, cols: QuoteColumns) -> Dict[str, np.ndarray]:
+        """Run every division formula over the columns. Values rounded by compute()
+        before being reused (EPP and commercialization totals) are rounded here too."""
+        rules = self.rules
+        people, months = cols.people, cols.months
+
+        labor_cost = rules.labor_monthly * months * people
+
+        welders = cols.welders
+        welding_units = np.where(welders > 0, np.ceil(welders / 10), 0).astype(np.int64)
+        welding_real = welding_units * rules.welding_cost * months
+        welding_billed = welding_units * rules.welding_price * months
+        welding_consumables = welders * cols.consumables_rate * months
+
+        dc3_cost = (cols.dc3_people * rules.dc3_cost) + (cols.dc3_packages * rules.dc3_cost * 3)
+        dc3_sell = (cols.dc3_people * rules.dc3_sell) + (cols.dc3_packages * rules.dc3_package)
+
+        medical_cost = np.where(cols.medical, people * rules.medical_cost, 0)
+        medical_sell = np.where(cols.medical, people * rules.medical_sell, 0)
+
+        epp_raw_cost = 0.0
+        for price, q in zip(self.epp_prices.tolist(), self.epp_quantities(people, months)):
+            epp_raw_cost = epp_raw_cost + price * q
+        epp_raw_sell = epp_raw_cost * (1 + cols.epp_markup)
+        epp_cost = np.where(cols.epp, round2(epp_raw_cost), 0)
+        epp_sell = np.where(cols.epp, round2(epp_raw_sell), 0)
+
+        pm_fee = np.where(cols.platform_pm, rules.pm_fee_rate * people * months, 0)
+        iso_fee = np.where(cols.iso, rules.iso_fee_rate * months, 0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rooms = np.ceil(cols.travel_people / cols.people_per_room)
+            hotel = rooms * cols.hotel_per_night * cols.hotel_nights
+        per_diem = cols.travel_people * cols.per_diem_per_day * cols.per_diem_days
+        travel = cols.travel_people * cols.round_trip
+        logistics_cost = np.where(cols.logistics, hotel + per_diem + travel, 0.0)
+
+        direct_real = (labor_cost + welding_real + welding_consumables + dc3_cost + medical_cost
+                       + epp_cost + cols.comm_cost + pm_fee + iso_fee + logistics_cost)
+        direct_pricing_base = (labor_cost + welding_billed + welding_consumables + dc3_sell + medical_sell
+                               + epp_sell + cols.comm_price + pm_fee + iso_fee + logistics_cost)
+
+        management_fee = direct_pricing_base * cols.management_pct
+        subtotal = direct_pricing_base + management_fee
+        iva = subtotal * IVA_PCT
+        total = subtotal + iva
+
+        gross_profit = (direct_pricing_base + management_fee) - direct_real
+        positive = subtotal > 0
+        margin_pct = np.where(positive, gross_profit / np.where(positive, subtotal, 1) * 100, 0)
+
+        return {
+            "people": people,
+            "months": months,
+            "labor_cost": labor_cost,
+            "welding_units": welding_units,
+            "welding_real": welding_real,
+            "welding_billed": welding_billed,
+            "welding_consumables": welding_consumables,
+            "dc3_cost": dc3_cost,
+            "dc3_sell": dc3_sell,
+            "medical_cost": medical_cost,
+            "medical_sell": medical_sell,
+            "epp_raw_cost": epp_raw_cost,
+            "epp_cost": epp_cost,
+            "epp_sell": epp_sell,
+            "pm_fee": pm_fee,
+            "iso_fee": iso_fee,
+            "logistics_cost": logistics_cost,
+            "direct_real": direct_real,
+            "direct_pricing_base": direct_pricing_base,
+            "management_fee": management_fee,
+            "subtotal": subtotal,
+            "iva": iva,
+            "total": total,
+            "gross_profit": gross_profit,
+            "margin_pct": margin_pct,
+        }
+
+    # ---------- compute() compatible output ----------
+
+    def compute_many(self, inputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Same result as [QuotationCalculator.compute(x) for x in inputs], in one columnar pass."""
+        n = len(inputs)
+        comm_cols = self.commercialization_columns(inputs)
+        comm = self.price_commercialization_columns(comm_cols, n)
+        comm_cost, comm_price = round2(comm["cost_real"]), round2(comm["price"])
+        cols = self.columns(inputs, comm_cost=comm_cost, comm_price=comm_price)
+        res = self.evaluate(cols)
+
+        rounded = {
+            key: round2(res[key]).tolist()
+            for key in (
+                "labor_cost", "welding_real", "welding_billed", "welding_consumables",
+                "dc3_cost", "dc3_sell", "medical_cost", "medical_sell", "pm_fee", "iso_fee",
+                "logistics_cost", "direct_real", "direct_pricing_base", "management_fee",
+                "subtotal", "iva", "total", "gross_profit", "margin_pct",
+            )
+        }
+        rounded["welding_profit"] = round2(res["welding_billed"] - res["welding_real"]).tolist()
+        rounded["dc3_profit"] = round2(res["dc3_sell"] - res["dc3_cost"]).tolist()
+        rounded["medical_profit"] = round2(res["medical_sell"] - res["medical_cost"]).tolist()
+        comm_profit = round2(comm["price"] - comm["cost_real"]).tolist()
+
+        epp_lines = self._epp_lines(cols)
+        comm_lines = self._comm_lines(comm_cols, comm, n)
+
+        people = cols.people.tolist()
+        months = cols.months.tolist()
+        welding_units = res["welding_units"].tolist()
+        epp_enabled = cols.epp.tolist()
+        comm_cost_list, comm_price_list = comm_cost.tolist(), comm_price.tolist()
+
+        results = []
+        for i, data in enumerate(inputs):
+            r = {key: col[i] for key, col in rounded.items()}
+            comm_enabled = bool(data.get("commercialization", {"enabled": False}).get("enabled"))
+            comm_totals = (
+                {"cost": comm_cost_list[i], "sell": comm_price_list[i], "profit": comm_profit[i]}
+                if comm_enabled else {"cost": 0, "sell": 0, "profit": 0}
+            )
+            client_quote = {
+                "header": {
+                    "company": "GRUPO MICSA",
+                    "clientName": data.get("clientName"),
+                    "projectName": data.get("projectName"),
+                    "location": data.get("location"),
+                    "workType": data.get("workType"),
+                    "durationMonths": months[i],
+                    "paymentTerms": data.get("paymentTerms", "NETO 30")
+                },
+                "commercial": {
+                    "subtotal": r["subtotal"],
+                    "iva": r["iva"],
+                    "total": r["total"],
+                    "currency": "MXN",
+                    "validity": "15 días",
+                    "notes": [
+                        "Tiempo extra no incluido. Se cotiza por separado conforme a ley.",
+                        "Gestión MICSA obligatoria (15%)."
+                    ]
+                }
+            }
+            risk_flags = [
+                "⚠️ Riesgo financiero por cobranza (NETO 30)" if "NETO 30" in data.get("paymentTerms", "").upper() else None,
+                "⚠️ Proyecto grande (>50 personas)" if people[i] > 50 else None
+            ]
+            internal = {
+                "totals": {
+                    "people": people[i],
+                    "directRealCost": r["direct_real"],
+                    "pricingBase": r["direct_pricing_base"],
+                    "managementFee15": r["management_fee"],
+                    "grossProfitBeforeIva": r["gross_profit"],
+                    "marginPct": r["margin_pct"]
+                },
+                "divisions": {
+                    "labor": {"cost": r["labor_cost"]},
+                    "welding": {
+                        "units": welding_units[i],
+                        "costReal": r["welding_real"],
+                        "billed": r["welding_billed"],
+                        "profit": r["welding_profit"],
+                        "consumables": r["welding_consumables"]
+                    },
+                    "dc3": {"cost": r["dc3_cost"], "sell": r["dc3_sell"], "profit": r["dc3_profit"]},
+                    "medical": {"cost": r["medical_cost"], "sell": r["medical_sell"], "profit": r["medical_profit"]},
+                    "epp": epp_lines[i]["totals"] if epp_enabled[i] else {"costRealPlusIva": 0, "sellPriceToMicsaPlusIva": 0, "profitPlusIva": 0, "markupPct": 0.25},
+                    "commercialization": comm_totals,
+                    "platformPM": {"sell": r["pm_fee"]},
+                    "iso": {"sell": r["iso_fee"]},
+                    "logistics": {"cost": r["logistics_cost"]}
+                },
+                "eppLines": epp_lines[i]["lines"] if epp_enabled[i] else [],
+                "commLines": comm_lines[i] if comm_enabled else [],
+                "riskFlags": [f for f in risk_flags if f]
+            }
+            results.append({
+                "clientQuote": client_quote,
+                "internal": internal,
+                "totals": {"subtotal": r["subtotal"], "iva": r["iva"], "total": r["total"]}
+            })
+        return results
+
+    def _epp_lines(self, cols: QuoteColumns) -> List[Dict[str, Any]]:
+        people, months = cols.people, cols.months
+        quantities = self.epp_quantities(people, months)
+        prices = self.epp_prices.tolist()
+        unit_prices = round2(self.epp_prices).tolist()
+
+        raw_cost = 0.0
+        line_costs = []
+        for price, q in zip(prices, quantities):
+            line_cost = price * q
+            raw_cost = raw_cost + line_cost
+            line_costs.append(round2(line_cost).tolist())
+        raw_sell = raw_cost * (1 + cols.epp_markup)
+        cost_r = round2(raw_cost).tolist()
+        sell_r = round2(raw_sell).tolist()
+        profit_r = round2(raw_sell - raw_cost).tolist()
+        markup = cols.epp_markup.tolist()
+        qty_lists = [q.tolist() for q in quantities]
+
+        catalog = []
+        for sku in EPP_KIT_SKUS:
+            item = self.catalog_epp.get(sku)
+            catalog.append((item.name if item else "SKU_NO_ENCONTRADO", item.unit if item else "pz"))
+
+        out = []
+        for i in range(len(cost_r)):
+            lines = []
+            for k, sku in enumerate(EPP_KIT_SKUS):
+                name, unit = catalog[k]
+                lines.append({
+                    "sku": sku,
+                    "name": name,
+                    "unit": unit,
+                    "qty": qty_lists[k][i],
+                    "unitPricePlusIva": unit_prices[k],
+                    "lineCostPlusIva": line_costs[k][i]
+                })
+            out.append({
+                "lines": lines,
+                "totals": {
+                    "costRealPlusIva": cost_r[i],
+                    "sellPriceToMicsaPlusIva": sell_r[i],
+                    "profitPlusIva": profit_r[i],
+                    "markupPct": markup[i]
+                }
+            })
+        return out
+
+    def _comm_lines(self, comm_cols: CommercializationColumns, comm: Dict[str, np.ndarray],
+                    n: int) -> List[List[Dict[str, Any]]]:
+        out: List[List[Dict[str, Any]]] = [[] for _ in range(n)]
+        line_cost = round2(comm["line_cost"]).tolist()
+        line_price = round2(comm["line_price"]).tolist()
+        line_profit = round2(comm["line_price"] - comm["line_cost"]).tolist()
+        margins = comm_cols.margin.tolist()
+        for k, (q, it) in enumerate(zip(comm_cols.quote.tolist(), comm_cols.items)):
+            out[q].append({
+                **it,
+                "marginPct": margins[k],
+                "lineCost": line_cost[k],
+                "linePrice": line_price[k],
+                "lineProfit": line_profit[k]
+            })
+        return out
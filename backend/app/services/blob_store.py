@@ -0,0 +1,81 @@
+# MICSA OS - Content-Addressed Blob Store
+# Signature images live on disk under <root>/<aa>/<bb>/<sha256>; rows keep only the
+# hash. Identical images are stored once, and a blob never changes once written, so
+# it can be served with an immutable cache policy.
+import base64
+import binascii
+import hashlib
+import os
+import re
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+# magic bytes -> media type, for serving
+_IMAGE_TYPES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"RIFF", "image/webp"),
+)
+
+
+def decode_base64_image(value: str) -> bytes:
+    """Base64 (optionally a data: URL) -> raw bytes; ValueError when malformed or empty."""
+    if value.startswith("data:"):
+        value = value.split(",", 1)[-1]
+    try:
+        data = base64.b64decode(value, validate=True)
+    except binascii.Error as e:
+        raise ValueError(str(e))
+    if not data:
+        raise ValueError("imagen vacía")
+    return data
+
+
+def is_sha256(value: str) -> bool:
+    return bool(_SHA256.match(value or ""))
+
+
+def media_type(data: bytes) -> str:
+    for magic, kind in _IMAGE_TYPES:
+        if data.startswith(magic):
+            return kind
+    return "application/octet-stream"
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        if not is_sha256(sha256):
+            raise ValueError("hash inválido")
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return is_sha256(sha256) and os.path.exists(self.path(sha256))
+
+    def put(self, data: bytes) -> str:
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            # Concurrent writers of the same content race harmlessly to the same bytes
+            os.replace(tmp, path)
+        return sha256
+
+    def get(self, sha256: Optional[str]) -> Optional[bytes]:
+        if not sha256 or not self.exists(sha256):
+            return None
+        with open(self.path(sha256), "rb") as f:
+            return f.read()
+
+
+signature_blobs = BlobStore(os.path.join(settings.UPLOADS_PATH, "firmas_blobs"))
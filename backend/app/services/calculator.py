@@ -1,13 +1,47 @@
 # MICSA OS - Quotation Calculator Service
 import math
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Union, NamedTuple, Optional, Tuple, Set, Iterable
+from app.services.pricing_rules import CompiledRules, compile_rules
 
 def r2(n: float) -> float:
     return round(n, 2)
 
+# Order matters: it is the summation order of directRealCost and pricingBase
+DIVISIONS = ("labor", "welding", "dc3", "medical", "epp", "commercialization", "platformPM", "iso", "logistics")
+
+# Input field -> divisions that read it. "header" and "riskFlags" are always re-derived.
+INPUT_DEPENDENCIES = {
+    "peopleByRole": ("labor", "medical", "epp", "platformPM"),
+    "durationMonths": ("labor", "welding", "epp", "platformPM", "iso"),
+    "weldersCount": ("welding",),
+    "dc3PeopleCount": ("dc3",),
+    "dc3PackageCount": ("dc3",),
+    "medical": ("medical",),
+    "epp": ("epp",),
+    "commercialization": ("commercialization",),
+    "platformPM": ("platformPM",),
+    "iso": ("iso",),
+    "logistics": ("logistics",),
+}
+
+# Divisions whose saved output can be reused as-is when none of their inputs changed
+REUSABLE_DIVISIONS = ("epp", "commercialization")
+
+def affected_divisions(changed_fields: Iterable[str]) -> Set[str]:
+    dirty = set()
+    for field in changed_fields:
+        dirty.update(INPUT_DEPENDENCIES.get(field, ()))
+    return dirty
+
+class DivisionResult(NamedTuple):
+    real: Tuple[float, ...]      # terms of directRealCost
+    pricing: Tuple[float, ...]   # terms of pricingBase
+    internal: Dict[str, Any]     # internal["divisions"][name]
+    lines: Optional[List[Dict[str, Any]]] = None  # eppLines / commLines
+
 class QuotationCalculator:
-    def __init__(self, rules: Dict[str, Any], catalog_epp: Dict[str, Any]):
-        self.rules = rules
+    def __init__(self, rules: Union[CompiledRules, Dict[str, Any]], catalog_epp: Dict[str, Any]):
+        self.rules = rules if isinstance(rules, CompiledRules) else compile_rules(rules)
         self.catalog_epp = catalog_epp
 
     def estimate_epp(self, people: int, months: float) -> Dict[str, Any]:
@@ -22,7 +56,7 @@ class QuotationCalculator:
         add("LENTE_BASICO", 4 * people * months)
         add("GUANTE_NITRILO", 4 * people * months)
         
-        working_days = self.rules.get("epp", {}).get("workingDaysMonth", 26)
+        working_days = self.rules.epp_working_days
         add("TAPON_DESECHABLE", 1 * people * (working_days * months))
 
         cost_real_plus_iva = 0.0
@@ -41,7 +75,7 @@ class QuotationCalculator:
                 "lineCostPlusIva": r2(line_cost)
             })
 
-        markup = self.rules.get("epp", {}).get("markupPct", 0.25)
+        markup = self.rules.epp_markup
         sell = cost_real_plus_iva * (1 + markup)
         
         return {
@@ -58,10 +92,12 @@ class QuotationCalculator:
         cost_real = 0.0
         price = 0.0
         lines = []
-        default_margin = self.rules.get("commercialization", {}).get("defaultMarginPct", 0.20)
+        default_margin = self.rules.comm_default_margin
         
         for it in items:
-            m = it.get("marginPct", default_margin)
+            m = it.get("marginPct")
+            if m is None:
+                m = default_margin
             qty = it.get("qty", 0)
             vendor_cost = it.get("vendorCost", 0)
             line_cost = vendor_cost * qty
@@ -84,52 +120,90 @@ class QuotationCalculator:
             "lines": lines
         }
 
-    def compute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        iva_pct = 0.16 # Default or from config
-        
+    # ---------- Divisions ----------
+    # Each division returns its terms of directRealCost and pricingBase; assemble() adds
+    # them in DIVISIONS order, which is the summation order the totals have always used.
+
+    def _people_months(self, input_data: Dict[str, Any]):
         people = sum(int(v) for v in input_data.get("peopleByRole", {}).values())
         months = float(input_data.get("durationMonths", 1))
+        return people, months
+
+    def division(self, name: str, input_data: Dict[str, Any]) -> DivisionResult:
+        people, months = self._people_months(input_data)
+        return getattr(self, f"_division_{name}")(input_data, people, months)
 
-        labor_rules = self.rules.get("labor", {"weekly": 6489.25, "weeksMonth": 4})
-        labor_monthly = labor_rules["weekly"] * labor_rules["weeksMonth"]
-        labor_cost = labor_monthly * months * people
+    def _division_labor(self, input_data, people, months) -> DivisionResult:
+        labor_cost = self.rules.labor_monthly * months * people
+        return DivisionResult((labor_cost,), (labor_cost,), {"cost": r2(labor_cost)})
 
+    def _division_welding(self, input_data, people, months) -> DivisionResult:
+        rules = self.rules
         welders_count = int(input_data.get("weldersCount", 0))
-        welding_rules = self.rules.get("welding", {"per10Month": {"cost": 18446.96, "price": 21213}})
         welding_units = math.ceil(welders_count / 10) if welders_count > 0 else 0
-        welding_real = welding_units * welding_rules["per10Month"]["cost"] * months
-        welding_billed = welding_units * welding_rules["per10Month"]["price"] * months
+        welding_real = welding_units * rules.welding_cost * months
+        welding_billed = welding_units * rules.welding_price * months
         
-        consumables_rate = self.rules.get("weldingConsumablesPerWelderMonth", 3800)
-        welding_consumables = welders_count * consumables_rate * months
+        welding_consumables = welders_count * rules.consumables_rate * months
+        return DivisionResult(
+            (welding_real, welding_consumables),
+            (welding_billed, welding_consumables),
+            {
+                "units": welding_units,
+                "costReal": r2(welding_real),
+                "billed": r2(welding_billed),
+                "profit": r2(welding_billed - welding_real),
+                "consumables": r2(welding_consumables)
+            }
+        )
 
-        dc3_rules = self.rules.get("dc3", {"sell": 500, "package": 1500, "cost": 100})
+    def _division_dc3(self, input_data, people, months) -> DivisionResult:
+        rules = self.rules
         dc3_people = int(input_data.get("dc3PeopleCount", 0))
         dc3_packages = int(input_data.get("dc3PackageCount", 0))
-        dc3_cost = (dc3_people * dc3_rules["cost"]) + (dc3_packages * dc3_rules["cost"] * 3)
-        dc3_sell = (dc3_people * dc3_rules["sell"]) + (dc3_packages * dc3_rules["package"])
+        dc3_cost = (dc3_people * rules.dc3_cost) + (dc3_packages * rules.dc3_cost * 3)
+        dc3_sell = (dc3_people * rules.dc3_sell) + (dc3_packages * rules.dc3_package)
+        return DivisionResult((dc3_cost,), (dc3_sell,), {"cost": r2(dc3_cost), "sell": r2(dc3_sell), "profit": r2(dc3_sell - dc3_cost)})
 
-        med_rules = self.rules.get("medical", {"cost": 250, "sell": 350})
+    def _division_medical(self, input_data, people, months) -> DivisionResult:
         medical_enabled = input_data.get("medical", {}).get("enabled", True)
-        medical_cost = (people * med_rules["cost"]) if medical_enabled else 0
-        medical_sell = (people * med_rules["sell"]) if medical_enabled else 0
+        medical_cost = (people * self.rules.medical_cost) if medical_enabled else 0
+        medical_sell = (people * self.rules.medical_sell) if medical_enabled else 0
+        return DivisionResult((medical_cost,), (medical_sell,), {"cost": r2(medical_cost), "sell": r2(medical_sell), "profit": r2(medical_sell - medical_cost)})
 
+    def _division_epp(self, input_data, people, months) -> DivisionResult:
         epp_enabled = input_data.get("epp", {}).get("enabled", True)
-        epp = self.estimate_epp(people, months) if epp_enabled else None
-        epp_cost = epp["totals"]["costRealPlusIva"] if epp_enabled else 0
-        epp_sell = epp["totals"]["sellPriceToMicsaPlusIva"] if epp_enabled else 0
+        if not epp_enabled:
+            return DivisionResult((0,), (0,), {"costRealPlusIva": 0, "sellPriceToMicsaPlusIva": 0, "profitPlusIva": 0, "markupPct": 0.25}, [])
+        epp = self.estimate_epp(people, months)
+        return DivisionResult(
+            (epp["totals"]["costRealPlusIva"],),
+            (epp["totals"]["sellPriceToMicsaPlusIva"],),
+            epp["totals"],
+            epp["lines"]
+        )
 
+    def _division_commercialization(self, input_data, people, months) -> DivisionResult:
         comm_data = input_data.get("commercialization", {"enabled": False, "items": []})
         comm = self.price_commercialization(comm_data.get("items", [])) if comm_data.get("enabled") else {"costReal": 0, "price": 0, "profit": 0, "lines": []}
+        return DivisionResult(
+            (comm["costReal"],),
+            (comm["price"],),
+            {"cost": comm["costReal"], "sell": comm["price"], "profit": comm["profit"]},
+            comm["lines"]
+        )
 
-        pm_fee_rate = self.rules.get("platformPM", {}).get("feePerPersonMonth", 180)
+    def _division_platformPM(self, input_data, people, months) -> DivisionResult:
         pm_enabled = input_data.get("platformPM", {}).get("enabled", True)
-        pm_fee = (pm_fee_rate * people * months) if pm_enabled else 0
+        pm_fee = (self.rules.pm_fee_rate * people * months) if pm_enabled else 0
+        return DivisionResult((pm_fee,), (pm_fee,), {"sell": r2(pm_fee)})
 
-        iso_fee_rate = self.rules.get("iso", {}).get("feePerProjectMonth", 3500)
+    def _division_iso(self, input_data, people, months) -> DivisionResult:
         iso_enabled = input_data.get("iso", {}).get("enabled", True)
-        iso_fee = (iso_fee_rate * months) if iso_enabled else 0
+        iso_fee = (self.rules.iso_fee_rate * months) if iso_enabled else 0
+        return DivisionResult((iso_fee,), (iso_fee,), {"sell": r2(iso_fee)})
 
+    def _division_logistics(self, input_data, people, months) -> DivisionResult:
         logistics = input_data.get("logistics", {"enabled": False})
         logistics_cost = 0.0
         if logistics.get("enabled"):
@@ -138,12 +212,35 @@ class QuotationCalculator:
             per_diem = logistics.get("travelPeopleCount", 0) * logistics.get("perDiemPerDay", 350) * logistics.get("perDiemDays", 0)
             travel = logistics.get("travelPeopleCount", 0) * logistics.get("roundTripTravelPerPerson", 6342)
             logistics_cost = hotel + per_diem + travel
+        return DivisionResult((logistics_cost,), (logistics_cost,), {"cost": r2(logistics_cost)})
+
+    @staticmethod
+    def stored_division(name: str, internal: Dict[str, Any]) -> DivisionResult:
+        """Rebuild a division from a saved internal_data. Only valid for EPP and
+        commercialization, whose totals compute() already rounds before summing."""
+        d = internal["divisions"][name]
+        if name == "epp":
+            return DivisionResult((d["costRealPlusIva"],), (d["sellPriceToMicsaPlusIva"],), d, internal.get("eppLines", []))
+        if name == "commercialization":
+            return DivisionResult((d["cost"],), (d["sell"],), d, internal.get("commLines", []))
+        raise ValueError(f"La división {name} no puede reutilizarse desde internal_data")
+
+    # ---------- Totals ----------
+
+    def assemble(self, input_data: Dict[str, Any], divisions: Dict[str, DivisionResult]) -> Dict[str, Any]:
+        iva_pct = 0.16 # Default or from config
+        people, months = self._people_months(input_data)
 
-        direct_real = labor_cost + welding_real + welding_consumables + dc3_cost + medical_cost + epp_cost + comm["costReal"] + pm_fee + iso_fee + logistics_cost
-        direct_pricing_base = labor_cost + welding_billed + welding_consumables + dc3_sell + medical_sell + epp_sell + comm["price"] + pm_fee + iso_fee + logistics_cost
+        # Explicit left-to-right sums (sum() may use compensated summation for floats)
+        direct_real = 0.0
+        direct_pricing_base = 0.0
+        for name in DIVISIONS:
+            for term in divisions[name].real:
+                direct_real = direct_real + term
+            for term in divisions[name].pricing:
+                direct_pricing_base = direct_pricing_base + term
 
-        mgmt_pct = self.rules.get("managementPct", 0.15)
-        management_fee = direct_pricing_base * mgmt_pct
+        management_fee = direct_pricing_base * self.rules.management_pct
 
         subtotal = direct_pricing_base + management_fee
         iva = subtotal * iva_pct
@@ -184,25 +281,9 @@ class QuotationCalculator:
                 "grossProfitBeforeIva": r2(gross_profit),
                 "marginPct": r2(margin_pct)
             },
-            "divisions": {
-                "labor": {"cost": r2(labor_cost)},
-                "welding": {
-                    "units": welding_units,
-                    "costReal": r2(welding_real),
-                    "billed": r2(welding_billed),
-                    "profit": r2(welding_billed - welding_real),
-                    "consumables": r2(welding_consumables)
-                },
-                "dc3": {"cost": r2(dc3_cost), "sell": r2(dc3_sell), "profit": r2(dc3_sell - dc3_cost)},
-                "medical": {"cost": r2(medical_cost), "sell": r2(medical_sell), "profit": r2(medical_sell - medical_cost)},
-                "epp": epp["totals"] if epp else {"costRealPlusIva": 0, "sellPriceToMicsaPlusIva": 0, "profitPlusIva": 0, "markupPct": 0.25},
-                "commercialization": {"cost": comm["costReal"], "sell": comm["price"], "profit": comm["profit"]},
-                "platformPM": {"sell": r2(pm_fee)},
-                "iso": {"sell": r2(iso_fee)},
-                "logistics": {"cost": r2(logistics_cost)}
-            },
-            "eppLines": epp["lines"] if epp else [],
-            "commLines": comm["lines"],
+            "divisions": {name: divisions[name].internal for name in DIVISIONS},
+            "eppLines": divisions["epp"].lines,
+            "commLines": divisions["commercialization"].lines,
             "riskFlags": [
                 "⚠️ Riesgo financiero por cobranza (NETO 30)" if "NETO 30" in input_data.get("paymentTerms", "").upper() else None,
                 "⚠️ Proyecto grande (>50 personas)" if people > 50 else None
@@ -215,3 +296,20 @@ class QuotationCalculator:
             "internal": internal,
             "totals": {"subtotal": r2(subtotal), "iva": r2(iva), "total": r2(total)}
         }
+
+    def compute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        return self.assemble(input_data, {name: self.division(name, input_data) for name in DIVISIONS})
+
+    def recompute(self, input_data: Dict[str, Any], previous_internal: Dict[str, Any],
+                  changed_fields: Set[str]) -> Dict[str, Any]:
+        """compute() for an edited quote: EPP and commercialization are reused from the
+        saved internal_data unless a changed input field feeds them."""
+        dirty = affected_divisions(changed_fields)
+        people, months = self._people_months(input_data)
+        divisions = {}
+        for name in DIVISIONS:
+            if name in REUSABLE_DIVISIONS and name not in dirty and name in previous_internal.get("divisions", {}):
+                divisions[name] = self.stored_division(name, previous_internal)
+            else:
+                divisions[name] = getattr(self, f"_division_{name}")(input_data, people, months)
+        return self.assemble(input_data, divisions)
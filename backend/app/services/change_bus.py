@@ -0,0 +1,109 @@
+# MICSA OS - In-Process Change Bus
+# SessionLocal flushes record which topics a transaction touched; after_commit hands
+# them to the event loop, where listeners (the live dashboard) react. Rolled-back
+# transactions publish nothing. Only this worker's commits are seen: listeners that
+# need cross-worker freshness must also resync periodically.
+import asyncio
+import logging
+from typing import Callable, Iterable, List, Optional, Set
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.compliance import ComplianceExpediente
+from app.models.cotizacion import Cotizacion
+from app.models.empleado import Empleado
+from app.models.firma_electronica import DocumentoFirma, Firmante
+from app.models.legal import ExpedienteLegal
+from app.models.notification import NotificationOutbox
+from app.models.proyecto import Proyecto, FirmaRequest
+
+logger = logging.getLogger(__name__)
+
+TOPIC_MODELS = {
+    Cotizacion: "quotes",
+    Proyecto: "projects",
+    FirmaRequest: "projects",
+    DocumentoFirma: "firmas",
+    Firmante: "firmas",
+    ComplianceExpediente: "compliance",
+    Empleado: "empleados",
+    ExpedienteLegal: "legal",
+    NotificationOutbox: "outbox",
+}
+
+_SESSION_KEY = "changed_topics"
+
+
+class ChangeBus:
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.listeners: List[Callable[[Set[str]], None]] = []
+        self.sync_listeners: List[Callable[[Set[str]], None]] = []
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Deliver to listeners on this loop (called at app startup)."""
+        self.loop = loop
+
+    def add_listener(self, callback: Callable[[Set[str]], None]) -> None:
+        """callback(topics) runs on the bound loop; it must not block."""
+        self.listeners.append(callback)
+
+    def add_sync_listener(self, callback: Callable[[Set[str]], None]) -> None:
+        """callback(topics) runs in the committing thread (cache invalidation); keep it cheap."""
+        self.sync_listeners.append(callback)
+
+    def publish(self, topics: Iterable[str]) -> None:
+        """Thread-safe: usable from the sync endpoints' worker threads."""
+        topics = set(topics)
+        if not topics:
+            return
+        for callback in self.sync_listeners:
+            try:
+                callback(topics)
+            except Exception:
+                logger.exception("Error en listener del change bus")
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._deliver, topics)
+
+    def _deliver(self, topics: Set[str]) -> None:
+        for callback in self.listeners:
+            try:
+                callback(topics)
+            except Exception:
+                logger.exception("Error en listener del change bus")
+
+
+change_bus = ChangeBus()
+
+
+def mark_changed(session: Session, *topics: str) -> None:
+    """For writes the flush hook cannot see (Core bulk INSERT/UPDATE)."""
+    session.info.setdefault(_SESSION_KEY, set()).update(topics)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    topics = {
+        TOPIC_MODELS[type(obj)]
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if type(obj) in TOPIC_MODELS
+    }
+    if topics:
+        mark_changed(session, *topics)
+
+
+def _after_commit(session: Session) -> None:
+    topics = session.info.pop(_SESSION_KEY, None)
+    if topics:
+        change_bus.publish(topics)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+event.listen(SessionLocal, "after_flush", _after_flush)
+event.listen(SessionLocal, "after_commit", _after_commit)
+event.listen(SessionLocal, "after_rollback", _after_rollback)
@@ -0,0 +1,229 @@
+# MICSA OS - Compliance Chunked Uploads
+# Large evidence files (SUA, nómina ZIPs) are uploaded in parts: the client opens an
+# upload session, PUTs byte ranges at the session's offset and, after a dropped
+# connection, asks for the offset and continues from there. Bytes go straight from the
+# request stream to <root>/.uploads/<id>.part in bounded chunks while the sha256 is
+# updated; the part file lives under the same root as the expedientes, so completing
+# the upload is an atomic rename into <root>/<OC>/<category>/.
+#
+# One request writes a part file at a time, across workers: a PUT claims the upload
+# with a conditional UPDATE (its token plus a lease) before touching the file, renews
+# the lease while bytes arrive and releases it when done.
+#
+# The running sha256 is kept per process. A resume that lands on another worker (or
+# after a restart) rebuilds it by reading the partial file once.
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import anyio
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
+
+from app.core.config import settings
+from app.models.compliance import ComplianceUpload
+
+WRITE_CHUNK = 1024 * 1024
+
+# upload id -> (bytes hashed, running sha256)
+_hashers: Dict[str, Tuple[int, "hashlib._Hash"]] = {}
+
+
+class UploadTooLarge(Exception):
+    """The request carried more bytes than the session declared."""
+
+
+class ClaimLost(Exception):
+    """The lease lapsed and another request claimed the upload."""
+
+
+def storage_root() -> str:
+    return os.path.abspath(settings.COMPLIANCE_STORAGE_PATH)
+
+
+def allowed_roots() -> Tuple[str, ...]:
+    """Real paths of the storage root and any configured legacy roots."""
+    legacy = [root.strip() for root in settings.COMPLIANCE_LEGACY_ROOTS.split(",") if root.strip()]
+    return tuple(os.path.realpath(root) for root in [storage_root(), *legacy])
+
+
+def stored_path(path: str) -> Optional[str]:
+    """Real path of a stored document, or None when it resolves outside every allowed
+    root (traversal, symlinks or absolute paths written into documents)."""
+    real = os.path.realpath(path)
+    for root in allowed_roots():
+        if os.path.commonpath([real, root]) == root:
+            return real
+    return None
+
+
+def part_path(upload_id: str) -> str:
+    return os.path.join(storage_root(), ".uploads", f"{upload_id}.part")
+
+
+def safe_segment(value: str) -> str:
+    """Category / field / OC as a single path segment; ValueError on traversal."""
+    segment = value.strip().replace("/", "_").replace("\\", "_").replace(" ", "_")
+    if not segment or segment in (".", "..") or segment.startswith("."):
+        raise ValueError(f"Nombre no válido: {value!r}")
+    return segment
+
+
+def destination(oc_number: str, category: str, field: str, filename: str) -> str:
+    """<root>/<OC>/<category>/<field>_<uuid><ext>"""
+    extension = os.path.splitext(filename or "")[1]
+    return os.path.join(
+        storage_root(), safe_segment(oc_number), safe_segment(category),
+        f"{safe_segment(field)}_{uuid.uuid4().hex}{extension}",
+    )
+
+
+def _lease_end() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.COMPLIANCE_UPLOAD_LEASE_SECONDS)
+
+
+async def claim(db: AsyncSession, upload_id: str, offset: int) -> Optional[str]:
+    """Take the upload for one PUT at offset; returns its token, or None when it is
+    completed, at another offset or held by a live claim. Commits."""
+    token = uuid.uuid4().hex
+    result = await db.execute(
+        update(ComplianceUpload)
+        .where(
+            ComplianceUpload.id == upload_id,
+            ComplianceUpload.status == "RECIBIENDO",
+            ComplianceUpload.offset == offset,
+            or_(ComplianceUpload.recibiendo_por.is_(None), ComplianceUpload.recibiendo_hasta < datetime.utcnow()),
+        )
+        .values(recibiendo_por=token, recibiendo_hasta=_lease_end())
+    )
+    await db.commit()
+    return token if result.rowcount == 1 else None
+
+
+async def release(db: AsyncSession, upload_id: str, token: str) -> None:
+    await db.execute(
+        update(ComplianceUpload)
+        .where(ComplianceUpload.id == upload_id, ComplianceUpload.recibiendo_por == token)
+        .values(recibiendo_por=None, recibiendo_hasta=None)
+    )
+    await db.commit()
+
+
+async def renewing(db: AsyncSession, upload_id: str, token: str,
+                   stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Pass the request body through, extending the claim every third of the lease;
+    ClaimLost if another request took the upload meanwhile."""
+    interval = settings.COMPLIANCE_UPLOAD_LEASE_SECONDS / 3
+    renew_at = time.monotonic() + interval
+    async for chunk in stream:
+        if time.monotonic() >= renew_at:
+            result = await db.execute(
+                update(ComplianceUpload)
+                .where(ComplianceUpload.id == upload_id, ComplianceUpload.recibiendo_por == token)
+                .values(recibiendo_hasta=_lease_end())
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                raise ClaimLost()
+            renew_at = time.monotonic() + interval
+        yield chunk
+
+
+def forget(upload_id: str) -> None:
+    _hashers.pop(upload_id, None)
+
+
+def _rehash(path: str, length: int) -> "hashlib._Hash":
+    digest = hashlib.sha256()
+    if length:
+        if not os.path.exists(path):
+            raise ValueError("Se perdió el archivo parcial")
+        with open(path, "rb") as f:
+            while length > 0:
+                chunk = f.read(min(WRITE_CHUNK, length))
+                if not chunk:
+                    raise ValueError("El archivo parcial es más corto que el offset registrado")
+                digest.update(chunk)
+                length -= len(chunk)
+    return digest
+
+
+async def _hasher(upload_id: str, offset: int) -> "hashlib._Hash":
+    cached = _hashers.get(upload_id)
+    if cached and cached[0] == offset:
+        return cached[1]
+    return await anyio.to_thread.run_sync(_rehash, part_path(upload_id), offset)
+
+
+async def append(upload: ComplianceUpload, offset: int, stream: AsyncIterator[bytes]) -> Tuple[int, bool]:
+    """Write the request body at offset. Returns (new offset, client disconnected).
+
+    Bytes past the confirmed offset left by an earlier broken request are discarded
+    first. A client that drops mid-request keeps whatever reached the disk."""
+    path = part_path(upload.id)
+    digest = (await _hasher(upload.id, offset)).copy()
+    remaining = upload.size - offset
+    written, buffer, disconnected = 0, bytearray(), False
+    await anyio.to_thread.run_sync(lambda: os.makedirs(os.path.dirname(path), exist_ok=True))
+    async with await anyio.open_file(path, "r+b" if offset else "wb") as f:
+        await f.truncate(offset)
+        await f.seek(offset)
+        try:
+            async for chunk in stream:
+                if written + len(buffer) + len(chunk) > remaining:
+                    raise UploadTooLarge()
+                buffer += chunk
+                if len(buffer) >= WRITE_CHUNK:
+                    await f.write(bytes(buffer))
+                    digest.update(buffer)
+                    written += len(buffer)
+                    buffer.clear()
+        except ClientDisconnect:
+            disconnected = True
+        if buffer:
+            await f.write(bytes(buffer))
+            digest.update(buffer)
+            written += len(buffer)
+        await f.flush()
+    _hashers[upload.id] = (offset + written, digest)
+    return offset + written, disconnected
+
+
+async def digest_of(upload: ComplianceUpload) -> str:
+    return (await _hasher(upload.id, upload.offset)).hexdigest()
+
+
+async def discard_part(upload_id: str) -> None:
+    forget(upload_id)
+    path = part_path(upload_id)
+    await anyio.to_thread.run_sync(lambda: os.path.exists(path) and os.remove(path))
+
+
+async def move_into_place(upload: ComplianceUpload, target: str) -> None:
+    """Atomic: the part file and the target share the storage root."""
+    def _move():
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(part_path(upload.id), target)
+    await anyio.to_thread.run_sync(_move)
+    forget(upload.id)
+
+
+async def purge_stale(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """Drop sessions not touched in COMPLIANCE_UPLOAD_EXPIRY_HOURS, with their part files."""
+    now = now or datetime.utcnow()
+    limite = now - timedelta(hours=settings.COMPLIANCE_UPLOAD_EXPIRY_HOURS)
+    stale = (await db.execute(
+        select(ComplianceUpload).where(
+            ComplianceUpload.status == "RECIBIENDO",
+            ComplianceUpload.updated_at < limite,
+        )
+    )).scalars().all()
+    for upload in stale:
+        await discard_part(upload.id)
+        await db.delete(upload)
+    return len(stale)
+
@@ -0,0 +1,273 @@
+# MICSA OS - Materialized CEO Dashboard
+# dashboard_snapshot holds the CEO KPIs in a single row. An after_flush listener on
+# SessionLocal applies the deltas of every Cotizacion / Proyecto / FirmaRequest write
+# in the same transaction, so /dashboard/ceo is one primary-key read. Writes it cannot
+# express as a delta mark the row stale, and a periodic full rebuild reconciles any
+# drift (e.g. rows written by scripts with their own sessions).
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, delete, event, func, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.cotizacion import Cotizacion
+from app.models.dashboard import DashboardSnapshot, DashboardProjectState
+from app.models.proyecto import Proyecto, FirmaRequest
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ID = 1
+STATE_ATTEMPTS = 5
+
+snapshot_table = DashboardSnapshot.__table__
+state_table = DashboardProjectState.__table__
+
+
+def quote_profit(internal_data: Optional[Dict[str, Any]]) -> float:
+    return ((internal_data or {}).get("totals") or {}).get("grossProfitBeforeIva", 0) or 0
+
+
+def _is_active(state: Optional[Tuple[str, int]]) -> bool:
+    return state is not None and state[0] == "ACTIVE"
+
+
+def _is_closed(state: Optional[Tuple[str, int]]) -> bool:
+    return state is not None and state[0] == "CLOSED"
+
+
+def _is_blocked(state: Optional[Tuple[str, int]]) -> bool:
+    return _is_active(state) and state[1] > 0
+
+
+def _project_states(conn, ids: Optional[Iterable[str]] = None) -> Dict[str, Tuple[str, int]]:
+    """Current (status, pending firmas) per project, from the live tables."""
+    stmt = (
+        select(Proyecto.id, Proyecto.status, func.count(FirmaRequest.id))
+        .select_from(Proyecto)
+        .outerjoin(FirmaRequest, and_(FirmaRequest.proyecto_id == Proyecto.id, FirmaRequest.status == "PENDING"))
+        .group_by(Proyecto.id, Proyecto.status)
+    )
+    if ids is not None:
+        stmt = stmt.where(Proyecto.id.in_(list(ids)))
+    return {pid: (status, pending) for pid, status, pending in conn.execute(stmt)}
+
+
+# ---------- Incremental maintenance ----------
+
+def _attr_delta(obj, attr: str, value_of) -> Optional[float]:
+    """value_of(new) - value_of(old) for a modified attribute; None when the old value
+    was never loaded and the delta cannot be known."""
+    history = inspect(obj).attrs[attr].history
+    if not history.has_changes():
+        return 0
+    if not history.deleted:
+        return None
+    new = history.added[0] if history.added else None
+    return value_of(new) - value_of(history.deleted[0])
+
+
+def _quote_deltas(session: Session) -> Tuple[int, float, float, bool]:
+    count, total, profit, stale = 0, 0.0, 0.0, False
+    for obj in session.new:
+        if isinstance(obj, Cotizacion):
+            count += 1
+            total += obj.total or 0
+            profit += quote_profit(obj.internal_data)
+    for obj in session.deleted:
+        if isinstance(obj, Cotizacion):
+            count -= 1
+            total -= obj.total or 0
+            profit -= quote_profit(obj.internal_data)
+    for obj in session.dirty:
+        if isinstance(obj, Cotizacion) and obj not in session.deleted:
+            d_total = _attr_delta(obj, "total", lambda v: v or 0)
+            d_profit = _attr_delta(obj, "internal_data", quote_profit)
+            if d_total is None or d_profit is None:
+                stale = True
+                continue
+            total += d_total
+            profit += d_profit
+    return count, total, profit, stale
+
+
+def _touched_projects(session: Session) -> Set[str]:
+    ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Proyecto):
+            ids.add(obj.id)
+        elif isinstance(obj, FirmaRequest):
+            ids.add(obj.proyecto_id)
+            # A firma moved to another project also changes the old one
+            history = inspect(obj).attrs.proyecto_id.history
+            ids.update(history.deleted)
+    ids.discard(None)
+    return ids
+
+
+def _swap_state(conn, pid: str, post: Optional[Tuple[str, int]]) -> Tuple[bool, Optional[Tuple[str, int]]]:
+    """Move the stored state of pid to post only if it still holds the value read here,
+    and return (swapped, state replaced). Two transactions that change the same project
+    then count each transition once: the loser re-reads the winner's state and applies
+    its own change on top of it."""
+    match = state_table.c.proyecto_id == pid
+    for _ in range(STATE_ATTEMPTS):
+        row = conn.execute(select(state_table.c.status, state_table.c.pending_firmas).where(match)).first()
+        pre = tuple(row) if row else None
+        if pre == post:
+            return True, pre
+        if pre is None:
+            # New project (or one the rebuild has not seen); a concurrent writer may insert it first
+            try:
+                with conn.begin_nested():
+                    conn.execute(insert(state_table).values(proyecto_id=pid, status=post[0], pending_firmas=post[1]))
+                return True, pre
+            except IntegrityError:
+                continue
+        unchanged = and_(match, state_table.c.status == pre[0], state_table.c.pending_firmas == pre[1])
+        if post is None:
+            result = conn.execute(delete(state_table).where(unchanged))
+        else:
+            result = conn.execute(update(state_table).where(unchanged).values(status=post[0], pending_firmas=post[1]))
+        if result.rowcount:
+            return True, pre
+    return False, None
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    count, total, profit, stale = _quote_deltas(session)
+    project_ids = _touched_projects(session)
+    if not (count or total or profit or stale or project_ids):
+        return
+
+    conn = session.connection()
+    activos = cerrados = bloqueados = 0
+    if project_ids:
+        after = _project_states(conn, project_ids)
+        # Fixed order: concurrent flushes lock the state rows in the same sequence
+        for pid in sorted(project_ids):
+            post = after.get(pid)
+            swapped, pre = _swap_state(conn, pid, post)
+            if not swapped:
+                stale = True
+                continue
+            activos += _is_active(post) - _is_active(pre)
+            cerrados += _is_closed(post) - _is_closed(pre)
+            bloqueados += _is_blocked(post) - _is_blocked(pre)
+
+    values = {
+        "quotes": snapshot_table.c.quotes + count,
+        "total_cotizado": snapshot_table.c.total_cotizado + total,
+        "total_utilidad": snapshot_table.c.total_utilidad + profit,
+        "proyectos_activos": snapshot_table.c.proyectos_activos + activos,
+        "proyectos_cerrados": snapshot_table.c.proyectos_cerrados + cerrados,
+        "cierres_bloqueados": snapshot_table.c.cierres_bloqueados + bloqueados,
+        "updated_at": datetime.utcnow(),
+    }
+    if stale:
+        values["stale"] = True
+    # No row yet means no snapshot was ever built; the first read builds it
+    conn.execute(update(snapshot_table).where(snapshot_table.c.id == SNAPSHOT_ID).values(**values))
+
+
+event.listen(SessionLocal, "after_flush", _after_flush)
+
+
+def record_bulk_quotes(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Apply quotes written with a Core bulk INSERT (which skips ORM flush events)."""
+    total = 0.0
+    profit = 0.0
+    for row in rows:
+        total += row.get("total") or 0
+        profit += quote_profit(row.get("internal_data"))
+    db.execute(
+        update(snapshot_table)
+        .where(snapshot_table.c.id == SNAPSHOT_ID)
+        .values(
+            quotes=snapshot_table.c.quotes + len(rows),
+            total_cotizado=snapshot_table.c.total_cotizado + total,
+            total_utilidad=snapshot_table.c.total_utilidad + profit,
+            updated_at=datetime.utcnow(),
+        )
+    )
+
+
+# ---------- Full rebuild ----------
+
+def rebuild_dashboard_snapshot(db: Session) -> DashboardSnapshot:
+    """Recompute every KPI from the source tables (caller commits)."""
+    profit_expr = Cotizacion.internal_data[("totals", "grossProfitBeforeIva")].as_float()
+    quotes, total, profit = db.query(
+        func.count(Cotizacion.id),
+        func.coalesce(func.sum(Cotizacion.total), 0.0),
+        func.coalesce(func.sum(profit_expr), 0.0),
+    ).one()
+
+    states = _project_states(db.connection())
+    db.execute(delete(state_table))
+    if states:
+        db.execute(insert(state_table), [
+            {"proyecto_id": pid, "status": status, "pending_firmas": pending}
+            for pid, (status, pending) in states.items()
+        ])
+
+    now = datetime.utcnow()
+    snapshot = db.merge(DashboardSnapshot(
+        id=SNAPSHOT_ID,
+        quotes=quotes,
+        total_cotizado=float(total),
+        total_utilidad=float(profit),
+        proyectos_activos=sum(1 for s in states.values() if _is_active(s)),
+        proyectos_cerrados=sum(1 for s in states.values() if _is_closed(s)),
+        cierres_bloqueados=sum(1 for s in states.values() if _is_blocked(s)),
+        stale=False,
+        rebuilt_at=now,
+        updated_at=now,
+    ))
+    db.flush()
+    return snapshot
+
+
+def get_dashboard_snapshot(db: Session) -> DashboardSnapshot:
+    snapshot = db.get(DashboardSnapshot, SNAPSHOT_ID)
+    if snapshot is None or snapshot.stale:
+        snapshot = rebuild_dashboard_snapshot(db)
+        db.commit()
+    return snapshot
+
+
+def ceo_kpis(snapshot: DashboardSnapshot) -> Dict[str, Any]:
+    """CEODashboardResponse fields from the snapshot row."""
+    s = snapshot
+    return {
+        "quotes": s.quotes,
+        "projects": s.proyectos_activos + s.proyectos_cerrados,
+        "proyectosActivos": s.proyectos_activos,
+        "proyectosCerrados": s.proyectos_cerrados,
+        "totalCotizado": round(s.total_cotizado, 2),
+        "totalUtilidad": round(s.total_utilidad, 2),
+        "marginPromedio": round((s.total_utilidad / s.total_cotizado * 100), 2) if s.total_cotizado > 0 else 0.0,
+        "cierresBloqueados": s.cierres_bloqueados
+    }
+
+
+def reconcile_dashboard() -> None:
+    db = SessionLocal()
+    try:
+        rebuild_dashboard_snapshot(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Error al reconciliar el dashboard")
+    finally:
+        db.close()
+
+
+async def reconcile_forever(interval_seconds: int) -> None:
+    """Periodic full rebuild; started from the app startup event."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await loop.run_in_executor(None, reconcile_dashboard)
@@ -0,0 +1,69 @@
+# MICSA OS - EPP Catalog Cache
+# Process-level copy of epp_catalog as a compact SKU -> (name, unit, price) table.
+# upsert_epp bumps the "epp_catalog" version stamp; each request only compares that
+# number and reloads the table when it changed.
+import threading
+from typing import Dict, NamedTuple, Optional
+from sqlalchemy.orm import Session
+
+from app.core.versioning import get_version, bump_version
+from app.models.epp import EppItem
+
+STAMP_KEY = "epp_catalog"
+
+
+class EppEntry(NamedTuple):
+    # Same attribute names as EppItem, so calculators accept either
+    name: str
+    unit: str
+    pricePlusIva: float
+
+
+class EppCatalog(NamedTuple):
+    version: int
+    items: Dict[str, EppEntry]
+
+
+_lock = threading.Lock()
+_current: Optional[EppCatalog] = None
+_generation = 0  # bumped by clear_epp_catalog_cache(): loads started before it are discarded
+
+
+def load_epp_catalog(db: Session, version: int) -> EppCatalog:
+    # Plain column tuples: no ORM identity map or instance hydration
+    rows = db.query(EppItem.sku, EppItem.name, EppItem.unit, EppItem.pricePlusIva).all()
+    return EppCatalog(
+        version=version,
+        items={sku: EppEntry(name, unit, price) for sku, name, unit, price in rows},
+    )
+
+
+def get_epp_catalog(db: Session) -> EppCatalog:
+    global _current
+    version = get_version(db, STAMP_KEY)
+    current = _current
+    if current is not None and current.version == version:
+        return current
+    # Query without holding the lock: under AsyncSession.run_sync the query yields to
+    # the event loop, and another request on the same thread would block on it forever
+    generation = _generation
+    loaded = load_epp_catalog(db, version)
+    with _lock:
+        if generation != _generation:
+            return loaded
+        # A concurrent load of an older stamp never replaces a newer one
+        if _current is None or version >= _current.version:
+            _current = loaded
+        return _current
+
+
+def bump_epp_catalog_version(db: Session) -> None:
+    """Call inside the transaction that writes epp_catalog."""
+    bump_version(db, STAMP_KEY)
+
+
+def clear_epp_catalog_cache() -> None:
+    global _current, _generation
+    with _lock:
+        _current = None
+        _generation += 1
@@ -0,0 +1,133 @@
+# MICSA OS - File Delivery
+# PDFs are written once and never modified, so the sha256 computed while storing them
+# is a strong ETag. Responses honour If-None-Match (304 without a body), and a single
+# "bytes=" Range (206) so interrupted downloads resume instead of starting over;
+# If-Range falls back to the full file when the client's copy is stale. Multi-range
+# requests get the full file, which RFC 9110 allows.
+import hashlib
+import os
+from typing import BinaryIO, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+CHUNK_SIZE = 256 * 1024
+
+
+def save_hashed(src: BinaryIO, path: str) -> str:
+    """Copy src to path and return its sha256 (single pass)."""
+    digest = hashlib.sha256()
+    with open(path, "wb") as out:
+        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/"x" matches "x"."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """'bytes=a-b' -> (start, end) inclusive. None when the header is not a single byte
+    range (serve the whole file); ValueError when it cannot be satisfied."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or any(part and not part.isdigit() for part in (first, last)):
+        return None
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError("rango vacío")
+        start, end = max(0, size - int(last)), size - 1
+    if start < 0 or start >= size or end < start:
+        raise ValueError("rango fuera del archivo")
+    return start, min(end, size - 1)
+
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+class FileRangeResponse(Response):
+    """Streams bytes [start, end] of path."""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int, headers: dict, media_type: str):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break  # file shrank underneath us
+                remaining -= len(chunk)
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                else:
+                    await send({"type": "http.response.body", "body": chunk})
+                    return
+        await send({"type": "http.response.body", "body": b""})
+
+
+def file_response(
+    request: Request,
+    path: str,
+    sha256: str,
+    filename: str,
+    media_type: str = "application/pdf",
+    cache_control: str = "private, no-cache",
+) -> Response:
+    """200 / 206 / 304 / 416 for an immutable file whose content hash is sha256."""
+    etag = f'"{sha256}"'
+    headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.stat(path).st_size
+    headers["Content-Disposition"] = content_disposition(filename)
+    byte_range = None
+    range_header = request.headers.get("range")
+    # If-Range: only resume when the client's partial copy is this exact version
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, 206, headers, media_type)
@@ -0,0 +1,202 @@
+# MICSA OS - Signature Envelope Expiration
+# A periodic in-process sweep moves open envelopes (PENDIENTE / EN_PROCESO) whose
+# expira_en has passed to EXPIRADO, together with their unsigned firmantes, in batches:
+# per batch one UPDATE per table and one multi-row HistorialFirma INSERT. Optionally it
+# queues a reminder to notified signers N days before expiry. Every app worker runs the
+# loop, but a conditional UPDATE on a version_stamps row lets only one of them sweep
+# per interval.
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import exists, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.firma_electronica import DocumentoFirma, Firmante, HistorialFirma
+from app.models.version_stamp import VersionStamp
+from app.services.change_bus import mark_changed
+from app.services.notification_templates import TemplateError, enqueue_template
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("PENDIENTE", "EN_PROCESO")
+UNSIGNED_STATUSES = ("PENDIENTE", "NOTIFICADO")
+SWEEP_LOCK_KEY = "firmas_expiration_sweep"
+REMINDER_ACTION = "recordatorio_expiracion"
+
+documents = DocumentoFirma.__table__
+signers = Firmante.__table__
+history = HistorialFirma.__table__
+
+
+def is_expired(documento: DocumentoFirma, now: datetime = None) -> bool:
+    """Expired even if the sweep has not reached it yet."""
+    if documento.status == "EXPIRADO":
+        return True
+    return documento.expira_en is not None and documento.expira_en <= (now or datetime.utcnow())
+
+
+def expire_batch(db: Session, now: datetime, limit: int) -> int:
+    """Expire up to limit overdue envelopes; caller commits."""
+    ids = [doc_id for (doc_id,) in db.execute(
+        select(documents.c.id)
+        .where(documents.c.status.in_(OPEN_STATUSES), documents.c.expira_en <= now)
+        .limit(limit)
+    )]
+    if not ids:
+        return 0
+    # The status condition is repeated so an envelope completed meanwhile is left alone;
+    # updated_at = now marks exactly the rows this statement changed
+    db.execute(
+        update(documents)
+        .where(documents.c.id.in_(ids), documents.c.status.in_(OPEN_STATUSES))
+        .values(status="EXPIRADO", updated_at=now)
+    )
+    expired = [doc_id for (doc_id,) in db.execute(
+        select(documents.c.id).where(documents.c.id.in_(ids), documents.c.status == "EXPIRADO",
+                                     documents.c.updated_at == now)
+    )]
+    if not expired:
+        return 0
+    db.execute(
+        update(signers)
+        .where(signers.c.documento_id.in_(expired), signers.c.status.in_(UNSIGNED_STATUSES))
+        .values(status="EXPIRADO")
+    )
+    db.execute(insert(history), [
+        {"id": str(uuid.uuid4()), "documento_id": doc_id, "accion": "expirado",
+         "detalles": {"motivo": "expira_en vencido"}, "created_at": now}
+        for doc_id in expired
+    ])
+    # Core statements skip the flush hook (stats cache, live dashboard)
+    mark_changed(db, "firmas")
+    return len(expired)
+
+
+def queue_reminders(db: Session, now: datetime, days: int, limit: int) -> int:
+    """Remind notified signers of envelopes expiring within days, once per envelope;
+    caller commits. Returns the number of envelopes reminded."""
+    already = exists().where(history.c.documento_id == documents.c.id, history.c.accion == REMINDER_ACTION)
+    docs = db.execute(
+        select(documents.c.id, documents.c.titulo, documents.c.expira_en)
+        .where(
+            documents.c.status.in_(OPEN_STATUSES),
+            documents.c.expira_en > now,
+            documents.c.expira_en <= now + timedelta(days=days),
+            ~already,
+        )
+        .order_by(documents.c.expira_en)
+        .limit(limit)
+    ).all()
+    if not docs:
+        return 0
+
+    pending: Dict[str, list] = {}
+    for row in db.execute(
+        select(signers.c.id, signers.c.documento_id, signers.c.nombre, signers.c.email, signers.c.token_acceso)
+        .where(signers.c.documento_id.in_([d.id for d in docs]), signers.c.status == "NOTIFICADO")
+    ):
+        pending.setdefault(row.documento_id, []).append(row)
+
+    sign_url = settings.FIRMAS_SIGN_URL.rstrip("/")
+    for doc in docs:
+        if not pending.get(doc.id):
+            continue
+        enqueue_template(
+            db,
+            "firma_recordatorio",
+            [
+                {"to": f.email, "context": {"nombre": f.nombre, "enlace": f"{sign_url}/{f.token_acceso}"},
+                 "referencia": f"firmante:{f.id}"}
+                for f in pending[doc.id]
+            ],
+            common={
+                "documento": {"titulo": doc.titulo, "expira_en": doc.expira_en.strftime("%d/%m/%Y %H:%M")},
+                "empresa": settings.EMPRESA_NOMBRE,
+            },
+        )
+    # Marked even without notified signers, so the envelope is not re-checked every sweep
+    db.execute(insert(history), [
+        {"id": str(uuid.uuid4()), "documento_id": doc.id, "accion": REMINDER_ACTION,
+         "detalles": {"firmantes": len(pending.get(doc.id, []))}, "created_at": now}
+        for doc in docs
+    ])
+    return len(docs)
+
+
+def _claim_sweep(db: Session, now: datetime, interval_seconds: int) -> bool:
+    """True for the one worker that gets this interval's sweep."""
+    stamp = VersionStamp.__table__
+    cutoff = now - timedelta(seconds=interval_seconds * 0.9)
+    result = db.execute(
+        update(stamp)
+        .where(stamp.c.key == SWEEP_LOCK_KEY, stamp.c.updated_at <= cutoff)
+        .values(version=stamp.c.version + 1, updated_at=now)
+    )
+    if result.rowcount:
+        db.commit()
+        return True
+    if db.execute(select(stamp.c.key).where(stamp.c.key == SWEEP_LOCK_KEY)).first():
+        db.rollback()
+        return False
+    try:
+        db.execute(insert(stamp).values(key=SWEEP_LOCK_KEY, version=1, updated_at=now))
+        db.commit()
+        return True
+    except IntegrityError:
+        db.rollback()
+        return False
+
+
+def sweep_expired_documents(interval_seconds: int = 0) -> Dict[str, int]:
+    """One sweep (blocking). With interval_seconds, skips when another worker
+    already swept within that interval."""
+    db = SessionLocal()
+    result = {"expirados": 0, "recordatorios": 0}
+    try:
+        now = datetime.utcnow()
+        if interval_seconds and not _claim_sweep(db, now, interval_seconds):
+            return result
+        batch = settings.FIRMAS_EXPIRY_BATCH_SIZE
+        while True:
+            count = expire_batch(db, now, batch)
+            db.commit()
+            result["expirados"] += count
+            if count < batch:
+                break
+        if settings.FIRMAS_REMINDER_DAYS > 0:
+            while True:
+                try:
+                    count = queue_reminders(db, now, settings.FIRMAS_REMINDER_DAYS, batch)
+                except TemplateError:
+                    db.rollback()
+                    logger.exception("Plantilla de recordatorio inválida")
+                    break
+                db.commit()
+                result["recordatorios"] += count
+                if count < batch:
+                    break
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def sweep_forever(interval_seconds: int) -> None:
+    """Periodic sweep; started from the app startup event."""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            result = await loop.run_in_executor(None, sweep_expired_documents, interval_seconds)
+            if result["expirados"] or result["recordatorios"]:
+                logger.info("Barrido de firmas: %s", result)
+        except Exception:
+            logger.exception("Error en el barrido de expiración de firmas")
+        await asyncio.sleep(interval_seconds)
@@ -0,0 +1,253 @@
+# MICSA OS - Bulk Signing Envelopes
+# POST /firmas/lotes receives a ZIP of PDFs plus a manifest (CSV or JSON) of signers
+# per file. The request validates the manifest against the ZIP directory and returns a
+# LoteFirma id; the envelopes are then created in the background: PDFs are extracted
+# straight from the ZIP stream to storage and DocumentoFirma / Firmante / HistorialFirma
+# rows go in with Core bulk INSERTs, one transaction (and one progress update) per batch.
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from app.core.database import SessionLocal
+from app.models.firma_electronica import DocumentoFirma, Firmante, HistorialFirma, LoteFirma
+from app.schemas.firma_electronica import FirmanteCreate
+from app.services.change_bus import mark_changed
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_PDF_BYTES = 100 * 1024 * 1024
+MAX_ERRORS = 500  # stored per lote; the counters stay exact beyond it
+
+SIGNER_FIELDS = ("nombre", "email", "puesto", "empresa")
+
+
+# ---------- Manifest ----------
+
+def _entry(archivo: str, titulo: Optional[str], descripcion: Optional[str], firmantes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "archivo": archivo,
+        "titulo": titulo or os.path.splitext(posixpath.basename(archivo))[0],
+        "descripcion": descripcion,
+        "firmantes": firmantes,
+    }
+
+
+def _parse_csv(text: str) -> List[Dict[str, Any]]:
+    """One row per signer; rows with the same archivo form one envelope, in row order."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"archivo", "nombre", "email"} - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"Faltan columnas en el manifiesto: {', '.join(sorted(missing))}")
+    entries: Dict[str, Dict[str, Any]] = {}
+    for row in reader:
+        archivo = (row.get("archivo") or "").strip()
+        if not archivo:
+            continue
+        entry = entries.get(archivo)
+        if entry is None:
+            entry = entries[archivo] = _entry(archivo, (row.get("titulo") or "").strip() or None,
+                                              (row.get("descripcion") or "").strip() or None, [])
+        entry["firmantes"].append({k: (row.get(k) or "").strip() or None for k in SIGNER_FIELDS})
+    return list(entries.values())
+
+
+def _parse_json(text: str) -> List[Dict[str, Any]]:
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("documentos")
+    if not isinstance(data, list):
+        raise ValueError("El manifiesto JSON debe ser una lista de documentos")
+    entries, seen = [], set()
+    for item in data:
+        if not isinstance(item, dict) or not item.get("archivo"):
+            raise ValueError("Cada documento del manifiesto requiere 'archivo'")
+        if item["archivo"] in seen:
+            raise ValueError(f"Archivo duplicado en el manifiesto: {item['archivo']}")
+        seen.add(item["archivo"])
+        entries.append(_entry(item["archivo"], item.get("titulo"), item.get("descripcion"), item.get("firmantes") or []))
+    return entries
+
+
+def parse_manifest(filename: str, content: bytes) -> List[Dict[str, Any]]:
+    """CSV (archivo,nombre,email[,titulo,descripcion,puesto,empresa]) or JSON
+    ([{"archivo", "titulo", "firmantes": [...]}]); ValueError when malformed."""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("El manifiesto debe estar en UTF-8")
+    try:
+        if filename.lower().endswith(".json") or text.lstrip().startswith(("[", "{")):
+            entries = _parse_json(text)
+        else:
+            entries = _parse_csv(text)
+    except (json.JSONDecodeError, csv.Error) as e:
+        raise ValueError(f"Manifiesto inválido: {e}")
+    if not entries:
+        raise ValueError("El manifiesto no contiene documentos")
+    return entries
+
+
+# ---------- ZIP ----------
+
+def _zip_index(zf: zipfile.ZipFile) -> Dict[str, zipfile.ZipInfo]:
+    """Entries by full name and, when unambiguous, by basename."""
+    index: Dict[str, zipfile.ZipInfo] = {}
+    basenames: Dict[str, List[zipfile.ZipInfo]] = {}
+    for info in zf.infolist():
+        if info.is_dir():
+            continue
+        index[info.filename] = info
+        basenames.setdefault(posixpath.basename(info.filename), []).append(info)
+    for name, infos in basenames.items():
+        if len(infos) == 1:
+            index.setdefault(name, infos[0])
+    return index
+
+
+def missing_files(zip_path: str, entries: List[Dict[str, Any]]) -> List[str]:
+    """Manifest files not found in the ZIP; zipfile.BadZipFile when it is not a ZIP."""
+    with zipfile.ZipFile(zip_path) as zf:
+        index = _zip_index(zf)
+    return [e["archivo"] for e in entries if e["archivo"] not in index]
+
+
+def _extract_pdf(zf: zipfile.ZipFile, info: zipfile.ZipInfo, dest: str) -> str:
+    """Write the entry to dest; returns its sha256."""
+    if info.file_size > MAX_PDF_BYTES:
+        raise ValueError("El PDF excede el tamaño máximo")
+    with zf.open(info) as src:
+        header = src.read(5)
+        if header != b"%PDF-":
+            raise ValueError("El archivo no es un PDF")
+        digest = hashlib.sha256(header)
+        with open(dest, "wb") as out:
+            out.write(header)
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                digest.update(chunk)
+                out.write(chunk)
+    return digest.hexdigest()
+
+
+# ---------- Processing ----------
+
+def _validate_signers(firmantes: List[Dict[str, Any]]) -> List[FirmanteCreate]:
+    if not firmantes:
+        raise ValueError("El documento no tiene firmantes")
+    try:
+        return [FirmanteCreate(**{**f, "orden": idx}) for idx, f in enumerate(firmantes, 1)]
+    except ValidationError as e:
+        error = e.errors()[0]
+        raise ValueError(f"Firmante inválido ({'.'.join(map(str, error['loc']))}): {error['msg']}")
+    except TypeError:
+        raise ValueError("Firmante inválido")
+
+
+def _process_batch(db, zf, index, lote: LoteFirma, batch, options, upload_dir) -> None:
+    now = datetime.utcnow()
+    docs, signers, history, errors, written = [], [], [], [], []
+    try:
+        for entry in batch:
+            doc_id = str(uuid.uuid4())
+            filepath = os.path.join(upload_dir, f"{doc_id}_original.pdf")
+            try:
+                firmantes = _validate_signers(entry["firmantes"])
+                sha256 = _extract_pdf(zf, index[entry["archivo"]], filepath)
+            except (ValueError, zipfile.BadZipFile) as e:
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                errors.append({"archivo": entry["archivo"], "error": str(e)})
+                continue
+            written.append(filepath)
+            docs.append({
+                "id": doc_id,
+                "titulo": entry["titulo"],
+                "descripcion": entry["descripcion"],
+                "archivo_pdf": filepath,
+                "archivo_sha256": sha256,
+                "tipo_documento": options.get("tipo_documento"),
+                "proyecto_id": options.get("proyecto_id"),
+                "creado_por": lote.creado_por,
+                "status": "PENDIENTE",
+                "total_firmantes": len(firmantes),
+                "firmantes_completados": 0,
+                "requiere_orden": options.get("requiere_orden", False),
+                "created_at": now,
+            })
+            for f in firmantes:
+                signers.append({
+                    "id": str(uuid.uuid4()),
+                    "documento_id": doc_id,
+                    "nombre": f.nombre,
+                    "email": f.email,
+                    "puesto": f.puesto,
+                    "empresa": f.empresa,
+                    "orden": f.orden,
+                    "status": "PENDIENTE",
+                    "token_acceso": str(uuid.uuid4()),
+                })
+            history.append({
+                "id": str(uuid.uuid4()),
+                "documento_id": doc_id,
+                "accion": "creado",
+                "detalles": {"titulo": entry["titulo"], "total_firmantes": len(firmantes), "lote_id": lote.id},
+                "created_at": now,
+            })
+
+        if docs:
+            db.execute(insert(DocumentoFirma.__table__), docs)
+            db.execute(insert(Firmante.__table__), signers)
+            db.execute(insert(HistorialFirma.__table__), history)
+            # Core INSERTs skip the flush hooks that feed the change bus
+            mark_changed(db, "firmas")
+        lote.procesados += len(batch)
+        lote.creados += len(docs)
+        if errors:
+            lote.errores = (lote.errores or []) + errors[:max(0, MAX_ERRORS - len(lote.errores or []))]
+        db.commit()
+    except Exception:
+        db.rollback()
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+
+def process_lote(lote_id: str, zip_path: str, entries: List[Dict[str, Any]], options: Dict[str, Any], upload_dir: str) -> None:
+    """Background task: create every envelope of the lote, committing per batch."""
+    db = SessionLocal()
+    try:
+        lote = db.get(LoteFirma, lote_id)
+        lote.status = "PROCESANDO"
+        db.commit()
+        with zipfile.ZipFile(zip_path) as zf:
+            index = _zip_index(zf)
+            for start in range(0, len(entries), BATCH_SIZE):
+                _process_batch(db, zf, index, lote, entries[start:start + BATCH_SIZE], options, upload_dir)
+        lote.status = "COMPLETADO"
+        lote.terminado_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        logger.exception("Error al procesar el lote de firmas %s", lote_id)
+        db.rollback()
+        lote = db.get(LoteFirma, lote_id)
+        if lote is not None:
+            lote.status = "FALLIDO"
+            lote.errores = (lote.errores or []) + [{"archivo": None, "error": str(e)}]
+            lote.terminado_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+        if os.path.exists(zip_path):
+            os.remove(zip_path)
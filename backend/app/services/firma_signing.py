@@ -0,0 +1,79 @@
+# MICSA OS - Concurrent Signing
+# A signature is two conditional UPDATEs instead of read-modify-write on ORM objects:
+# the firmante row flips to FIRMADO only if it is not signed yet (and, with
+# requiere_orden, only if every earlier signer already signed, checked in the same
+# statement), and the document counter is incremented in SQL with RETURNING, completing
+# the envelope when it reaches total_firmantes. Concurrent signers of one contract
+# never lose an increment, and the document row is locked only for the last statement
+# before commit.
+import uuid
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional
+
+from sqlalchemy import case, exists, insert, or_, update
+from sqlalchemy.orm import Session
+
+from app.models.firma_electronica import DocumentoFirma, Firmante, HistorialFirma
+
+documents = DocumentoFirma.__table__
+signers = Firmante.__table__
+history = HistorialFirma.__table__
+
+OPEN_STATUSES = ("PENDIENTE", "EN_PROCESO")
+
+
+class SignatureCount(NamedTuple):
+    firmantes_completados: int
+    total_firmantes: int
+    status: str
+
+
+def mark_signed(db: Session, firmante_id: str, requiere_orden: bool, values: Dict[str, Any]) -> bool:
+    """FIRMADO + signature fields, unless already signed or (requiere_orden) an earlier
+    signer is still pending. False when nothing was updated."""
+    conditions = [signers.c.id == firmante_id, signers.c.status != "FIRMADO"]
+    if requiere_orden:
+        prior = signers.alias("anteriores")
+        conditions.append(~exists().where(
+            prior.c.documento_id == signers.c.documento_id,
+            prior.c.orden < signers.c.orden,
+            prior.c.status != "FIRMADO",
+        ))
+    result = db.execute(update(signers).where(*conditions).values(status="FIRMADO", **values))
+    return result.rowcount == 1
+
+
+def count_signature(db: Session, documento_id: str, now: datetime) -> Optional[SignatureCount]:
+    """Increment the document's counter; None when it no longer accepts signatures
+    (completed, cancelled or expired)."""
+    completes = documents.c.firmantes_completados + 1 >= documents.c.total_firmantes
+    row = db.execute(
+        update(documents)
+        .where(
+            documents.c.id == documento_id,
+            documents.c.status.in_(OPEN_STATUSES),
+            or_(documents.c.expira_en.is_(None), documents.c.expira_en > now),
+        )
+        .values(
+            firmantes_completados=documents.c.firmantes_completados + 1,
+            status=case((completes, "COMPLETADO"), else_=documents.c.status),
+            completado_at=case((completes, now), else_=documents.c.completado_at),
+            updated_at=now,
+        )
+        .returning(documents.c.firmantes_completados, documents.c.total_firmantes, documents.c.status)
+    ).first()
+    return SignatureCount(*row) if row else None
+
+
+def add_history(db: Session, documento_id: str, firmante_id: str, accion: str, detalles: Dict[str, Any],
+                now: datetime, ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> None:
+    db.execute(insert(history).values(
+        id=str(uuid.uuid4()),
+        documento_id=documento_id,
+        firmante_id=firmante_id,
+        accion=accion,
+        detalles=detalles,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        created_at=now,
+    ))
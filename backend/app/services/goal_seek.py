@@ -0,0 +1,155 @@
+# MICSA OS - Goal-Seek Pricing
+# Back-solves one calculator lever so the quote hits a target total, subtotal or
+# margin. Pricing levers are linear in the price and are solved in closed form;
+# volume levers go through math.ceil steps (welding units, hotel rooms) and are
+# solved with a bisection that runs over every target at once.
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.services.batch_calculator import BatchQuotationCalculator, IVA_PCT, round2
+
+CLOSED_FORM_LEVERS = ("managementPct", "eppMarkupPct", "commMarginPct")
+
+# lever -> (QuoteColumns field, integer?, default bounds)
+BISECTION_LEVERS = {
+    "durationMonths": ("months", False, (0.0, 120.0)),
+    "people": ("people", True, (0, 10000)),
+    "weldersCount": ("welders", True, (0, 10000)),
+    "travelPeopleCount": ("travel_people", True, (0, 10000)),
+}
+
+METRICS = ("total", "subtotal", "marginPct")
+
+BISECTION_STEPS = 60
+
+
+class GoalSeekError(ValueError):
+    pass
+
+
+class GoalSeeker:
+    def __init__(self, calc: BatchQuotationCalculator, base: Dict[str, Any]):
+        self.calc = calc
+        self.base = base
+        comm = calc.price_commercialization_columns(calc.commercialization_columns([base]), 1)
+        self.comm_line_cost = comm["line_cost"]
+        self.comm_raw_cost = float(comm["cost_real"][0])
+        self.comm_enabled = bool(base.get("commercialization", {}).get("enabled"))
+        self.base_cols = calc.columns([base])
+        self.point = {k: np.asarray(v).reshape(-1)[0] for k, v in calc.evaluate(self.base_cols).items()}
+
+    def _evaluate(self, lever: str, values: np.ndarray) -> Dict[str, np.ndarray]:
+        cols = self.calc.columns([self.base])
+        if lever == "managementPct":
+            cols.management_pct = values
+        elif lever == "eppMarkupPct":
+            cols.epp_markup = values
+        elif lever == "commMarginPct":
+            # Every commercialization line is repriced at the same margin
+            prices = (self.comm_line_cost[:, None] * (1 + values[None, :])).sum(axis=0) if len(self.comm_line_cost) else np.zeros(len(values))
+            cols.comm_price = round2(prices)
+        else:
+            field = BISECTION_LEVERS[lever][0]
+            setattr(cols, field, values.astype(np.int64) if field in ("people", "welders") else values)
+        return self.calc.evaluate(cols)
+
+    def _metric(self, res: Dict[str, np.ndarray], metric: str) -> np.ndarray:
+        return {"total": res["total"], "subtotal": res["subtotal"], "marginPct": res["margin_pct"]}[metric]
+
+    def _closed_form(self, lever: str, metric: str, targets: np.ndarray) -> np.ndarray:
+        p = self.point
+        direct_real = p["direct_real"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if metric == "total":
+                subtotal = targets / (1 + IVA_PCT)
+            elif metric == "subtotal":
+                subtotal = targets
+            else:
+                # margin = 1 - directReal / subtotal, and directReal does not depend on pricing levers
+                subtotal = np.where(targets < 100, direct_real / (1 - targets / 100), np.nan)
+
+            if lever == "managementPct":
+                return subtotal / p["direct_pricing_base"] - 1
+
+            pricing_base = subtotal / (1 + self.base_cols.management_pct[0])
+            if lever == "eppMarkupPct":
+                if not self.base_cols.epp[0] or p["epp_raw_cost"] <= 0:
+                    raise GoalSeekError("El EPP está deshabilitado o no tiene costo; no puede usarse como palanca")
+                epp_sell = pricing_base - (p["direct_pricing_base"] - p["epp_sell"])
+                return epp_sell / p["epp_raw_cost"] - 1
+            if not self.comm_enabled or self.comm_raw_cost <= 0:
+                raise GoalSeekError("La comercialización está deshabilitada o no tiene partidas")
+            comm_price = pricing_base - (p["direct_pricing_base"] - self.base_cols.comm_price[0])
+            return comm_price / self.comm_raw_cost - 1
+
+    def _bisect(self, lever: str, metric: str, targets: np.ndarray,
+                bounds: Optional[Tuple[float, float]]) -> Tuple[np.ndarray, np.ndarray]:
+        _, integer, default_bounds = BISECTION_LEVERS[lever]
+        lo_bound, hi_bound = bounds or default_bounds
+        n = len(targets)
+        lo = np.full(n, float(lo_bound))
+        hi = np.full(n, float(hi_bound))
+        if integer:
+            lo, hi = np.ceil(lo), np.floor(hi)
+
+        f_lo = self._metric(self._evaluate(lever, lo), metric)
+        f_hi = self._metric(self._evaluate(lever, hi), metric)
+        feasible = (f_lo <= targets) & (targets <= f_hi)
+        # Targets already met at the lower bound need no search
+        done = f_lo >= targets
+
+        if integer:
+            # Smallest integer whose metric reaches the target: keep f(lo) < target <= f(hi)
+            while True:
+                active = feasible & ~done & (hi - lo > 1)
+                if not active.any():
+                    break
+                mid = np.where(active, np.floor((lo + hi) / 2), lo)
+                f_mid = self._metric(self._evaluate(lever, mid), metric)
+                reach = f_mid >= targets
+                hi = np.where(active & reach, mid, hi)
+                lo = np.where(active & ~reach, mid, lo)
+            return np.where(done, lo, hi), feasible
+
+        for _ in range(BISECTION_STEPS):
+            mid = (lo + hi) / 2
+            f_mid = self._metric(self._evaluate(lever, mid), metric)
+            reach = f_mid >= targets
+            hi = np.where(reach, mid, hi)
+            lo = np.where(reach, lo, mid)
+        return np.where(done, lo, hi), feasible
+
+    def solve(self, lever: str, metric: str, targets: List[float],
+              bounds: Optional[Tuple[float, float]] = None) -> List[Dict[str, Any]]:
+        if metric not in METRICS:
+            raise GoalSeekError(f"Métrica no soportada: {metric}")
+        target_arr = np.asarray(targets, dtype=float)
+
+        if lever in CLOSED_FORM_LEVERS:
+            values = self._closed_form(lever, metric, target_arr)
+            feasible = np.isfinite(values) & (values >= 0)
+            values = np.where(feasible, values, 0.0)
+        elif lever in BISECTION_LEVERS:
+            if metric == "marginPct":
+                # Margin is not monotonic in volume levers, bisection would not be reliable
+                raise GoalSeekError("El margen solo puede resolverse con palancas de precio")
+            values, feasible = self._bisect(lever, metric, target_arr, bounds)
+        else:
+            raise GoalSeekError(f"Palanca no soportada: {lever}")
+
+        achieved = self._evaluate(lever, values)
+        subtotal = round2(achieved["subtotal"]).tolist()
+        total = round2(achieved["total"]).tolist()
+        margin = round2(achieved["margin_pct"]).tolist()
+
+        integer = lever in BISECTION_LEVERS and BISECTION_LEVERS[lever][1]
+        out = []
+        for i, target in enumerate(targets):
+            value = values[i].item()
+            out.append({
+                "target": target,
+                "feasible": bool(feasible[i]),
+                "value": (int(value) if integer else round(value, 6)) if feasible[i] else None,
+                "achieved": {"subtotal": subtotal[i], "total": total[i], "marginPct": margin[i]} if feasible[i] else None,
+            })
+        return out
@@ -0,0 +1,326 @@
+# MICSA OS - KPI Rollups
+# Quote and project facts pre-aggregated by month/week (UTC) × status × cliente, so
+# trend charts read a few hundred rows instead of every quote. An after_flush listener
+# on SessionLocal applies each write as +/- deltas; rebuild_kpi_rollups() (and the
+# rebuild_kpi_rollups.py CLI) recomputes everything from the source tables.
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.database import SessionLocal
+from app.models.cotizacion import Cotizacion
+from app.models.dashboard import KpiQuoteRollup, KpiProjectRollup
+from app.models.proyecto import Proyecto
+from app.services.dashboard_snapshot import quote_profit
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("month", "week")
+
+quote_table = KpiQuoteRollup.__table__
+project_table = KpiProjectRollup.__table__
+
+# (period, bucket, status, cliente_id) -> [quotes, total, utilidad]
+QuoteDeltas = Dict[Tuple[str, date, str, str], List[float]]
+# (period, bucket, cliente_id) -> [abiertos, cerrados]
+ProjectDeltas = Dict[Tuple[str, date, str], List[int]]
+
+
+def bucket_start(ts: datetime, period: str) -> date:
+    """First day of the month, or Monday of the ISO week, of a timestamp in UTC."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    day = ts.date()
+    if period == "month":
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+
+def _add_quote(deltas: QuoteDeltas, ts: Optional[datetime], status: Optional[str], cliente_id: Optional[str],
+               sign: int, total: float, profit: float) -> None:
+    if ts is None:
+        return
+    for period in PERIODS:
+        acc = deltas.setdefault((period, bucket_start(ts, period), status or "DRAFT", cliente_id or ""), [0, 0.0, 0.0])
+        acc[0] += sign
+        acc[1] += sign * (total or 0)
+        acc[2] += sign * profit
+
+
+def _add_project(deltas: ProjectDeltas, ts: Optional[datetime], cliente_id: Optional[str],
+                 abiertos: int = 0, cerrados: int = 0) -> None:
+    if ts is None:
+        return
+    for period in PERIODS:
+        acc = deltas.setdefault((period, bucket_start(ts, period), cliente_id or ""), [0, 0])
+        acc[0] += abiertos
+        acc[1] += cerrados
+
+
+# ---------- Incremental maintenance ----------
+
+_UNKNOWN = object()
+
+
+def _changed(obj, attrs: Tuple[str, ...]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _old_and_new(obj, attr: str):
+    """(value before this flush, value after); old is _UNKNOWN if it was never loaded."""
+    history = inspect(obj).attrs[attr].history
+    if not history.has_changes():
+        value = history.unchanged[0] if history.unchanged else getattr(obj, attr)
+        return value, value
+    new = history.added[0] if history.added else None
+    return (history.deleted[0] if history.deleted else _UNKNOWN), new
+
+
+def _stored_created_at(conn, objs) -> Dict[Tuple[type, Any], datetime]:
+    """created_at as stored, for objects that do not have it loaded: the server default
+    is not on new instances after the INSERT, and old ones may be expired. One SELECT
+    per table; rows deleted in this flush are not found."""
+    missing: Dict[type, List[Any]] = defaultdict(list)
+    for obj in objs:
+        if not isinstance(inspect(obj).attrs.created_at.loaded_value, datetime):
+            missing[type(obj)].append(obj.id)
+    found = {}
+    for cls, ids in missing.items():
+        table = cls.__table__
+        for row_id, value in conn.execute(select(table.c.id, table.c.created_at).where(table.c.id.in_(ids))):
+            found[(cls, row_id)] = value
+    return found
+
+
+def _created_at(obj, stored: Dict[Tuple[type, Any], datetime]) -> Optional[datetime]:
+    value = inspect(obj).attrs.created_at.loaded_value
+    if isinstance(value, datetime):
+        return value
+    return stored.get((type(obj), obj.id))
+
+
+def collect_deltas(session: Session, conn) -> Tuple[QuoteDeltas, ProjectDeltas, bool]:
+    """Deltas bucketed on each row's own created_at (never the flush time)."""
+    quotes: QuoteDeltas = {}
+    projects: ProjectDeltas = {}
+    complete = True
+    tracked = [o for o in list(session.new) + list(session.dirty) + list(session.deleted)
+               if isinstance(o, (Cotizacion, Proyecto))]
+    stored = _stored_created_at(conn, tracked)
+
+    def created_at(obj) -> Optional[datetime]:
+        nonlocal complete
+        value = _created_at(obj, stored)
+        if value is None:
+            complete = False
+        return value
+
+    for obj in session.new:
+        if isinstance(obj, Cotizacion):
+            _add_quote(quotes, created_at(obj), obj.status, obj.cliente_id,
+                       1, obj.total, quote_profit(obj.internal_data))
+        elif isinstance(obj, Proyecto):
+            _add_project(projects, created_at(obj), obj.cliente_id, abiertos=1)
+            _add_project(projects, obj.closed_at, obj.cliente_id, cerrados=1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Cotizacion):
+            _add_quote(quotes, created_at(obj), obj.status, obj.cliente_id,
+                       -1, obj.total, quote_profit(obj.internal_data))
+        elif isinstance(obj, Proyecto):
+            _add_project(projects, created_at(obj), obj.cliente_id, abiertos=-1)
+            _add_project(projects, obj.closed_at, obj.cliente_id, cerrados=-1)
+
+    for obj in session.dirty:
+        if obj in session.deleted:
+            continue
+        if isinstance(obj, Cotizacion):
+            attrs = ("status", "cliente_id", "total", "internal_data")
+            if not _changed(obj, attrs):
+                continue
+            fields = {a: _old_and_new(obj, a) for a in attrs}
+            if any(old is _UNKNOWN for old, _ in fields.values()):
+                complete = False
+                continue
+            created = created_at(obj)
+            _add_quote(quotes, created, fields["status"][0], fields["cliente_id"][0],
+                       -1, fields["total"][0], quote_profit(fields["internal_data"][0]))
+            _add_quote(quotes, created, fields["status"][1], fields["cliente_id"][1],
+                       1, fields["total"][1], quote_profit(fields["internal_data"][1]))
+        elif isinstance(obj, Proyecto):
+            attrs = ("cliente_id", "closed_at")
+            if not _changed(obj, attrs):
+                continue
+            fields = {a: _old_and_new(obj, a) for a in attrs}
+            if any(old is _UNKNOWN for old, _ in fields.values()):
+                complete = False
+                continue
+            (old_cliente, new_cliente), (old_closed, new_closed) = fields["cliente_id"], fields["closed_at"]
+            if old_cliente != new_cliente:
+                created = created_at(obj)
+                _add_project(projects, created, old_cliente, abiertos=-1)
+                _add_project(projects, created, new_cliente, abiertos=1)
+            _add_project(projects, old_closed, old_cliente, cerrados=-1)
+            _add_project(projects, new_closed, new_cliente, cerrados=1)
+
+    return quotes, projects, complete
+
+
+def _upsert(conn, table, key_cols: Tuple[str, ...], measure_cols: Tuple[str, ...], deltas) -> None:
+    for key, values in deltas.items():
+        if not any(values):
+            continue
+        where = [table.c[col] == val for col, val in zip(key_cols, key)]
+        increments = {col: table.c[col] + val for col, val in zip(measure_cols, values)}
+        if conn.execute(update(table).where(*where).values(**increments)).rowcount:
+            continue
+        # New bucket; a concurrent writer may create it first
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(table).values(**dict(zip(key_cols, key)), **dict(zip(measure_cols, values))))
+        except IntegrityError:
+            conn.execute(update(table).where(*where).values(**increments))
+
+
+def apply_deltas(conn, quotes: QuoteDeltas, projects: ProjectDeltas) -> None:
+    _upsert(conn, quote_table, ("period", "bucket", "status", "cliente_id"),
+            ("quotes", "total_cotizado", "total_utilidad"), quotes)
+    _upsert(conn, project_table, ("period", "bucket", "cliente_id"), ("abiertos", "cerrados"), projects)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    if not any(isinstance(o, (Cotizacion, Proyecto)) for o in list(session.new) + list(session.dirty) + list(session.deleted)):
+        return
+    conn = session.connection()
+    quotes, projects, complete = collect_deltas(session, conn)
+    if not complete:
+        logger.warning("KPI rollups: cambio sin valor previo o created_at cargado; ejecutar rebuild_kpi_rollups.py")
+    apply_deltas(conn, quotes, projects)
+
+
+event.listen(SessionLocal, "after_flush", _after_flush)
+
+
+def record_bulk_quote_rollups(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Rollup deltas for quotes written with a Core bulk INSERT (no ORM events).
+    Call after the INSERT: rows without created_at get the stored server default."""
+    conn = db.connection()
+    table = Cotizacion.__table__
+    ids = [row["id"] for row in rows if not row.get("created_at")]
+    stored = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        stored.update(conn.execute(select(table.c.id, table.c.created_at).where(table.c.id.in_(chunk))).all())
+    deltas: QuoteDeltas = {}
+    for row in rows:
+        _add_quote(deltas, row.get("created_at") or stored.get(row["id"]), row.get("status"), row.get("cliente_id"),
+                   1, row.get("total"), quote_profit(row.get("internal_data")))
+    apply_deltas(conn, deltas, {})
+
+
+# ---------- Full rebuild ----------
+
+def rebuild_kpi_rollups(db: Session, batch_size: int = 2000) -> Dict[str, int]:
+    """Recompute both rollup tables from cotizaciones/proyectos (caller commits)."""
+    profit_expr = Cotizacion.internal_data[("totals", "grossProfitBeforeIva")].as_float()
+    quotes: QuoteDeltas = defaultdict(lambda: [0, 0.0, 0.0])
+    rows = db.execute(
+        select(Cotizacion.created_at, Cotizacion.status, Cotizacion.cliente_id, Cotizacion.total, profit_expr)
+        .execution_options(yield_per=batch_size)
+    )
+    for created_at, status, cliente_id, total, profit in rows:
+        if created_at is None:
+            continue
+        for period in PERIODS:
+            acc = quotes[(period, bucket_start(created_at, period), status or "DRAFT", cliente_id or "")]
+            acc[0] += 1
+            acc[1] += total or 0
+            acc[2] += profit or 0
+
+    projects: ProjectDeltas = {}
+    rows = db.execute(
+        select(Proyecto.created_at, Proyecto.closed_at, Proyecto.cliente_id).execution_options(yield_per=batch_size)
+    )
+    for created_at, closed_at, cliente_id in rows:
+        _add_project(projects, created_at, cliente_id, abiertos=1)
+        _add_project(projects, closed_at, cliente_id, cerrados=1)
+
+    db.execute(delete(quote_table))
+    db.execute(delete(project_table))
+    if quotes:
+        db.execute(insert(quote_table), [
+            {"period": p, "bucket": b, "status": s, "cliente_id": c, "quotes": n, "total_cotizado": t, "total_utilidad": u}
+            for (p, b, s, c), (n, t, u) in quotes.items()
+        ])
+    if projects:
+        db.execute(insert(project_table), [
+            {"period": p, "bucket": b, "cliente_id": c, "abiertos": a, "cerrados": z}
+            for (p, b, c), (a, z) in projects.items()
+        ])
+    return {"quoteBuckets": len(quotes), "projectBuckets": len(projects)}
+
+
+# ---------- Reads ----------
+
+def get_trends(db: Session, period: str = "month", desde: Optional[date] = None, hasta: Optional[date] = None,
+               status: Optional[str] = None, cliente_id: Optional[str] = None,
+               group_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Series per bucket (optionally split by status or cliente) read only from the rollups."""
+    if period not in PERIODS:
+        raise ValueError(f"Periodo no soportado: {period}")
+    if group_by not in (None, "status", "cliente"):
+        raise ValueError(f"Agrupación no soportada: {group_by}")
+
+    q = KpiQuoteRollup
+    stmt = select(q.bucket, q.status, q.cliente_id, q.quotes, q.total_cotizado, q.total_utilidad).where(q.period == period)
+    p = KpiProjectRollup
+    pstmt = select(p.bucket, p.cliente_id, p.abiertos, p.cerrados).where(p.period == period)
+    if desde:
+        stmt, pstmt = stmt.where(q.bucket >= bucket_start(datetime.combine(desde, datetime.min.time()), period)), \
+            pstmt.where(p.bucket >= bucket_start(datetime.combine(desde, datetime.min.time()), period))
+    if hasta:
+        stmt, pstmt = stmt.where(q.bucket <= hasta), pstmt.where(p.bucket <= hasta)
+    if status:
+        stmt = stmt.where(q.status == status)
+    if cliente_id is not None:
+        stmt, pstmt = stmt.where(q.cliente_id == cliente_id), pstmt.where(p.cliente_id == cliente_id)
+
+    points: Dict[Tuple, Dict[str, Any]] = {}
+
+    def point(bucket, key):
+        pt = points.get((bucket, key))
+        if pt is None:
+            pt = points[(bucket, key)] = {
+                "bucket": bucket, "quotes": 0, "totalCotizado": 0.0, "totalUtilidad": 0.0,
+                "proyectosAbiertos": 0, "proyectosCerrados": 0,
+            }
+            if group_by:
+                pt[group_by] = key
+        return pt
+
+    for bucket, st, cli, n, total, profit in db.execute(stmt):
+        pt = point(bucket, {"status": st, "cliente": cli}.get(group_by))
+        pt["quotes"] += n
+        pt["totalCotizado"] += total
+        pt["totalUtilidad"] += profit
+    # Projects have no quote status; they are reported on the ungrouped / per-cliente series
+    if group_by != "status":
+        for bucket, cli, abiertos, cerrados in db.execute(pstmt):
+            pt = point(bucket, cli if group_by == "cliente" else None)
+            pt["proyectosAbiertos"] += abiertos
+            pt["proyectosCerrados"] += cerrados
+
+    out = []
+    for pt in sorted(points.values(), key=lambda x: (x["bucket"], str(x.get(group_by) or ""))):
+        if not (pt["quotes"] or pt["proyectosAbiertos"] or pt["proyectosCerrados"]):
+            continue
+        pt["totalCotizado"] = round(pt["totalCotizado"], 2)
+        pt["totalUtilidad"] = round(pt["totalUtilidad"], 2)
+        pt["marginPct"] = round(pt["totalUtilidad"] / pt["totalCotizado"] * 100, 2) if pt["totalCotizado"] > 0 else 0.0
+        out.append(pt)
+    return out
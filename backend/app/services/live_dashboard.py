@@ -0,0 +1,170 @@
+# MICSA OS - Live Dashboard (Server-Sent Events)
+# One LiveDashboard per worker listens to the change bus, waits a short coalescing
+# window so bursts of commits cost one computation, recomputes only the affected
+# sections and fans the changed keys out to every connected screen. Subscribers that
+# fall behind get a fresh snapshot instead of an unbounded queue. A periodic resync
+# picks up writes made by other workers.
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Set
+
+from sqlalchemy import func
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.compliance import ComplianceExpediente
+from app.services.change_bus import ChangeBus, change_bus
+from app.services.dashboard_snapshot import ceo_kpis, get_dashboard_snapshot
+from app.services.stats import get_stats
+
+logger = logging.getLogger(__name__)
+
+# section -> change bus topics that affect it
+SECTION_TOPICS = {
+    "ceo": {"quotes", "projects"},
+    "firmas": {"firmas"},
+    "compliance": {"compliance"},
+}
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+def compliance_kpis(db) -> Dict[str, int]:
+    counts = dict(db.query(ComplianceExpediente.status, func.count(ComplianceExpediente.id))
+                  .group_by(ComplianceExpediente.status).all())
+    return {
+        "total": sum(counts.values()),
+        "abiertos": counts.get("ABIERTO", 0),
+        "listosParaEnviar": counts.get("LISTO_PARA_ENVIAR", 0),
+        "enviados": counts.get("ENVIADO", 0),
+        "cerrados": counts.get("CERRADO", 0),
+    }
+
+
+def compute_sections(sections: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Blocking DB work; runs in the default executor."""
+    db = SessionLocal()
+    try:
+        out = {}
+        for section in sections:
+            if section == "ceo":
+                out[section] = ceo_kpis(get_dashboard_snapshot(db))
+            elif section == "firmas":
+                out[section] = get_stats("firmas", db)
+            elif section == "compliance":
+                out[section] = compliance_kpis(db)
+        return out
+    finally:
+        db.close()
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
+
+
+class LiveDashboard:
+    def __init__(self, bus: ChangeBus, coalesce_seconds: float = 0.5, resync_seconds: float = 30):
+        self.bus = bus
+        self.coalesce_seconds = coalesce_seconds
+        self.resync_seconds = resync_seconds
+        self.state: Optional[Dict[str, Dict[str, Any]]] = None
+        self.seq = 0
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.pending: Set[str] = set()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.computations = 0
+
+    async def start(self) -> None:
+        self.wakeup = asyncio.Event()
+        self.bus.bind(asyncio.get_running_loop())
+        self.bus.add_listener(self.on_change)
+        self.task = asyncio.create_task(self._run())
+
+    def on_change(self, topics: Set[str]) -> None:
+        sections = {s for s, t in SECTION_TOPICS.items() if t & topics}
+        if sections:
+            self.pending |= sections
+            self.wakeup.set()
+
+    async def _compute(self, sections: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        self.computations += 1
+        return await asyncio.get_running_loop().run_in_executor(None, compute_sections, list(sections))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.resync_seconds)
+                # Let the burst settle; everything committed meanwhile is folded in
+                await asyncio.sleep(self.coalesce_seconds)
+            except asyncio.TimeoutError:
+                self.pending |= set(SECTION_TOPICS)
+            self.wakeup.clear()
+            sections, self.pending = self.pending, set()
+
+            if not self.subscribers:
+                # Nobody watching: forget the state so the next subscriber starts fresh
+                self.state = None
+                continue
+            try:
+                fresh = await self._compute(sections)
+            except Exception:
+                logger.exception("Error al recalcular el dashboard en vivo")
+                continue
+            self._publish(fresh)
+
+    def _publish(self, fresh: Dict[str, Dict[str, Any]]) -> None:
+        if self.state is None:
+            return
+        changes = {}
+        for section, values in fresh.items():
+            old = self.state.get(section, {})
+            diff = {k: v for k, v in values.items() if old.get(k) != v}
+            if diff:
+                changes[section] = diff
+            self.state[section] = values
+        if not changes:
+            return
+        self.seq += 1
+        event = ("delta", {"seq": self.seq, "at": datetime.utcnow().isoformat() + "Z", "changes": changes})
+        for queue in list(self.subscribers):
+            self._offer(queue, event)
+
+    def _offer(self, queue: asyncio.Queue, event) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow screen: drop its backlog and resend the whole state
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(("snapshot", self._snapshot()))
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {"seq": self.seq, **(self.state or {})}
+
+    async def stream(self) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if self.state is None:
+            self.state = await self._compute(SECTION_TOPICS)
+        self.subscribers.add(queue)
+        try:
+            yield sse_event("snapshot", self._snapshot())
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield sse_event(event, data)
+        finally:
+            self.subscribers.discard(queue)
+
+
+live_dashboard = LiveDashboard(
+    change_bus,
+    coalesce_seconds=settings.LIVE_DASHBOARD_COALESCE_MS / 1000,
+    resync_seconds=settings.LIVE_DASHBOARD_RESYNC_SECONDS,
+)
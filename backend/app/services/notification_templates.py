@@ -0,0 +1,301 @@
+# MICSA OS - Notification Templates
+# Templates (subject, text and optional HTML part per locale) live on disk under
+# app/templates/notifications/<nombre>/<locale>.{subject.txt,txt,html}; rows in
+# notification_templates override them. Each part is compiled once into a str.format
+# string plus field paths, cached per process behind the "notification_templates"
+# version stamp. A batch binds the variables shared by every recipient first, so only
+# the per-recipient fields are substituted per message.
+import html
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.versioning import get_version, bump_version
+from app.models.notification import NotificationTemplate
+from app.services.outbox import enqueue_emails, outbox_row
+
+STAMP_KEY = "notification_templates"
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", "notifications")
+
+_FIELD = re.compile(r"\{\{\s*([A-Za-z_][\w]*(?:\.[A-Za-z_]\w*)*)\s*\}\}")
+
+
+class TemplateError(ValueError):
+    pass
+
+
+def _lookup(context: Dict[str, Any], path: Tuple[str, ...]) -> Any:
+    value: Any = context
+    for key in path:
+        if isinstance(value, dict):
+            if key not in value:
+                raise TemplateError(f"Variable faltante: {'.'.join(path)}")
+            value = value[key]
+        else:
+            try:
+                value = getattr(value, key)
+            except AttributeError:
+                raise TemplateError(f"Variable faltante: {'.'.join(path)}")
+    return "" if value is None else value
+
+
+class CompiledTemplate:
+    """'Hola {{ nombre }}' -> fmt 'Hola {0}' + field paths; render is one str.format."""
+    __slots__ = ("segments", "fmt", "fields", "escape")
+
+    def __init__(self, segments: Tuple[Any, ...], escape: bool):
+        # Alternating literal strings and field paths (tuples)
+        self.segments = segments
+        self.escape = escape
+        fmt, fields = [], []
+        for segment in segments:
+            if isinstance(segment, tuple):
+                fmt.append("{%d}" % len(fields))
+                fields.append(segment)
+            else:
+                fmt.append(segment.replace("{", "{{").replace("}", "}}"))
+        self.fmt = "".join(fmt)
+        self.fields: Tuple[Tuple[str, ...], ...] = tuple(fields)
+
+    @classmethod
+    def compile(cls, source: str, escape: bool = False) -> "CompiledTemplate":
+        segments: List[Any] = []
+        pos = 0
+        for match in _FIELD.finditer(source):
+            segments.append(source[pos:match.start()])
+            segments.append(tuple(match.group(1).split(".")))
+            pos = match.end()
+        segments.append(source[pos:])
+        return cls(tuple(segments), escape)
+
+    def _value(self, context: Dict[str, Any], path: Tuple[str, ...]) -> str:
+        value = str(_lookup(context, path))
+        return html.escape(value) if self.escape else value
+
+    def bind(self, context: Dict[str, Any], exclude: Iterable[str] = ()) -> "CompiledTemplate":
+        """Pre-render the fields whose root variable is in context (and not in exclude)
+        into the literal text; the result only substitutes the remaining fields."""
+        exclude = set(exclude)
+        if not any(path[0] in context and path[0] not in exclude for path in self.fields):
+            return self
+        segments = tuple(
+            self._value(context, segment)
+            if isinstance(segment, tuple) and segment[0] in context and segment[0] not in exclude
+            else segment
+            for segment in self.segments
+        )
+        return CompiledTemplate(segments, self.escape)
+
+    def render(self, context: Dict[str, Any]) -> str:
+        return self.fmt.format(*[self._value(context, path) for path in self.fields])
+
+
+class TemplateSet(NamedTuple):
+    """One template in one locale."""
+    nombre: str
+    locale: str
+    subject: CompiledTemplate
+    text: CompiledTemplate
+    html: Optional[CompiledTemplate]
+
+    def bind(self, context: Dict[str, Any], exclude: Iterable[str] = ()) -> "TemplateSet":
+        exclude = set(exclude)
+        return self._replace(
+            subject=self.subject.bind(context, exclude),
+            text=self.text.bind(context, exclude),
+            html=self.html.bind(context, exclude) if self.html else None,
+        )
+
+
+def compile_set(nombre: str, locale: str, asunto: str, texto: str, html_source: Optional[str]) -> TemplateSet:
+    return TemplateSet(
+        nombre=nombre,
+        locale=locale,
+        subject=CompiledTemplate.compile(asunto.strip()),
+        text=CompiledTemplate.compile(texto),
+        html=CompiledTemplate.compile(html_source, escape=True) if html_source else None,
+    )
+
+
+# ---------- Sources ----------
+
+def _read(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def disk_templates() -> Dict[Tuple[str, str], Tuple[str, str, Optional[str]]]:
+    """(nombre, locale) -> (asunto, texto, html) from TEMPLATE_DIR."""
+    found = {}
+    if not os.path.isdir(TEMPLATE_DIR):
+        return found
+    for nombre in sorted(os.listdir(TEMPLATE_DIR)):
+        folder = os.path.join(TEMPLATE_DIR, nombre)
+        if not os.path.isdir(folder):
+            continue
+        for filename in os.listdir(folder):
+            if not filename.endswith(".subject.txt"):
+                continue
+            locale = filename[:-len(".subject.txt")]
+            texto = _read(os.path.join(folder, f"{locale}.txt"))
+            if texto is None:
+                continue
+            found[(nombre, locale)] = (
+                _read(os.path.join(folder, filename)),
+                texto,
+                _read(os.path.join(folder, f"{locale}.html")),
+            )
+    return found
+
+
+class TemplateCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.sets: Dict[Tuple[str, str], TemplateSet] = {}
+        self._disk: Optional[Dict[Tuple[str, str], Tuple[str, str, Optional[str]]]] = None
+        self._generation = 0  # bumped by clear(): loads started before it are discarded
+
+    def _load(self, db: Session) -> Tuple[Dict, Dict[Tuple[str, str], TemplateSet]]:
+        """Read and compile without holding the lock: under AsyncSession.run_sync the
+        query yields to the event loop, and another request on the same thread would
+        block on a held threading.Lock forever."""
+        disk = self._disk if self._disk is not None else disk_templates()
+        sources = dict(disk)
+        for row in db.query(NotificationTemplate).all():
+            sources[(row.nombre, row.locale)] = (row.asunto, row.texto, row.html)
+        return disk, {key: compile_set(key[0], key[1], *source) for key, source in sources.items()}
+
+    def all(self, db: Session) -> Dict[Tuple[str, str], TemplateSet]:
+        version = get_version(db, STAMP_KEY)
+        if self.version == version:
+            return self.sets
+        generation = self._generation
+        disk, sets = self._load(db)
+        # The lock only guards the swap; a concurrent load of an older stamp never
+        # replaces a newer one
+        with self.lock:
+            if generation != self._generation:
+                return sets
+            if self.version is None or version >= self.version:
+                self._disk, self.sets, self.version = disk, sets, version
+            return self.sets
+
+    def clear(self) -> None:
+        with self.lock:
+            self.version = None
+            self._disk = None
+            self._generation += 1
+
+
+template_cache = TemplateCache()
+
+
+def locale_chain(locale: Optional[str]) -> List[str]:
+    """'es-MX' -> ['es-MX', 'es', default locale]."""
+    chain = []
+    for candidate in (locale, (locale or "").split("-")[0], settings.NOTIFICATIONS_DEFAULT_LOCALE):
+        if candidate and candidate not in chain:
+            chain.append(candidate)
+    return chain
+
+
+def get_template(db: Session, nombre: str, locale: Optional[str] = None) -> TemplateSet:
+    sets = template_cache.all(db)
+    for candidate in locale_chain(locale):
+        template = sets.get((nombre, candidate))
+        if template is not None:
+            return template
+    raise TemplateError(f"Plantilla no encontrada: {nombre}")
+
+
+def list_templates(db: Session) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for nombre, locale in sorted(template_cache.all(db)):
+        out.setdefault(nombre, []).append(locale)
+    return out
+
+
+def save_template(db: Session, nombre: str, locale: str, asunto: str, texto: str, html_source: Optional[str]) -> NotificationTemplate:
+    """Upsert a DB override (validated by compiling it); caller commits."""
+    compile_set(nombre, locale, asunto, texto, html_source)
+    row = db.query(NotificationTemplate).filter(
+        NotificationTemplate.nombre == nombre, NotificationTemplate.locale == locale
+    ).first()
+    if row is None:
+        row = NotificationTemplate(nombre=nombre, locale=locale)
+        db.add(row)
+    row.asunto, row.texto, row.html = asunto, texto, html_source
+    bump_version(db, STAMP_KEY)
+    return row
+
+
+# ---------- Rendering ----------
+
+class RenderedEmail(NamedTuple):
+    to: str
+    subject: str
+    text: str
+    html: Optional[str]
+    referencia: Optional[str]
+
+
+def render_batch(
+    db: Session,
+    nombre: str,
+    recipients: List[Dict[str, Any]],
+    common: Optional[Dict[str, Any]] = None,
+    locale: Optional[str] = None,
+) -> List[RenderedEmail]:
+    """recipients: [{"to", "context", "locale"?, "referencia"?}] -> RenderedEmail in the
+    same order. Per-recipient context wins over common; a missing variable raises
+    TemplateError before anything is queued."""
+    common = common or {}
+    per_recipient_keys = set()
+    for r in recipients:
+        per_recipient_keys.update((r.get("context") or {}).keys())
+
+    # locale -> (template with the common fields pre-rendered, needs common at render)
+    bound: Dict[Optional[str], Tuple[TemplateSet, bool]] = {}
+    out = []
+    for r in recipients:
+        wanted = r.get("locale") or locale
+        entry = bound.get(wanted)
+        if entry is None:
+            template = get_template(db, nombre, wanted).bind(common, exclude=per_recipient_keys)
+            parts = [template.subject, template.text] + ([template.html] if template.html else [])
+            needs_common = any(path[0] in common for part in parts for path in part.fields)
+            entry = bound[wanted] = (template, needs_common)
+        template, needs_common = entry
+        context = r.get("context") or {}
+        if needs_common:
+            context = {**common, **context}
+        out.append(RenderedEmail(
+            to=r["to"],
+            subject=template.subject.render(context),
+            text=template.text.render(context),
+            html=template.html.render(context) if template.html else None,
+            referencia=r.get("referencia"),
+        ))
+    return out
+
+
+def enqueue_template(
+    db: Session,
+    nombre: str,
+    recipients: List[Dict[str, Any]],
+    common: Optional[Dict[str, Any]] = None,
+    locale: Optional[str] = None,
+) -> int:
+    """Render a batch and queue it in the outbox with one INSERT; caller commits."""
+    rendered = render_batch(db, nombre, recipients, common, locale)
+    return enqueue_emails(db, [
+        outbox_row(m.to, m.subject, m.text, referencia=m.referencia, cuerpo_html=m.html)
+        for m in rendered
+    ])
@@ -1,33 +1,37 @@
 # MICSA OS - Notifications Service
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.notification_templates import enqueue_template
+from app.services.outbox import enqueue_email
 
 class NotificationService:
     @staticmethod
     def send_email(to_email: str, subject: str, body: str):
-        if not all([settings.SMTP_HOST, settings.SMTP_USER, settings.SMTP_PASSWORD]):
-            print(f"📧 [STUB] Sending email to {to_email}: {subject}")
-            return True
-
+        """Queue an email in the outbox (delivered by the outbox worker)"""
+        db = SessionLocal()
         try:
-            msg = MIMEMultipart()
-            msg['From'] = settings.SMTP_FROM or settings.SMTP_USER
-            msg['To'] = to_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain'))
-
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                server.send_message(msg)
-            
-            print(f"📧 Email sent to {to_email}")
+            enqueue_email(db, to_email, subject, body)
+            db.commit()
             return True
         except Exception as e:
-            print(f"❌ Error sending email: {e}")
+            db.rollback()
+            print(f"❌ Error queueing email: {e}")
             return False
+        finally:
+            db.close()
+
+    @staticmethod
+    def send_template(nombre: str, recipients: list, common: dict = None, locale: str = None):
+        """Render a template for many recipients and queue them all (one INSERT)"""
+        db = SessionLocal()
+        try:
+            count = enqueue_template(db, nombre, recipients, common, locale)
+            db.commit()
+            return count
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
 
     @staticmethod
     def send_whatsapp_stub(to_number: str, message: str):
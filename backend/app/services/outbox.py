@@ -0,0 +1,307 @@
+# MICSA OS - Notification Outbox
+# Endpoints only insert notification_outbox rows, in the same transaction as the
+# change that caused them. One OutboxWorker per app worker claims due rows in batches
+# (a conditional UPDATE, so several workers never claim the same row), sends them over
+# a small pool of authenticated aiosmtplib connections under a rate limit, and records
+# the outcome: ENVIADO, a retry with exponential backoff, or DEAD once attempts run out
+# or the server rejects the message permanently. The change bus wakes the worker as
+# soon as an enqueue commits; a poll interval covers other workers' writes. Without
+# SMTP_HOST messages are only logged (stub), as before.
+import asyncio
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosmtplib
+from sqlalchemy import and_, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.notification import NotificationOutbox
+from app.services.change_bus import ChangeBus, change_bus, mark_changed
+
+logger = logging.getLogger(__name__)
+
+outbox_table = NotificationOutbox.__table__
+
+LEASE_SECONDS = 300
+MAX_BACKOFF_SECONDS = 6 * 3600
+
+
+# ---------- Enqueue (request side) ----------
+
+def outbox_row(destinatario: str, asunto: str, cuerpo: str, referencia: Optional[str] = None,
+               cuerpo_html: Optional[str] = None) -> Dict[str, Any]:
+    now = datetime.utcnow()
+    return {
+        "id": str(uuid.uuid4()),
+        "canal": "email",
+        "destinatario": destinatario,
+        "asunto": asunto,
+        "cuerpo": cuerpo,
+        "cuerpo_html": cuerpo_html,
+        "referencia": referencia,
+        "status": "PENDIENTE",
+        "intentos": 0,
+        "proximo_intento": now,
+        "created_at": now,
+    }
+
+
+def enqueue_email(db: Session, destinatario: str, asunto: str, cuerpo: str, referencia: Optional[str] = None) -> str:
+    """Queue one email; delivered after the caller commits."""
+    row = outbox_row(destinatario, asunto, cuerpo, referencia)
+    db.add(NotificationOutbox(**row))
+    return row["id"]
+
+
+def enqueue_emails(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """Queue many emails (rows from outbox_row) with a single INSERT."""
+    if rows:
+        db.execute(insert(outbox_table), rows)
+        # Core INSERT skips the flush hook that wakes the worker
+        mark_changed(db, "outbox")
+    return len(rows)
+
+
+# ---------- Claim / record (worker side, blocking DB work) ----------
+
+def _due(now: datetime):
+    return and_(outbox_table.c.status.in_(["PENDIENTE", "ENVIANDO"]), outbox_table.c.proximo_intento <= now)
+
+
+def claim_batch(limit: int) -> List[Dict[str, Any]]:
+    """Lease up to limit due messages to this worker. ENVIANDO rows whose lease
+    expired (worker died mid-send) are due again."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        ids = [row_id for (row_id,) in db.execute(
+            select(outbox_table.c.id).where(_due(now)).order_by(outbox_table.c.proximo_intento).limit(limit)
+        )]
+        if not ids:
+            return []
+        # Re-checking the due condition makes the claim atomic against other workers
+        db.execute(
+            update(outbox_table)
+            .where(outbox_table.c.id.in_(ids), _due(now))
+            .values(status="ENVIANDO", reclamado_por=token, proximo_intento=now + timedelta(seconds=LEASE_SECONDS))
+        )
+        rows = db.execute(select(outbox_table).where(outbox_table.c.reclamado_por == token)).mappings().all()
+        db.commit()
+        return [dict(row) for row in rows]
+    finally:
+        db.close()
+
+
+def backoff_seconds(intentos: int) -> float:
+    base = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** max(0, intentos - 1)
+    return min(base, MAX_BACKOFF_SECONDS) * random.uniform(0.8, 1.2)
+
+
+def record_results(results: List[Tuple[Dict[str, Any], Optional[str], bool]]) -> None:
+    """results: (row, error or None, permanent failure)."""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        sent = [row["id"] for row, error, _ in results if error is None]
+        if sent:
+            db.execute(
+                update(outbox_table).where(outbox_table.c.id.in_(sent))
+                .values(status="ENVIADO", enviado_at=now, intentos=outbox_table.c.intentos + 1,
+                        ultimo_error=None, reclamado_por=None)
+            )
+        for row, error, permanent in results:
+            if error is None:
+                continue
+            intentos = row["intentos"] + 1
+            dead = permanent or intentos >= settings.OUTBOX_MAX_ATTEMPTS
+            db.execute(
+                update(outbox_table).where(outbox_table.c.id == row["id"])
+                .values(
+                    status="DEAD" if dead else "PENDIENTE",
+                    intentos=intentos,
+                    ultimo_error=error[:2000],
+                    reclamado_por=None,
+                    proximo_intento=now + timedelta(seconds=0 if dead else backoff_seconds(intentos)),
+                )
+            )
+            if dead:
+                logger.warning("Notificación %s a %s en dead-letter: %s", row["id"], row["destinatario"], error)
+        db.commit()
+    finally:
+        db.close()
+
+
+# ---------- Sending ----------
+
+def build_message(row: Dict[str, Any]) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.SMTP_FROM or settings.SMTP_USER or f"no-reply@{settings.SMTP_HOST or 'localhost'}"
+    message["To"] = row["destinatario"]
+    message["Subject"] = row["asunto"]
+    message["Message-ID"] = f"<{row['id']}@micsa-os>"
+    message.set_content(row["cuerpo"])
+    if row.get("cuerpo_html"):
+        message.add_alternative(row["cuerpo_html"], subtype="html")
+    return message
+
+
+def is_permanent(error: Exception) -> bool:
+    """5xx replies about the message or its recipients will not succeed on retry."""
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(r.code >= 500 for r in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPAuthenticationError):
+        return False  # configuration problem: keep the messages until it is fixed
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 500 <= error.code < 600
+    return False
+
+
+class SmtpPool:
+    """Up to size connections, each connected (STARTTLS + login) once and reused."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.idle: asyncio.Queue = asyncio.Queue()
+        self.created = 0
+
+    async def _open(self, client: aiosmtplib.SMTP) -> None:
+        await client.connect()
+        if settings.SMTP_USER:
+            await client.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+
+    async def _acquire(self) -> aiosmtplib.SMTP:
+        if self.idle.empty() and self.created < self.size:
+            self.created += 1
+            return aiosmtplib.SMTP(
+                hostname=settings.SMTP_HOST,
+                port=settings.SMTP_PORT,
+                start_tls=settings.SMTP_STARTTLS,
+                timeout=30,
+            )
+        return await self.idle.get()
+
+    def _discard(self, client: aiosmtplib.SMTP) -> None:
+        self.created -= 1
+        client.close()
+
+    async def send(self, message: EmailMessage) -> None:
+        client = await self._acquire()
+        if not client.is_connected:
+            # New connection, or the server dropped an idle one
+            try:
+                await self._open(client)
+            except Exception:
+                self._discard(client)
+                raise
+        try:
+            await client.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError, asyncio.TimeoutError):
+            self._discard(client)
+            raise
+        except aiosmtplib.SMTPException:
+            # Reply error for this message only: the session stays usable after RSET
+            try:
+                await client.rset()
+            except Exception:
+                self._discard(client)
+                raise
+            self.idle.put_nowait(client)
+            raise
+        self.idle.put_nowait(client)
+
+    async def close(self) -> None:
+        while not self.idle.empty():
+            client = self.idle.get_nowait()
+            try:
+                await client.quit()
+            except Exception:
+                client.close()
+        self.created = 0
+
+
+class RateLimiter:
+    """Spaces sends evenly at rate per second (0 = unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def _stub_send(message: EmailMessage) -> None:
+    print(f"📧 [STUB] Sending email to {message['To']}: {message['Subject']}")
+
+
+class OutboxWorker:
+    def __init__(self, bus: ChangeBus):
+        self.bus = bus
+        self.pool: Optional[SmtpPool] = None
+        self.limiter = RateLimiter(settings.OUTBOX_RATE_PER_SECOND)
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self.wakeup = asyncio.Event()
+        if settings.SMTP_HOST:
+            self.pool = SmtpPool(settings.OUTBOX_POOL_SIZE)
+        self.bus.bind(asyncio.get_running_loop())
+        self.bus.add_listener(self.on_change)
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.pool is not None:
+            await self.pool.close()
+
+    def on_change(self, topics) -> None:
+        if "outbox" in topics:
+            self.wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self.wakeup.clear()
+            try:
+                batch = await loop.run_in_executor(None, claim_batch, settings.OUTBOX_BATCH_SIZE)
+                if batch:
+                    results = await asyncio.gather(*(self._send(row) for row in batch))
+                    await loop.run_in_executor(None, record_results, results)
+                    continue
+            except Exception:
+                logger.exception("Error en el worker de notificaciones")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=settings.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, row: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str], bool]:
+        await self.limiter.wait()
+        try:
+            message = build_message(row)
+            if self.pool is None:
+                await _stub_send(message)
+            else:
+                await self.pool.send(message)
+        except Exception as e:
+            return row, f"{type(e).__name__}: {e}", is_permanent(e)
+        return row, None, False
+
+
+outbox_worker = OutboxWorker(change_bus)
@@ -0,0 +1,157 @@
+# MICSA OS - Signed PDF Rendering
+# Pure rendering, no database or app settings: stamp_signed_pdf() runs inside the
+# signed-PDF process pool, so this module only imports what a worker process needs.
+# The original PDF is left untouched; the result is written next to it atomically.
+import hashlib
+import io
+import os
+from typing import Any, Dict, List
+
+import qrcode
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+SIGNATURE_BOX = (150, 60)  # width, height in points
+MARGIN = 36
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _qr_image(url: str) -> ImageReader:
+    buffer = io.BytesIO()
+    qrcode.make(url, box_size=4, border=1).save(buffer, format="PNG")
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+def _draw_signature(c: canvas.Canvas, signer: Dict[str, Any], x: float, y: float) -> None:
+    width, height = SIGNATURE_BOX
+    image = signer.get("imagen")
+    drawn = False
+    if image:
+        try:
+            c.drawImage(ImageReader(io.BytesIO(image)), x, y + 14, width=width, height=height - 14,
+                        preserveAspectRatio=True, anchor="c", mask="auto")
+            drawn = True
+        except Exception:
+            drawn = False
+    if not drawn:
+        # Typed signatures or unreadable images: render the name instead
+        c.setFont("Helvetica-Oblique", 14)
+        c.drawCentredString(x + width / 2, y + height / 2, signer["nombre"])
+    c.line(x, y + 12, x + width, y + 12)
+    c.setFont("Helvetica", 7)
+    c.drawCentredString(x + width / 2, y + 3, f"{signer['nombre']} · {signer.get('firmado_at') or ''}")
+
+
+def _overlay(reader: PdfReader, job: Dict[str, Any]) -> PdfReader:
+    """One overlay page per original page: footer everywhere, signatures on the last.
+    Signature rows that would pass the top margin continue on extra overlay pages the
+    size of the last page, to be appended after the original pages."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    last = reader.pages[-1].mediabox
+    per_row = max(1, int((float(last.width) - 2 * MARGIN) // (SIGNATURE_BOX[0] + 10)))
+    rows = max(1, int((float(last.height) - MARGIN - 24 - SIGNATURE_BOX[1]) // (SIGNATURE_BOX[1] + 8)) + 1)
+    signers = job["firmantes"]
+    batches = [signers[i:i + per_row * rows] for i in range(0, len(signers), per_row * rows)] or [[]]
+    boxes = [page.mediabox for page in reader.pages] + [last] * (len(batches) - 1)
+    first_signed = len(reader.pages) - 1
+    total = len(boxes)
+    for index, box in enumerate(boxes):
+        c.setPageSize((float(box.right), float(box.top)))
+        c.translate(float(box.left), float(box.bottom))
+        c.setFont("Helvetica", 6)
+        c.drawString(MARGIN / 2, 10, f"Firmado electrónicamente · Documento {job['documento_id']} · "
+                                     f"Página {index + 1}/{total} · Verificar: {job['verify_url']}")
+        if index >= first_signed:
+            for n, signer in enumerate(batches[index - first_signed]):
+                row, col = divmod(n, per_row)
+                x = MARGIN + col * (SIGNATURE_BOX[0] + 10)
+                y = 24 + row * (SIGNATURE_BOX[1] + 8)
+                _draw_signature(c, signer, x, y)
+        c.showPage()
+    c.save()
+    buffer.seek(0)
+    return PdfReader(buffer)
+
+
+def _certificate(job: Dict[str, Any], original_sha256: str, pages: int) -> PdfReader:
+    buffer = io.BytesIO()
+    width, height = letter
+    c = canvas.Canvas(buffer, pagesize=letter)
+    y = height - MARGIN - 10
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(MARGIN, y, "Certificado de firma electrónica")
+    c.drawImage(_qr_image(job["verify_url"]), width - MARGIN - 90, height - MARGIN - 90, width=90, height=90)
+
+    c.setFont("Helvetica", 9)
+    for label, value in (
+        ("Documento", job["titulo"]),
+        ("ID", job["documento_id"]),
+        ("Completado", job.get("completado_at") or ""),
+        ("Páginas", str(pages)),
+        ("SHA-256 original", original_sha256),
+        ("Verificación", job["verify_url"]),
+    ):
+        y -= 14
+        c.drawString(MARGIN, y, f"{label}: {value}")
+
+    y -= 24
+    c.setFont("Helvetica-Bold", 11)
+    c.drawString(MARGIN, y, "Firmantes")
+    for signer in job["firmantes"]:
+        if y < MARGIN + SIGNATURE_BOX[1] + 50:
+            c.showPage()
+            y = height - MARGIN
+        y -= SIGNATURE_BOX[1] + 10
+        _draw_signature(c, signer, MARGIN, y)
+        c.setFont("Helvetica", 8)
+        details: List[str] = [
+            f"{signer['nombre']} <{signer['email']}>",
+            " · ".join(v for v in (signer.get("puesto"), signer.get("empresa")) if v),
+            f"Firmado: {signer.get('firmado_at') or ''} · Tipo: {signer.get('firma_tipo') or ''}",
+            f"IP: {signer.get('ip') or ''}",
+            f"SHA-256 firma: {hashlib.sha256(signer.get('imagen') or b'').hexdigest()}",
+        ]
+        ty = y + SIGNATURE_BOX[1] - 8
+        for line in details:
+            c.drawString(MARGIN + SIGNATURE_BOX[0] + 16, ty, line)
+            ty -= 11
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return PdfReader(buffer)
+
+
+def stamp_signed_pdf(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the signed PDF described by job (see signed_pdf.build_job) and return
+    {"path", "sha256", "paginas"}. Runs in a worker process."""
+    reader = PdfReader(job["archivo_pdf"])
+    overlay = _overlay(reader, job)
+    writer = PdfWriter()
+    for page, stamp in zip(reader.pages, overlay.pages):
+        page.merge_page(stamp)
+        writer.add_page(page)
+    # Signatures that did not fit on the last page
+    for stamp in overlay.pages[len(reader.pages):]:
+        writer.add_page(stamp)
+    original_sha256 = job.get("archivo_sha256") or _sha256_file(job["archivo_pdf"])
+    for page in _certificate(job, original_sha256, len(reader.pages)).pages:
+        writer.add_page(page)
+    writer.add_metadata({"/Title": job["titulo"], "/Subject": f"Documento firmado {job['documento_id']}"})
+
+    output = job["archivo_firmado"]
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        writer.write(f)
+    os.replace(tmp, output)
+    return {"path": output, "sha256": _sha256_file(output), "paginas": len(writer.pages)}
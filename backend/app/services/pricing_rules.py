@@ -0,0 +1,195 @@
+# MICSA OS - Pricing Rules Service
+# Rule sets live in the DB (pricing_rule_sets). The active one is compiled once into
+# a flat, immutable CompiledRules and cached per process; workers reload it only when
+# the "pricing_rules" version stamp changes or a future rule set becomes effective.
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, NamedTuple, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.versioning import get_version, bump_version
+from app.models.pricing import PricingRuleSet
+
+STAMP_KEY = "pricing_rules"
+CREATE_ATTEMPTS = 5
+
+# Default rules as seen in reproduce_issue.js (version 0, used until a rule set is stored)
+DEFAULT_RULES = {
+    "labor": {"weekly": 6489.25, "weeksMonth": 4},
+    "welding": {"per10Month": {"cost": 18446.96, "price": 21213}},
+    "weldingConsumablesPerWelderMonth": 3800,
+    "dc3": {"sell": 500, "package": 1500, "cost": 100},
+    "medical": {"cost": 250, "sell": 350},
+    "managementPct": 0.15,
+    "platformPM": {"feePerPersonMonth": 180},
+    "iso": {"feePerProjectMonth": 3500},
+    "commercialization": {"defaultMarginPct": 0.20},
+    "epp": {"markupPct": 0.25, "workingDaysMonth": 26}
+}
+
+
+class CompiledRules(NamedTuple):
+    version: int
+    labor_monthly: float
+    welding_cost: float
+    welding_price: float
+    consumables_rate: float
+    dc3_sell: float
+    dc3_package: float
+    dc3_cost: float
+    medical_cost: float
+    medical_sell: float
+    pm_fee_rate: float
+    iso_fee_rate: float
+    management_pct: float
+    comm_default_margin: float
+    epp_markup: float
+    epp_working_days: float
+
+
+def compile_rules(rules: Dict[str, Any], version: int = 0) -> CompiledRules:
+    """Flatten a rules dict, applying the same defaults QuotationCalculator always used."""
+    labor = rules.get("labor", {"weekly": 6489.25, "weeksMonth": 4})
+    welding = rules.get("welding", {"per10Month": {"cost": 18446.96, "price": 21213}})
+    dc3 = rules.get("dc3", {"sell": 500, "package": 1500, "cost": 100})
+    medical = rules.get("medical", {"cost": 250, "sell": 350})
+    return CompiledRules(
+        version=version,
+        labor_monthly=labor["weekly"] * labor["weeksMonth"],
+        welding_cost=welding["per10Month"]["cost"],
+        welding_price=welding["per10Month"]["price"],
+        consumables_rate=rules.get("weldingConsumablesPerWelderMonth", 3800),
+        dc3_sell=dc3["sell"],
+        dc3_package=dc3["package"],
+        dc3_cost=dc3["cost"],
+        medical_cost=medical["cost"],
+        medical_sell=medical["sell"],
+        pm_fee_rate=rules.get("platformPM", {}).get("feePerPersonMonth", 180),
+        iso_fee_rate=rules.get("iso", {}).get("feePerProjectMonth", 3500),
+        management_pct=rules.get("managementPct", 0.15),
+        comm_default_margin=rules.get("commercialization", {}).get("defaultMarginPct", 0.20),
+        epp_markup=rules.get("epp", {}).get("markupPct", 0.25),
+        epp_working_days=rules.get("epp", {}).get("workingDaysMonth", 26),
+    )
+
+
+DEFAULT_COMPILED = compile_rules(DEFAULT_RULES, version=0)
+
+
+class _RulesCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stamp: Optional[int] = None
+        self.active: Optional[CompiledRules] = None
+        self.valid_until: Optional[datetime] = None
+        # Rule sets are immutable, so compiled versions never go stale
+        self.by_version: Dict[int, CompiledRules] = {0: DEFAULT_COMPILED}
+        self.generation = 0  # bumped by clear(): loads started before it are discarded
+
+    def clear(self):
+        with self.lock:
+            self.stamp = None
+            self.active = None
+            self.valid_until = None
+            self.by_version = {0: DEFAULT_COMPILED}
+            self.generation += 1
+
+
+_cache = _RulesCache()
+
+
+def _compile_row(row: PricingRuleSet) -> CompiledRules:
+    compiled = _cache.by_version.get(row.version)
+    if compiled is None:
+        compiled = compile_rules(row.rules, version=row.version)
+        _cache.by_version[row.version] = compiled
+    return compiled
+
+
+def get_active_rules(db: Session) -> CompiledRules:
+    """Active rule set for pricing now. Costs one indexed stamp lookup when cached."""
+    stamp = get_version(db, STAMP_KEY)
+    now = datetime.utcnow()
+    active = _cache.active
+    if active is not None and _cache.stamp == stamp and (_cache.valid_until is None or now < _cache.valid_until):
+        return active
+
+    # Query without holding the lock: under AsyncSession.run_sync the query yields to
+    # the event loop, and another request on the same thread would block on it forever
+    generation = _cache.generation
+    row = (
+        db.query(PricingRuleSet)
+        .filter(PricingRuleSet.effective_from <= now)
+        .order_by(PricingRuleSet.effective_from.desc(), PricingRuleSet.version.desc())
+        .first()
+    )
+    compiled = _compile_row(row) if row else DEFAULT_COMPILED
+    # A rule set scheduled for later takes over without any write, so expire then
+    next_from = (
+        db.query(PricingRuleSet.effective_from)
+        .filter(PricingRuleSet.effective_from > now)
+        .order_by(PricingRuleSet.effective_from.asc())
+        .limit(1)
+        .scalar()
+    )
+    with _cache.lock:
+        # A concurrent load of an older stamp never replaces a newer one
+        if generation == _cache.generation and (_cache.stamp is None or stamp >= _cache.stamp):
+            _cache.active = compiled
+            _cache.stamp = stamp
+            _cache.valid_until = next_from
+    return compiled
+
+
+def get_rules_version(db: Session, version: Optional[int]) -> CompiledRules:
+    """Compiled rules of a specific version (to reprice a saved quote exactly). Quotes
+    stored before rules_version existed have NULL there and were priced with
+    DEFAULT_RULES (version 0), never with whatever is active now."""
+    if version is None:
+        version = 0
+    compiled = _cache.by_version.get(version)
+    if compiled is not None:
+        return compiled
+    row = db.query(PricingRuleSet).filter(PricingRuleSet.version == version).first()
+    if not row:
+        raise LookupError(f"Versión de reglas {version} no encontrada")
+    return _compile_row(row)
+
+
+def create_rule_set(db: Session, nombre: str, rules: Dict[str, Any], descripcion: str = None,
+                    effective_from: datetime = None, creado_por: str = "admin") -> PricingRuleSet:
+    """Store a new immutable version and bump the stamp so every worker reloads."""
+    try:
+        compiled = compile_rules(rules)
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Reglas incompletas: {e}")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in compiled[1:]):
+        raise ValueError("Todas las reglas deben ser numéricas")
+    if effective_from is not None and effective_from.tzinfo is not None:
+        effective_from = effective_from.astimezone(timezone.utc).replace(tzinfo=None)
+    effective_from = effective_from or datetime.utcnow()
+    for attempt in range(CREATE_ATTEMPTS):
+        # Bumping the stamp first locks its row, so concurrent publishers read the next
+        # version one at a time; the unique constraint + retry covers the first publish
+        # (no stamp row yet) and databases without row locks
+        bump_version(db, STAMP_KEY)
+        last = db.query(PricingRuleSet.version).order_by(PricingRuleSet.version.desc()).limit(1).scalar()
+        row = PricingRuleSet(
+            version=(last or 0) + 1,
+            nombre=nombre,
+            descripcion=descripcion,
+            rules=rules,
+            effective_from=effective_from,
+            creado_por=creado_por,
+        )
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if attempt == CREATE_ATTEMPTS - 1:
+                raise
+            continue
+        db.refresh(row)
+        return row
@@ -0,0 +1,124 @@
+# MICSA OS - Quote Computation Cache
+# Memoizes QuotationCalculator.compute by content: the key is a sha256 of the
+# normalized input plus the rule-set and EPP catalog versions, so a changed rule or
+# price can never serve a stale result. Bounded LRU in memory, optionally backed by
+# the quote_result_cache table so results survive worker restarts.
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.quote_cache import QuoteResultCache
+from app.services.calculator import QuotationCalculator
+
+
+def normalize_quote_input(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop everything compute() ignores so equivalent payloads share a key."""
+    norm = {k: v for k, v in data.items() if k not in ("assumptions", "exclusions", "peopleByRole")}
+    # Only the truncated headcount reaches the formulas, not the role breakdown
+    norm["people"] = sum(int(v) for v in data.get("peopleByRole", {}).values())
+    norm["durationMonths"] = float(data.get("durationMonths", 1))
+    for section in ("commercialization", "logistics"):
+        if not (data.get(section) or {}).get("enabled"):
+            norm[section] = {"enabled": False}
+    return norm
+
+
+def quote_cache_key(data: Dict[str, Any], rules_version: int, catalog_version: int) -> str:
+    payload = json.dumps(
+        {"input": normalize_quote_input(data), "rules": rules_version, "epp": catalog_version},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuoteResultLRU:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            result = self.data.get(key)
+            if result is not None:
+                self.data.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = result
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.data.clear()
+            self.hits = self.persistent_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.persistent_hits + self.misses
+            return {
+                "size": len(self.data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "persistentHits": self.persistent_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRate": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+                "persistent": settings.QUOTE_CACHE_PERSIST,
+            }
+
+
+quote_cache = QuoteResultLRU(settings.QUOTE_CACHE_SIZE)
+
+
+def cached_compute(db: Session, calc: QuotationCalculator, data: Dict[str, Any],
+                   catalog_version: int) -> Dict[str, Any]:
+    """calc.compute(data) through the cache. The returned dict is shared: treat it as read-only."""
+    key = quote_cache_key(data, calc.rules.version, catalog_version)
+    result = quote_cache.get(key)
+    if result is not None:
+        with quote_cache.lock:
+            quote_cache.hits += 1
+        return result
+
+    if settings.QUOTE_CACHE_PERSIST:
+        row = db.query(QuoteResultCache.result).filter(QuoteResultCache.key == key).first()
+        if row is not None:
+            quote_cache.put(key, row.result)
+            with quote_cache.lock:
+                quote_cache.persistent_hits += 1
+            return row.result
+
+    result = calc.compute(data)
+    with quote_cache.lock:
+        quote_cache.misses += 1
+    quote_cache.put(key, result)
+
+    if settings.QUOTE_CACHE_PERSIST:
+        # Savepoint: another worker may store the same key first
+        try:
+            with db.begin_nested():
+                db.add(QuoteResultCache(
+                    key=key,
+                    rules_version=calc.rules.version,
+                    catalog_version=catalog_version,
+                    result=result
+                ))
+        except IntegrityError:
+            pass
+    return result
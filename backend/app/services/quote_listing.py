@@ -0,0 +1,122 @@
+# MICSA OS - Quote Listing
+# Keyset pagination over (created_at, id) and sparse field projection: only the
+# columns behind the requested fields are SELECTed, so the JSON blobs are never read
+# unless asked for.
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from app.models.cotizacion import Cotizacion
+
+# Response field -> columns it is built from
+FIELD_COLUMNS = {
+    "id": (Cotizacion.id,),
+    "createdAt": (Cotizacion.created_at,),
+    "status": (Cotizacion.status,),
+    "projectName": (Cotizacion.nombre_proyecto,),
+    "cliente_id": (Cotizacion.cliente_id,),
+    "input_data": (Cotizacion.input_data,),
+    "clientQuote": (Cotizacion.client_quote,),
+    "internal_data": (Cotizacion.internal_data,),
+    "simulation_data": (Cotizacion.simulation_data,),
+    "rules_version": (Cotizacion.rules_version,),
+    "totals": (Cotizacion.subtotal, Cotizacion.iva, Cotizacion.total),
+}
+
+# Same shape QuoteResponse has always had
+DEFAULT_FIELDS = ("id", "createdAt", "status", "input_data", "clientQuote", "internal_data",
+                  "simulation_data", "rules_version", "totals")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    if not fields:
+        return DEFAULT_FIELDS
+    requested = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in requested if f not in FIELD_COLUMNS]
+    if unknown:
+        raise ValueError(f"Campos no soportados: {', '.join(unknown)}")
+    return requested
+
+
+def encode_cursor(created_at: datetime, quote_id: str) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, quote_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, quote_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(quote_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+
+
+def _created_key(db: Session, value=None):
+    """created_at as a comparable expression. SQLite stores server-default timestamps
+    without microseconds but binds parameters with them, so both sides are normalized."""
+    if db.bind.dialect.name == "sqlite":
+        fmt = "%Y-%m-%d %H:%M:%f"
+        if value is None:
+            return func.strftime(fmt, Cotizacion.created_at)
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return func.strftime(fmt, value.strftime("%Y-%m-%d %H:%M:%S.%f"))
+    return Cotizacion.created_at if value is None else value
+
+
+def list_quote_rows(db: Session, fields: Tuple[str, ...], limit: Optional[int], cursor: Optional[str] = None,
+                    status: Optional[str] = None, cliente_id: Optional[str] = None,
+                    desde: Optional[datetime] = None, hasta: Optional[datetime] = None
+                    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page, newest first, plus the cursor of the next page (None on the last one).
+    limit=None returns every matching row."""
+    columns = {c.key: c for f in fields for c in FIELD_COLUMNS[f]}
+    # The keyset columns are always read, even if not returned
+    columns.setdefault("id", Cotizacion.id)
+    columns.setdefault("created_at", Cotizacion.created_at)
+    labels = list(columns)
+
+    query = db.query(*columns.values())
+    if status:
+        query = query.filter(Cotizacion.status == status)
+    if cliente_id:
+        query = query.filter(Cotizacion.cliente_id == cliente_id)
+    created_key = _created_key(db)
+    if desde:
+        query = query.filter(created_key >= _created_key(db, desde))
+    if hasta:
+        query = query.filter(created_key < _created_key(db, hasta))
+    if cursor:
+        after_created, after_id = decode_cursor(cursor)
+        after_key = _created_key(db, after_created)
+        query = query.filter(or_(
+            created_key < after_key,
+            and_(created_key == after_key, Cotizacion.id < after_id),
+        ))
+
+    query = query.order_by(created_key.desc(), Cotizacion.id.desc())
+    rows = query.all() if limit is None else query.limit(limit + 1).all()
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(labels, rows[-1]))
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    items = []
+    for row in rows:
+        values = dict(zip(labels, row))
+        item = {}
+        for f in fields:
+            if f == "totals":
+                item[f] = {"subtotal": values["subtotal"], "iva": values["iva"], "total": values["total"]}
+            else:
+                item[f] = values[FIELD_COLUMNS[f][0].key]
+        items.append(item)
+    return items, next_cursor
@@ -0,0 +1,40 @@
+# MICSA OS - Incremental Quote Edits
+# Applies a partial input diff to a saved quote and reports which JSON paths of the
+# stored documents actually changed, so PATCH only rewrites (and returns) those.
+from typing import Dict, List, Any, Tuple
+
+# Sections merged key by key; anything else (including commercialization.items) is replaced
+MERGEABLE_SECTIONS = ("medical", "epp", "platformPM", "iso", "commercialization", "logistics")
+
+
+def merge_quote_input(stored: Dict[str, Any], patch: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(stored)
+    for key, value in patch.items():
+        if key in MERGEABLE_SECTIONS and isinstance(value, dict) and isinstance(stored.get(key), dict):
+            merged[key] = {**stored[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Top-level input keys whose value differs."""
+    return [k for k in new.keys() | old.keys() if old.get(k) != new.get(k)]
+
+
+def json_changes(old: Any, new: Any, path: str = "") -> List[Tuple[str, Any]]:
+    """(path, new value) for every leaf that differs; lists are compared whole."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        out = []
+        for key in new:
+            sub = f"{path}.{key}" if path else str(key)
+            if key not in old:
+                out.append((sub, new[key]))
+            else:
+                out.extend(json_changes(old[key], new[key], sub))
+        for key in old.keys() - new.keys():
+            out.append((f"{path}.{key}" if path else str(key), None))
+        return out
+    if old != new:
+        return [(path, new)]
+    return []
@@ -0,0 +1,159 @@
+# MICSA OS - Signed PDF Engine
+# When a DocumentoFirma reaches COMPLETADO the signing request only enqueues its id.
+# A dispatcher task on the app loop loads the job (thread pool), renders it in a
+# process pool (pdf_stamping.stamp_signed_pdf) and records archivo_firmado. Documents
+# left COMPLETADO without a signed file (restart, worker crash) are re-queued at startup.
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.firma_electronica import DocumentoFirma, HistorialFirma
+from app.services.blob_store import signature_blobs
+from app.services.pdf_stamping import stamp_signed_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def verify_url(documento_id: str) -> str:
+    return f"{settings.FIRMAS_VERIFY_URL.rstrip('/')}/{documento_id}"
+
+
+def signed_path(documento: DocumentoFirma) -> str:
+    return os.path.join(os.path.dirname(documento.archivo_pdf), f"{documento.id}_firmado.pdf")
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime("%Y-%m-%d %H:%M:%S UTC") if value else None
+
+
+def build_job(documento: DocumentoFirma) -> Dict[str, Any]:
+    """Everything the renderer needs, as picklable plain data."""
+    firmantes = []
+    for f in sorted(documento.firmantes, key=lambda f: (f.orden or 0, f.firmado_at or datetime.min)):
+        if f.status != "FIRMADO":
+            continue
+        firmantes.append({
+            "nombre": f.nombre,
+            "email": f.email,
+            "puesto": f.puesto,
+            "empresa": f.empresa,
+            "firma_tipo": f.firma_tipo,
+            "firmado_at": _isoformat(f.firmado_at),
+            "ip": (f.firma_metadata or {}).get("ip"),
+            "imagen": signature_blobs.get(f.firma_sha256),
+        })
+    return {
+        "documento_id": documento.id,
+        "titulo": documento.titulo,
+        "archivo_pdf": documento.archivo_pdf,
+        "archivo_sha256": documento.archivo_sha256,
+        "archivo_firmado": signed_path(documento),
+        "completado_at": _isoformat(documento.completado_at),
+        "verify_url": verify_url(documento.id),
+        "firmantes": firmantes,
+    }
+
+
+def _load_job(documento_id: str) -> Optional[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        documento = db.get(DocumentoFirma, documento_id)
+        if documento is None or documento.status != "COMPLETADO" or documento.archivo_firmado:
+            return None
+        return build_job(documento)
+    finally:
+        db.close()
+
+
+def _save_result(documento_id: str, result: Dict[str, Any]) -> None:
+    db = SessionLocal()
+    try:
+        documento = db.get(DocumentoFirma, documento_id)
+        if documento is None:
+            return
+        documento.archivo_firmado = result["path"]
+        documento.archivo_firmado_sha256 = result["sha256"]
+        db.add(HistorialFirma(
+            documento_id=documento_id,
+            accion="pdf_firmado",
+            detalles={"sha256": result["sha256"], "paginas": result["paginas"]},
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _pending_documents() -> list:
+    db = SessionLocal()
+    try:
+        return [doc_id for (doc_id,) in db.query(DocumentoFirma.id).filter(
+            DocumentoFirma.status == "COMPLETADO",
+            DocumentoFirma.archivo_firmado.is_(None),
+        )]
+    finally:
+        db.close()
+
+
+class SignedPdfEngine:
+    def __init__(self, workers: int = 2):
+        self.workers = workers
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.queued: Set[str] = set()
+        self.tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        # spawn: forking a process that already runs threads and an event loop is unsafe
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        for _ in range(self.workers):
+            self.tasks.add(asyncio.create_task(self._worker()))
+        for documento_id in await self.loop.run_in_executor(None, _pending_documents):
+            self.enqueue(documento_id)
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        self.tasks.clear()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def enqueue(self, documento_id: str) -> None:
+        """Thread-safe; duplicate requests for a queued document are ignored."""
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self._put, documento_id)
+
+    def _put(self, documento_id: str) -> None:
+        if documento_id not in self.queued:
+            self.queued.add(documento_id)
+            self.queue.put_nowait(documento_id)
+
+    async def _worker(self) -> None:
+        while True:
+            documento_id = await self.queue.get()
+            try:
+                await self.process(documento_id)
+            except Exception:
+                logger.exception("Error al generar el PDF firmado %s", documento_id)
+            finally:
+                self.queued.discard(documento_id)
+
+    async def process(self, documento_id: str) -> None:
+        job = await self.loop.run_in_executor(None, _load_job, documento_id)
+        if job is None:
+            return
+        result = await self.loop.run_in_executor(self.pool, stamp_signed_pdf, job)
+        await self.loop.run_in_executor(None, _save_result, documento_id, result)
+
+
+signed_pdf_engine = SignedPdfEngine(workers=settings.SIGNED_PDF_WORKERS)
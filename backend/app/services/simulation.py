@@ -0,0 +1,85 @@
+# MICSA OS - Monte Carlo Margin-Risk Simulation
+# The quoted price stays fixed; execution inputs (duration, headcount, welding
+# consumables, per-diem days) are drawn and pushed through the calculator formulas
+# in one vectorized pass to get the distribution of the realized margin.
+import numpy as np
+from typing import Dict, Any, Optional
+
+from app.services.batch_calculator import BatchQuotationCalculator
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+def sample(dist: Dict[str, Any], rng: np.random.Generator, n: int) -> np.ndarray:
+    """Draw `n` values from a distribution spec: fixed, uniform, triangular or normal."""
+    kind = dist.get("kind", "fixed")
+    if kind == "fixed":
+        return np.full(n, float(dist.get("value", 0.0)))
+    if kind == "uniform":
+        return rng.uniform(dist["low"], dist["high"], n)
+    if kind == "triangular":
+        low, high = dist["low"], dist["high"]
+        mode = dist.get("mode")
+        if mode is None:
+            mode = (low + high) / 2
+        if low == high:
+            return np.full(n, float(low))
+        return rng.triangular(low, mode, high, n)
+    if kind == "normal":
+        return rng.normal(dist.get("mean", 0.0), dist.get("sd", 0.0), n)
+    raise ValueError(f"Distribución no soportada: {kind}")
+
+
+def _summary(values: np.ndarray) -> Dict[str, float]:
+    pct = np.percentile(values, PERCENTILES)
+    out = {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, pct)}
+    out["mean"] = round(float(values.mean()), 2)
+    out["min"] = round(float(values.min()), 2)
+    out["max"] = round(float(values.max()), 2)
+    return out
+
+
+def simulate_margin(calc: BatchQuotationCalculator, base: Dict[str, Any], spec: Dict[str, Any],
+                    draws: int = 100_000, seed: Optional[int] = None,
+                    quoted_subtotal: Optional[float] = None) -> Dict[str, Any]:
+    """Run `draws` scenarios of `base` and return realized margin percentiles.
+
+    spec keys (all optional, each a distribution spec):
+      durationOverrunPct        fraction added to durationMonths (0.1 = +10 %)
+      headcountDriftPct         fraction added to the headcount, rounded to whole people
+      weldingConsumablesFactor  multiplier on the consumables rate per welder-month
+      perDiemDays               per-diem days actually paid (logistics only)
+    """
+    rng = np.random.default_rng(seed)
+    base_cols = calc.columns([base])
+    if quoted_subtotal is None:
+        quoted_subtotal = round(float(calc.evaluate(base_cols)["subtotal"][0]), 2)
+
+    cols = calc.columns([base])
+    overrun = sample(spec.get("durationOverrunPct") or {"kind": "fixed", "value": 0.0}, rng, draws)
+    cols.months = np.maximum(base_cols.months * (1 + overrun), 0.0)
+
+    drift = sample(spec.get("headcountDriftPct") or {"kind": "fixed", "value": 0.0}, rng, draws)
+    cols.people = np.maximum(np.rint(base_cols.people * (1 + drift)), 0).astype(np.int64)
+
+    factor = sample(spec.get("weldingConsumablesFactor") or {"kind": "fixed", "value": 1.0}, rng, draws)
+    cols.consumables_rate = base_cols.consumables_rate * np.maximum(factor, 0.0)
+
+    if spec.get("perDiemDays"):
+        cols.per_diem_days = np.maximum(np.rint(sample(spec["perDiemDays"], rng, draws)), 0.0)
+
+    res = calc.evaluate(cols)
+    real_cost = res["direct_real"]
+    gross_profit = quoted_subtotal - real_cost
+    margin_pct = gross_profit / quoted_subtotal * 100 if quoted_subtotal > 0 else np.zeros(draws)
+
+    return {
+        "draws": draws,
+        "seed": seed,
+        "quotedSubtotal": quoted_subtotal,
+        "directRealCost": _summary(real_cost),
+        "grossProfit": _summary(gross_profit),
+        "marginPct": _summary(margin_pct),
+        "probNegativeGrossProfit": round(float((gross_profit < 0).mean()), 4),
+        "assumptions": spec,
+    }
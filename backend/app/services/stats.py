@@ -0,0 +1,127 @@
+# MICSA OS - Screen Stats
+# Each stats screen is one conditional-aggregate query (SUM(CASE ...)), cached for a
+# short TTL. Commits that touch a screen's tables drop its entry right away (change
+# bus sync listener); other workers' writes are picked up when the TTL expires.
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Tuple
+from sqlalchemy import case, func, select, true
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.empleado import Empleado
+from app.models.firma_electronica import DocumentoFirma, Firmante
+from app.models.legal import ExpedienteLegal
+from app.services.change_bus import change_bus
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def compute_firma_stats(db: Session) -> Dict[str, int]:
+    """Contadores del sistema de firmas (mismos campos que DocumentoFirmaStats)"""
+    docs = select(
+        func.count(DocumentoFirma.id).label("total"),
+        _count_if(DocumentoFirma.status == "PENDIENTE").label("pendientes"),
+        _count_if(DocumentoFirma.status == "EN_PROCESO").label("en_proceso"),
+        _count_if(DocumentoFirma.status == "COMPLETADO").label("completados"),
+        _count_if(DocumentoFirma.status == "CANCELADO").label("cancelados"),
+        _count_if(DocumentoFirma.status == "EXPIRADO").label("expirados"),
+    ).subquery()
+    signers = select(
+        _count_if(Firmante.status.in_(["PENDIENTE", "NOTIFICADO"])).label("pendientes"),
+        _count_if(Firmante.status == "FIRMADO").label("completados"),
+    ).subquery()
+    # Two one-row aggregates joined on TRUE: a single round trip
+    row = db.execute(
+        select(docs, signers.c.pendientes.label("f_pendientes"), signers.c.completados.label("f_completados"))
+        .select_from(docs.join(signers, true()))
+    ).one()
+    return {
+        "total_documentos": row.total,
+        "pendientes": int(row.pendientes),
+        "en_proceso": int(row.en_proceso),
+        "completados": int(row.completados),
+        "cancelados": int(row.cancelados),
+        "expirados": int(row.expirados),
+        "firmantes_pendientes": int(row.f_pendientes),
+        "firmantes_completados": int(row.f_completados),
+    }
+
+
+def compute_empleado_stats(db: Session) -> Dict[str, int]:
+    row = db.execute(select(
+        func.count(Empleado.id).label("total"),
+        _count_if(Empleado.activo == True).label("activos"),  # noqa: E712
+        _count_if(Empleado.proyecto_id != None).label("en_proyectos"),  # noqa: E711
+        _count_if(Empleado.estatus_repse == "ROJO").label("rojo"),
+        _count_if(Empleado.estatus_repse == "AMARILLO").label("amarillo"),
+    )).one()
+    return {
+        "total_empleados": row.total,
+        "empleados_activos": int(row.activos),
+        "empleados_en_proyectos": int(row.en_proyectos),
+        "alertas_repse_rojo": int(row.rojo),
+        "alertas_repse_amarillo": int(row.amarillo),
+    }
+
+
+def compute_legal_stats(db: Session) -> Dict[str, Any]:
+    # Same semantics as before: NULL estatus counts as not closed
+    not_closed = func.coalesce(ExpedienteLegal.estatus, "") != "CERRADO"
+    row = db.execute(select(
+        func.coalesce(func.sum(case((not_closed, func.coalesce(ExpedienteLegal.monto_disputa, 0.0)), else_=0.0)), 0.0).label("exposicion"),
+        _count_if(ExpedienteLegal.estatus == "ABIERTO").label("activos"),
+        func.count(ExpedienteLegal.id).label("total"),
+    )).one()
+    return {
+        "exposicion_total": float(row.exposicion),
+        "casos_activos": int(row.activos),
+        "total_casos": row.total,
+    }
+
+
+# screen -> (loader, change bus topics that invalidate it)
+STATS_SCREENS: Dict[str, Tuple[Callable[[Session], Dict[str, Any]], Tuple[str, ...]]] = {
+    "firmas": (compute_firma_stats, ("firmas",)),
+    "empleados": (compute_empleado_stats, ("empleados",)),
+    "legal": (compute_legal_stats, ("legal",)),
+}
+
+
+class StatsCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # Bumped on invalidation so a load that raced with a write is not stored
+        self.generation: Dict[str, int] = {}
+
+    def get(self, screen: str, db: Session) -> Dict[str, Any]:
+        entry = self.entries.get(screen)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        generation = self.generation.get(screen, 0)
+        value = STATS_SCREENS[screen][0](db)
+        with self.lock:
+            if self.ttl > 0 and self.generation.get(screen, 0) == generation:
+                self.entries[screen] = (time.monotonic() + self.ttl, value)
+        return value
+
+    def invalidate(self, screens: Iterable[str]) -> None:
+        with self.lock:
+            for screen in screens:
+                self.entries.pop(screen, None)
+                self.generation[screen] = self.generation.get(screen, 0) + 1
+
+    def on_commit(self, topics) -> None:
+        self.invalidate(s for s, (_, watched) in STATS_SCREENS.items() if set(watched) & topics)
+
+
+stats_cache = StatsCache(settings.STATS_CACHE_TTL_SECONDS)
+change_bus.add_sync_listener(stats_cache.on_commit)
+
+
+def get_stats(screen: str, db: Session) -> Dict[str, Any]:
+    return stats_cache.get(screen, db)
@@ -0,0 +1,89 @@
+# MICSA OS - Quote Scenario Sweep Service
+# Evaluates a base quote over the cartesian grid of several inputs by giving each
+# swept input its own broadcast axis (no nested Python loops over the grid).
+import json
+import numpy as np
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+from app.services.batch_calculator import BatchQuotationCalculator, round2
+
+MAX_SWEEP_CELLS = 1_000_000
+
+# Sweepable inputs -> QuoteColumns field they override
+SWEEP_FIELDS = {
+    "durationMonths": "months",
+    "weldersCount": "welders",
+    "managementPct": "management_pct",
+    "eppMarkupPct": "epp_markup",
+}
+
+
+class SweepTooLarge(ValueError):
+    pass
+
+
+def check_grid_size(counts: Iterable[int]) -> int:
+    """Cells in the grid spanned by axes of these lengths; SweepTooLarge past
+    MAX_SWEEP_CELLS. Call it with SweepRange.count() before expanding any axis."""
+    cells = 1
+    for count in counts:
+        cells *= count
+        if cells > MAX_SWEEP_CELLS:
+            raise SweepTooLarge(f"La malla tiene más de {MAX_SWEEP_CELLS} escenarios")
+    return cells
+
+
+def sweep_grid(calc: BatchQuotationCalculator, base: Dict[str, Any],
+               axes: List[Tuple[str, List[float]]]) -> Dict[str, np.ndarray]:
+    """Evaluate `base` over the grid spanned by `axes`.
+
+    Axis names are the keys of SWEEP_FIELDS or "peopleByRole.<role>". Returns flat
+    columns (one value per grid cell, C order) for every axis plus the totals.
+    """
+    shape = tuple(len(values) for _, values in axes)
+    check_grid_size(shape)
+
+    def axis(pos, values, dtype):
+        view = [1] * len(shape)
+        view[pos] = -1
+        return np.asarray(values, dtype=dtype).reshape(view)
+
+    cols = calc.columns([base])
+    axis_arrays = {}
+    roles = {role: np.array(int(v)) for role, v in base.get("peopleByRole", {}).items()}
+    for pos, (name, values) in enumerate(axes):
+        if name.startswith("peopleByRole."):
+            # compute() truncates each role count with int()
+            arr = axis(pos, np.trunc(values), np.int64)
+            roles[name.split(".", 1)[1]] = arr
+        elif name == "weldersCount":
+            arr = axis(pos, np.trunc(values), np.int64)
+            setattr(cols, SWEEP_FIELDS[name], arr)
+        else:
+            arr = axis(pos, values, float)
+            setattr(cols, SWEEP_FIELDS[name], arr)
+        axis_arrays[name] = arr
+
+    people = np.array(0, dtype=np.int64)
+    for count in roles.values():
+        people = people + count
+    cols.people = people
+
+    res = calc.evaluate(cols)
+    # No axes: a single cell (the base quote); result columns are (1,), not ()
+    out_shape = shape or (1,)
+    out = {name: np.broadcast_to(arr, out_shape).ravel() for name, arr in axis_arrays.items()}
+    out["people"] = np.broadcast_to(res["people"], out_shape).ravel()
+    for key, col in (("subtotal", "subtotal"), ("total", "total"),
+                     ("grossProfit", "gross_profit"), ("marginPct", "margin_pct")):
+        out[key] = round2(np.broadcast_to(res[col], out_shape)).ravel()
+    return out
+
+
+def iter_sweep_ndjson(grid: Dict[str, np.ndarray], chunk_size: int = 5000) -> Iterator[str]:
+    """Yield the grid as NDJSON, converting one chunk of cells to Python at a time."""
+    names = list(grid.keys())
+    n = len(grid[names[0]]) if names else 0
+    for start in range(0, n, chunk_size):
+        columns = [grid[name][start:start + chunk_size].tolist() for name in names]
+        yield "".join(json.dumps(dict(zip(names, row))) + "\n" for row in zip(*columns))
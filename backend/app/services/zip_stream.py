@@ -0,0 +1,154 @@
+# MICSA OS - Streaming ZIP
+# Builds a ZIP archive while it is being sent: no temp file, constant memory, and the
+# first bytes leave as soon as the response starts. Entries are STORED (no
+# compression): compliance evidence is PDFs, images and ZIPs that do not shrink, and
+# with stored data every record's size follows from the file sizes alone, so the
+# exact Content-Length is known before reading a byte. CRC-32s are computed while
+# streaming and written in a data descriptor after each file (flag bit 3). ZIP64
+# records are added only when a size, offset or entry count exceeds the classic limits.
+import os
+import struct
+import time
+import zlib
+from typing import AsyncIterator, Iterable, List, NamedTuple, Tuple
+
+import anyio
+
+from app.services.file_delivery import CHUNK_SIZE
+
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MAX_ENTRIES = 0xFFFF
+
+FLAGS = 0x0008 | 0x0800  # data descriptor, UTF-8 names
+VERSION_STORED = 20
+VERSION_ZIP64 = 45
+
+
+class ZipMember(NamedTuple):
+    path: str
+    arcname: str
+    size: int
+    mtime: float
+
+
+def members_for(files: Iterable[Tuple[str, str]]) -> List[ZipMember]:
+    """(path, arcname) -> members, skipping missing files. Duplicate arcnames get a
+    numeric suffix."""
+    members, seen = [], set()
+    for path, arcname in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        base, ext = os.path.splitext(arcname)
+        n = 1
+        while arcname in seen:
+            n += 1
+            arcname = f"{base}_{n}{ext}"
+        seen.add(arcname)
+        members.append(ZipMember(path, arcname, stat.st_size, stat.st_mtime))
+    return members
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0, (1 << 5) | 1  # 1980-01-01 00:00
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+def _is_zip64(member: ZipMember) -> bool:
+    return member.size >= ZIP32_LIMIT
+
+
+def _local_header(member: ZipMember) -> bytes:
+    name = member.arcname.encode("utf-8")
+    dos_time, dos_date = _dos_datetime(member.mtime)
+    if _is_zip64(member):
+        # Sizes go in the descriptor; the zip64 extra tells readers it is 8-byte wide
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0)
+        version, size32 = VERSION_ZIP64, ZIP32_LIMIT
+    else:
+        extra, version, size32 = b"", VERSION_STORED, 0
+    return struct.pack(
+        "<IHHHHHIIIHH", 0x04034B50, version, FLAGS, 0, dos_time, dos_date,
+        0, size32, size32, len(name), len(extra),
+    ) + name + extra
+
+
+def _data_descriptor(member: ZipMember, crc: int) -> bytes:
+    if _is_zip64(member):
+        return struct.pack("<IIQQ", 0x08074B50, crc, member.size, member.size)
+    return struct.pack("<IIII", 0x08074B50, crc, member.size, member.size)
+
+
+def _central_entry(member: ZipMember, crc: int, offset: int) -> bytes:
+    name = member.arcname.encode("utf-8")
+    dos_time, dos_date = _dos_datetime(member.mtime)
+    zip64_fields = []
+    size32 = member.size
+    if member.size >= ZIP32_LIMIT:
+        zip64_fields += [member.size, member.size]  # uncompressed, compressed
+        size32 = ZIP32_LIMIT
+    offset32 = offset
+    if offset >= ZIP32_LIMIT:
+        zip64_fields.append(offset)
+        offset32 = ZIP32_LIMIT
+    extra = b""
+    if zip64_fields:
+        extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields)
+    version = VERSION_ZIP64 if zip64_fields or _is_zip64(member) else VERSION_STORED
+    return struct.pack(
+        "<IHHHHHHIIIHHHHHII", 0x02014B50, version, version, FLAGS, 0, dos_time, dos_date,
+        crc, size32, size32, len(name), len(extra), 0, 0, 0, 0o100644 << 16, offset32,
+    ) + name + extra
+
+
+def _end_records(entries: int, cd_offset: int, cd_size: int) -> bytes:
+    records = b""
+    if entries >= ZIP32_MAX_ENTRIES or cd_offset >= ZIP32_LIMIT or cd_size >= ZIP32_LIMIT:
+        zip64_end_offset = cd_offset + cd_size
+        records += struct.pack(
+            "<IQHHIIQQQQ", 0x06064B50, 44, VERSION_ZIP64, VERSION_ZIP64, 0, 0,
+            entries, entries, cd_size, cd_offset,
+        )
+        records += struct.pack("<IIQI", 0x07064B50, 0, zip64_end_offset, 1)
+        entries, cd_offset, cd_size = (
+            min(entries, ZIP32_MAX_ENTRIES), min(cd_offset, ZIP32_LIMIT), min(cd_size, ZIP32_LIMIT)
+        )
+    return records + struct.pack("<IHHHHIIH", 0x06054B50, 0, 0, entries, entries, cd_size, cd_offset, 0)
+
+
+def content_length(members: List[ZipMember]) -> int:
+    """Exact size of stream_zip(members): no record's length depends on the CRCs."""
+    offset, cd_size = 0, 0
+    for member in members:
+        cd_size += len(_central_entry(member, 0, offset))
+        offset += len(_local_header(member)) + member.size + len(_data_descriptor(member, 0))
+    return offset + cd_size + len(_end_records(len(members), offset, cd_size))
+
+
+async def stream_zip(members: List[ZipMember]) -> AsyncIterator[bytes]:
+    """The archive in chunks of at most CHUNK_SIZE file bytes."""
+    offset, central = 0, []
+    for member in members:
+        header = _local_header(member)
+        yield header
+        crc, remaining = 0, member.size
+        async with await anyio.open_file(member.path, "rb") as f:
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise RuntimeError(f"{member.path} se truncó durante la descarga")
+                crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                yield chunk
+        descriptor = _data_descriptor(member, crc)
+        yield descriptor
+        central.append(_central_entry(member, crc, offset))
+        offset += len(header) + member.size + len(descriptor)
+    directory = b"".join(central)
+    yield directory + _end_records(len(members), offset, len(directory))
@@ -0,0 +1 @@
+# MICSA OS - Benchmarks (run with: python -m benchmarks.run)
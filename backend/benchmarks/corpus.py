@@ -0,0 +1,86 @@
+# MICSA OS - Synthetic Quote Corpus
+# Deterministic generator of realistic QuoteCreate payloads for the benchmarks.
+import random
+from typing import Dict, List, Any
+
+from app.services.batch_calculator import EPP_KIT_SKUS
+from app.services.epp_catalog import EppEntry
+
+ROLES = ("AYUDANTE", "SOLDADOR", "PAILERO", "ELECTRICISTA", "MECANICO", "SUPERVISOR", "SEGURIDAD", "ALMACENISTA")
+LOCATIONS = ("Monterrey, NL", "Saltillo, COAH", "Monclova, COAH", "Altamira, TAMPS", "Querétaro, QRO")
+WORK_TYPES = ("Montaje", "Mantenimiento", "Paro de planta", "Obra civil", "Pailería")
+
+# Commercialization sizes the suite always covers, from none to a very large bill of materials
+COMM_SIZES = (0, 10, 100, 500, 2000)
+
+# Approximate catalog prices (MXN, IVA incluido)
+EPP_PRICES = {
+    "CASCO_MATRACA": ("Casco con matraca", "pz", 189.37),
+    "CHALECO_REF": ("Chaleco reflejante", "pz", 95.50),
+    "BARBIQUEJO_2P": ("Barbiquejo 2 puntos", "pz", 33.34),
+    "CALZADO_SEG": ("Calzado de seguridad", "par", 899.99),
+    "LENTE_BASICO": ("Lente de seguridad", "pz", 27.85),
+    "GUANTE_NITRILO": ("Guante de nitrilo", "par", 41.01),
+    "TAPON_DESECHABLE": ("Tapón auditivo desechable", "par", 3.90),
+}
+
+
+def epp_catalog() -> Dict[str, EppEntry]:
+    return {sku: EppEntry(*EPP_PRICES[sku]) for sku in EPP_KIT_SKUS}
+
+
+def comm_items(rng: random.Random, count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "description": f"Material {i}",
+            "qty": rng.choice((1, 2, 5, 10, 25, 100, 2.5)),
+            "unit": rng.choice(("pz", "m", "kg", "lote")),
+            "vendorCost": round(rng.uniform(15, 25000), 2),
+            "marginPct": rng.choice((None, None, 0.10, 0.15, 0.25, 0.30)),
+        }
+        for i in range(count)
+    ]
+
+
+def synthetic_quote(rng: random.Random, comm_lines: int = None) -> Dict[str, Any]:
+    people_by_role = {role: rng.choice((1, 2, 3, 4, 6, 8, 12, 20)) for role in rng.sample(ROLES, rng.randint(1, 6))}
+    welders = people_by_role.get("SOLDADOR", 0)
+    if comm_lines is None:
+        comm_lines = rng.choice(COMM_SIZES)
+    travel = rng.random() < 0.4
+    travel_people = rng.randint(1, sum(people_by_role.values())) if travel else 0
+    return {
+        "clientName": f"Cliente {rng.randint(1, 40)}",
+        "projectName": f"Proyecto {rng.getrandbits(32):08x}",
+        "location": rng.choice(LOCATIONS),
+        "workType": rng.choice(WORK_TYPES),
+        "durationMonths": rng.choice((0.5, 1, 2, 3, 6, 9, 12)),
+        "paymentTerms": rng.choice(("NETO 30", "NETO 15", "CONTADO")),
+        "peopleByRole": people_by_role,
+        "weldersCount": welders,
+        "dc3PeopleCount": rng.randint(0, sum(people_by_role.values())),
+        "dc3PackageCount": rng.randint(0, 3),
+        "medical": {"enabled": rng.random() < 0.9},
+        "epp": {"enabled": rng.random() < 0.85},
+        "platformPM": {"enabled": rng.random() < 0.8},
+        "iso": {"enabled": rng.random() < 0.6},
+        "commercialization": {"enabled": comm_lines > 0, "items": comm_items(rng, comm_lines)},
+        "logistics": {
+            "enabled": travel,
+            "travelPeopleCount": travel_people,
+            "peoplePerRoom": rng.choice((1, 2, 2, 3)),
+            "hotelPerNight": rng.choice((950.0, 1200.0, 1450.0)),
+            "hotelNights": rng.randint(5, 90) if travel else 0,
+            "perDiemPerDay": rng.choice((300.0, 350.0, 400.0)),
+            "perDiemDays": rng.randint(5, 90) if travel else 0,
+            "roundTripTravelPerPerson": rng.choice((3500.0, 6342.0, 8900.0)),
+        },
+        "assumptions": [],
+        "exclusions": [],
+    }
+
+
+def synthetic_corpus(size: int, seed: int = 2024) -> List[Dict[str, Any]]:
+    """Mixed corpus; commercialization sizes cycle through COMM_SIZES so every size is present."""
+    rng = random.Random(seed)
+    return [synthetic_quote(rng, COMM_SIZES[i % len(COMM_SIZES)]) for i in range(size)]
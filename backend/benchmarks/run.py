@@ -0,0 +1,232 @@
+# MICSA OS - Benchmark Runner
+"""
+Micro benchmarks of QuotationCalculator (compute, estimate_epp, price_commercialization)
+and end-to-end create_quote / list_quotes against a throwaway SQLite database.
+
+    cd backend
+    python -m benchmarks.run                  # compare against benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline  # record a new baseline (run on the deploy machine)
+    python -m benchmarks.run --quick -k compute
+
+A benchmark regresses when its median time per operation exceeds the baseline median
+by more than its threshold (the "thresholds" section of the baseline, editable by hand).
+Exit code 1 means at least one regression.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# The end-to-end benchmarks must never touch a real database: point the app at a
+# temporary SQLite file before anything under app/ reads the settings.
+_DB_DIR = tempfile.mkdtemp(prefix="micsa-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'bench.db')}"
+os.environ["DB_ECHO"] = "false"
+for _var, _value in (("SECRET_KEY", "benchmark"), ("EMPRESA_NOMBRE", "GRUPO MICSA"), ("EMPRESA_RFC", "XAXX010101000"),
+                     ("EMPRESA_DIRECCION", "N/A"), ("EMPRESA_TELEFONO", "N/A")):
+    os.environ.setdefault(_var, _value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.calculator import QuotationCalculator  # noqa: E402
+from app.services.pricing_rules import DEFAULT_RULES  # noqa: E402
+from benchmarks.corpus import COMM_SIZES, EPP_PRICES, comm_items, epp_catalog, synthetic_corpus  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allowed slowdown of the median before a benchmark counts as a regression
+DEFAULT_THRESHOLDS = {
+    "default": 0.25,
+    "api.": 0.40,  # SQLite + HTTP stack, noisier
+}
+
+
+def measure(fn, ops: int, rounds: int, warmup: int = 1):
+    """Time `rounds` runs of fn() (which performs `ops` operations); stats are µs per op."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) / ops * 1e6)
+    samples.sort()
+    return {
+        "median_us": round(statistics.median(samples), 3),
+        "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        "min_us": round(samples[0], 3),
+        "rounds": rounds,
+        "ops": ops,
+    }
+
+
+def calculator_benchmarks(quick: bool):
+    calc = QuotationCalculator(rules=DEFAULT_RULES, catalog_epp=epp_catalog())
+    rounds = 5 if quick else 15
+    per_size = 20 if quick else 100
+    corpus = synthetic_corpus(per_size * len(COMM_SIZES))
+
+    def run_compute(quotes):
+        return lambda: [calc.compute(q) for q in quotes]
+
+    yield "calc.compute[mixed]", run_compute(corpus), len(corpus), rounds
+    for i, size in enumerate(COMM_SIZES):
+        quotes = corpus[i::len(COMM_SIZES)]
+        yield f"calc.compute[comm={size}]", run_compute(quotes), len(quotes), rounds
+
+    rng = random.Random(7)
+    crews = [(rng.randint(1, 250), rng.choice((0.5, 1, 3, 6, 12))) for _ in range(500)]
+    yield "calc.estimate_epp", lambda: [calc.estimate_epp(p, m) for p, m in crews], len(crews), rounds
+
+    for size in COMM_SIZES[1:]:
+        items = comm_items(rng, size)
+        reps = max(1, 2000 // size)
+        yield f"calc.price_commercialization[{size}]", \
+            (lambda items=items, reps=reps: [calc.price_commercialization(items) for _ in range(reps)]), reps, rounds
+
+
+def api_benchmarks(quick: bool):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.quote_cache import quote_cache
+
+    client = TestClient(app)
+    client.post("/api/v1/catalog/epp/upsert", json={"items": [
+        {"sku": sku, "name": name, "unit": unit, "pricePlusIva": price}
+        for sku, (name, unit, price) in EPP_PRICES.items()
+    ]})
+
+    rounds = 3 if quick else 7
+    per_round = 20 if quick else 60
+    corpus = iter(synthetic_corpus(per_round * (rounds + 1) * 2, seed=99))
+
+    def create_round():
+        quote_cache.clear()  # measure pricing + insert, not cache hits
+        for _ in range(per_round):
+            r = client.post("/api/v1/cotizaciones/", json=next(corpus))
+            if r.status_code != 201:
+                raise RuntimeError(f"create_quote falló: {r.status_code} {r.text[:200]}")
+
+    yield "api.create_quote", create_round, per_round, rounds
+
+    # Fixed table size for the listing, independent of how many rounds ran above
+    rows = 200 if quick else 1000
+    existing, cursor = 0, None
+    while True:
+        r = client.get("/api/v1/cotizaciones/", params={"fields": "id", "limit": 500, **({"cursor": cursor} if cursor else {})})
+        existing += len(r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    rng = random.Random(5)
+    filler = synthetic_corpus(max(0, rows - existing), seed=rng.randint(0, 10**6))
+    for start in range(0, len(filler), 500):
+        client.post("/api/v1/cotizaciones/batch", json={"quotes": filler[start:start + 500]})
+
+    # Without limit/cursor the endpoint returns every row (same case as older baselines)
+    yield f"api.list_quotes[{rows}]", lambda: client.get("/api/v1/cotizaciones/"), 1, rounds
+    yield f"api.list_quotes[{rows} rows, page=50]", \
+        lambda: client.get("/api/v1/cotizaciones/", params={"limit": 50}), 1, rounds
+    yield f"api.list_quotes[{rows} rows, page=50, fields=id,status,totals]", \
+        lambda: client.get("/api/v1/cotizaciones/", params={"limit": 50, "fields": "id,status,totals"}), 1, rounds
+
+
+def threshold_for(name: str, thresholds: dict) -> float:
+    best = thresholds.get("default", DEFAULT_THRESHOLDS["default"])
+    match_len = -1
+    for prefix, value in thresholds.items():
+        if prefix != "default" and name.startswith(prefix) and len(prefix) > match_len:
+            best, match_len = value, len(prefix)
+    return best
+
+
+def compare(results: dict, baseline: dict):
+    thresholds = baseline.get("thresholds", DEFAULT_THRESHOLDS)
+    report, regressions = [], []
+    for name, res in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            report.append((name, res["median_us"], None, None, "NEW"))
+            continue
+        ratio = res["median_us"] / base["median_us"] if base["median_us"] else 1.0
+        limit = threshold_for(name, thresholds)
+        status = "REGRESSION" if ratio > 1 + limit else "ok"
+        if status == "REGRESSION":
+            regressions.append(name)
+        report.append((name, res["median_us"], base["median_us"], ratio, status))
+    return report, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del cotizador MICSA")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--quick", action="store_true", help="smaller corpus and fewer rounds")
+    parser.add_argument("-k", dest="only", help="only benchmarks whose name contains this text")
+    parser.add_argument("--no-api", action="store_true", help="skip the SQLite end-to-end benchmarks")
+    args = parser.parse_args(argv)
+
+    suites = [calculator_benchmarks(args.quick)]
+    if not args.no_api:
+        suites.append(api_benchmarks(args.quick))
+
+    results = {}
+    for suite in suites:
+        for name, fn, ops, rounds in suite:
+            if args.only and args.only not in name:
+                continue
+            results[name] = measure(fn, ops, rounds)
+            print(f"{name:<40} {results[name]['median_us']:>12.1f} µs/op  (p95 {results[name]['p95_us']:.1f})")
+
+    run = {
+        "meta": {
+            "createdAt": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "node": platform.node(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+
+    exit_code = 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report, regressions = compare(results, baseline)
+        print("\nvs baseline " + baseline.get("meta", {}).get("createdAt", "?"))
+        for name, now, base, ratio, status in report:
+            delta = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else "-"
+            print(f"{name:<40} {delta:>9}  {status}")
+        if regressions:
+            print(f"\n❌ {len(regressions)} regresión(es): {', '.join(regressions)}")
+            exit_code = 1
+        else:
+            print("\n✅ Sin regresiones")
+    elif not args.save_baseline:
+        print(f"\nNo hay baseline en {args.baseline}; usa --save-baseline para crearla")
+
+    if args.save_baseline:
+        thresholds = DEFAULT_THRESHOLDS
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                thresholds = json.load(f).get("thresholds", DEFAULT_THRESHOLDS)
+        with open(args.baseline, "w") as f:
+            json.dump({**run, "thresholds": thresholds}, f, indent=2)
+        print(f"Baseline guardada en {args.baseline}")
+        exit_code = 0
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,7 +15,7 @@ from app.core.config import settings
 
 INBOX_ROOT = "/Users/jordangonzalez/Downloads/Project Manager/micsa-os/inbox_documentos/SEIL EXPEDIENTE"
 PAGOS_FEB_DIR = os.path.join(INBOX_ROOT, "PAGOS FEB 2025 Seil. 3/MICSA")
-UPLOAD_BASE_DIR = "/Users/jordangonzalez/Downloads/Project Manager/micsa-os/docs/compliance_seil"
+UPLOAD_BASE_DIR = os.path.abspath(settings.COMPLIANCE_STORAGE_PATH)
 
 def zip_folder(folder_path, output_path):
     with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de firmas concurrentes sobre un mismo documento.
+
+Crea un documento con N firmantes directamente en la base de datos (la misma que usa
+el servidor), dispara todas las firmas contra el portal público en paralelo (más
+firmas duplicadas de algunos firmantes) y verifica que el contador, el estado y el
+historial cuadren exactamente.
+
+Uso:
+    python load_test_firmas.py --url http://localhost:8000/api/v1 --firmantes 300 --concurrencia 50
+    python load_test_firmas.py --orden --firmantes 50   # requiere_orden: reintenta hasta completar
+"""
+import argparse
+import asyncio
+import base64
+import io
+import os
+import sys
+import time
+import uuid
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from PIL import Image
+from reportlab.pdfgen import canvas
+
+from app.core.database import Base, SessionLocal, engine
+from app.models.firma_electronica import DocumentoFirma, Firmante, HistorialFirma
+
+
+def firma_png() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (120, 40), "white").save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def crear_documento(total: int, requiere_orden: bool) -> tuple:
+    """Documento de prueba con total firmantes; devuelve (id, tokens en orden)"""
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        doc_id = str(uuid.uuid4())
+        # PDF real para que el servidor pueda generar el firmado al completarse
+        archivo_pdf = os.path.abspath(os.path.join("docs", "firmas_electronicas", f"{doc_id}_original.pdf"))
+        os.makedirs(os.path.dirname(archivo_pdf), exist_ok=True)
+        pdf = canvas.Canvas(archivo_pdf)
+        pdf.drawString(72, 750, f"Documento de prueba de carga ({total} firmantes)")
+        pdf.save()
+        db.add(DocumentoFirma(
+            id=doc_id,
+            titulo=f"Prueba de carga {doc_id[:8]}",
+            archivo_pdf=archivo_pdf,
+            tipo_documento="prueba_carga",
+            status="EN_PROCESO",
+            total_firmantes=total,
+            firmantes_completados=0,
+            requiere_orden=requiere_orden
+        ))
+        tokens = []
+        for orden in range(1, total + 1):
+            token = str(uuid.uuid4())
+            tokens.append(token)
+            db.add(Firmante(
+                documento_id=doc_id,
+                nombre=f"Firmante {orden}",
+                email=f"firmante{orden}@example.com",
+                orden=orden,
+                status="NOTIFICADO",
+                token_acceso=token
+            ))
+        db.commit()
+        return doc_id, tokens
+    finally:
+        db.close()
+
+
+async def firmar(client, semaforo, url, token, firma, latencias):
+    async with semaforo:
+        inicio = time.perf_counter()
+        response = await client.post(
+            f"{url}/firmas/public/{token}/firmar",
+            json={"firma_imagen": firma, "firma_tipo": "dibujada"}
+        )
+        latencias.append(time.perf_counter() - inicio)
+        if response.headers.get("content-type", "").startswith("application/json"):
+            return token, response.status_code, response.json().get("detail")
+        return token, response.status_code, response.text[:200]
+
+
+async def disparar(url, tokens, concurrencia, firma, latencias):
+    semaforo = asyncio.Semaphore(concurrencia)
+    limits = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        return await asyncio.gather(*(firmar(client, semaforo, url, t, firma, latencias) for t in tokens))
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000
+
+
+def verificar(doc_id: str, total: int) -> list:
+    """Lista de errores de consistencia (vacía si todo cuadra)"""
+    errores = []
+    db = SessionLocal()
+    try:
+        doc = db.get(DocumentoFirma, doc_id)
+        firmantes = db.query(Firmante).filter(Firmante.documento_id == doc_id).order_by(Firmante.orden).all()
+        firmados = [f for f in firmantes if f.status == "FIRMADO"]
+        historial = db.query(HistorialFirma).filter(
+            HistorialFirma.documento_id == doc_id, HistorialFirma.accion == "firmado"
+        ).count()
+        if doc.firmantes_completados != total:
+            errores.append(f"firmantes_completados={doc.firmantes_completados}, esperado {total}")
+        if len(firmados) != total:
+            errores.append(f"{len(firmados)} firmantes en FIRMADO, esperado {total}")
+        if historial != total:
+            errores.append(f"{historial} registros 'firmado' en historial, esperado {total}")
+        if doc.status != "COMPLETADO" or not doc.completado_at:
+            errores.append(f"status={doc.status}, esperado COMPLETADO")
+    finally:
+        db.close()
+    return errores
+
+
+def limpiar(doc_id: str) -> None:
+    db = SessionLocal()
+    try:
+        # Esperar (máx. 15 s) a que el servidor genere el PDF firmado antes de borrar archivos
+        for _ in range(30):
+            doc = db.get(DocumentoFirma, doc_id)
+            if doc.archivo_firmado:
+                break
+            time.sleep(0.5)
+            db.expire_all()
+        for path in (doc.archivo_pdf, doc.archivo_firmado):
+            if path and os.path.exists(path):
+                os.remove(path)
+        db.query(HistorialFirma).filter(HistorialFirma.documento_id == doc_id).delete()
+        db.query(Firmante).filter(Firmante.documento_id == doc_id).delete()
+        db.query(DocumentoFirma).filter(DocumentoFirma.id == doc_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_test_firmas():
+    parser = argparse.ArgumentParser(description="Prueba de carga de firmas concurrentes")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--firmantes", type=int, default=300)
+    parser.add_argument("--concurrencia", type=int, default=50)
+    parser.add_argument("--duplicados", type=int, default=50, help="firmantes que firman dos veces a la vez")
+    parser.add_argument("--orden", action="store_true", help="documento con requiere_orden")
+    parser.add_argument("--conservar", action="store_true", help="no borrar el documento de prueba")
+    args = parser.parse_args()
+
+    print(f"🔧 Creando documento con {args.firmantes} firmantes...")
+    doc_id, tokens = crear_documento(args.firmantes, args.orden)
+    print(f"   - documento {doc_id}")
+
+    firma = firma_png()
+    latencias = []
+    exitosas, rechazadas, fallidas = 0, 0, []
+    pendientes = tokens + tokens[:args.duplicados]
+    orden = {token: idx for idx, token in enumerate(tokens, 1)}
+    firmados, errores_orden = set(), []
+    rondas = 0
+    inicio = time.perf_counter()
+    while pendientes:
+        rondas += 1
+        resultados = asyncio.run(disparar(args.url, pendientes, args.concurrencia, firma, latencias))
+        exitosas += sum(1 for _, code, _ in resultados if code == 200)
+        rechazadas += sum(1 for _, code, _ in resultados if code == 400)
+        fallidas += [(t, code, detail) for t, code, detail in resultados if code not in (200, 400)]
+        # Con requiere_orden, tras cada ronda los firmados deben ser exactamente 1..k
+        firmados.update(orden[t] for t, code, _ in resultados if code == 200)
+        if args.orden and firmados != set(range(1, len(firmados) + 1)):
+            errores_orden.append(f"ronda {rondas}: firmó alguien antes que sus anteriores")
+        # Con requiere_orden solo avanzan los siguientes en turno: se reintentan los que esperaban
+        pendientes = [t for t, code, detail in resultados if args.orden and code == 400 and "esperar" in (detail or "")]
+        if rondas > args.firmantes + 1:
+            break
+    duracion = time.perf_counter() - inicio
+
+    print(f"\n📊 {len(latencias)} peticiones en {duracion:.2f}s ({len(latencias) / duracion:.0f} req/s, {rondas} ronda(s))")
+    print(f"   - latencia p50 {percentil(latencias, 0.5):.0f} ms, p95 {percentil(latencias, 0.95):.0f} ms, "
+          f"máx {max(latencias) * 1000:.0f} ms")
+    print(f"   - firmas aceptadas: {exitosas}, rechazadas (400): {rechazadas}, errores: {len(fallidas)}")
+
+    errores = verificar(doc_id, args.firmantes) + errores_orden
+    if exitosas != args.firmantes:
+        errores.append(f"{exitosas} firmas aceptadas, esperado {args.firmantes}")
+    for token, code, detail in fallidas[:10]:
+        errores.append(f"HTTP {code} para {token}: {detail}")
+
+    if not args.conservar:
+        limpiar(doc_id)
+
+    if errores:
+        print("\n❌ Inconsistencias detectadas:")
+        for error in errores:
+            print(f"   - {error}")
+        sys.exit(1)
+    print("\n✅ Contador, estado e historial consistentes")
+
+
+if __name__ == "__main__":
+    load_test_firmas()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Agrega a la tabla compliance_uploads existente las columnas nuevas del modelo.
+create_all solo crea tablas que no existen; no altera las que ya están.
+Idempotente: se puede correr de nuevo sin cambios.
+
+    python migrate_compliance_uploads.py
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import Base, engine
+from app import models  # noqa: F401  (registra todas las tablas)
+from app.models.compliance import ComplianceUpload
+
+TABLE = ComplianceUpload.__table__
+# Reclamo de la subida por la petición que escribe el archivo parcial
+COLUMNS = (
+    "recibiendo_por",
+    "recibiendo_hasta",
+)
+
+
+def add_columns(conn) -> list:
+    existing = {c["name"] for c in inspect(conn).get_columns(TABLE.name)}
+    added = []
+    for name in COLUMNS:
+        if name in existing:
+            continue
+        column_type = TABLE.c[name].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {TABLE.name} ADD COLUMN {name} {column_type}"))
+        added.append(name)
+    return added
+
+
+def main():
+    print("🔧 Migrando tabla compliance_uploads...")
+    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.begin() as conn:
+            added = add_columns(conn)
+        print(f"✅ Columnas agregadas: {', '.join(added) if added else 'ninguna (ya existían)'}")
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
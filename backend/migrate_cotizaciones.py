@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Agrega a la tabla cotizaciones existente las columnas e índices nuevos del modelo.
+create_all solo crea tablas que no existen; no altera las que ya están.
+Idempotente: se puede correr de nuevo sin cambios.
+
+    python migrate_cotizaciones.py
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import Base, engine
+from app import models  # noqa: F401  (registra todas las tablas)
+from app.models.cotizacion import Cotizacion
+
+TABLE = Cotizacion.__table__
+# Columnas agregadas al modelo después de crear la tabla
+COLUMNS = (
+    "simulation_data",
+    "rules_version",
+)
+# Índices agregados al modelo (paginación por cursor sobre created_at, id)
+INDEXES = (
+    "ix_cotizaciones_created_at_id",
+)
+
+
+def add_columns(conn) -> list:
+    existing = {c["name"] for c in inspect(conn).get_columns(TABLE.name)}
+    added = []
+    for name in COLUMNS:
+        if name in existing:
+            continue
+        column_type = TABLE.c[name].type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {TABLE.name} ADD COLUMN {name} {column_type}"))
+        added.append(name)
+    return added
+
+
+def backfill(conn) -> int:
+    # Las cotizaciones anteriores a rules_version se calcularon con DEFAULT_RULES (versión 0)
+    return conn.execute(text(
+        f"UPDATE {TABLE.name} SET rules_version = 0 WHERE rules_version IS NULL"
+    )).rowcount
+
+
+def add_indexes(conn) -> list:
+    existing = {i["name"] for i in inspect(conn).get_indexes(TABLE.name)}
+    added = []
+    for index in TABLE.indexes:
+        if index.name in INDEXES and index.name not in existing:
+            index.create(conn)
+            added.append(index.name)
+    return added
+
+
+def main():
+    print("🔧 Migrando tabla cotizaciones...")
+    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.begin() as conn:
+            added = add_columns(conn)
+            filled = backfill(conn)
+            indexes = add_indexes(conn)
+        print(f"✅ Columnas agregadas: {', '.join(added) if added else 'ninguna (ya existían)'}")
+        print(f"✅ Cotizaciones con rules_version = 0 (DEFAULT_RULES): {filled}")
+        print(f"✅ Índices creados: {', '.join(indexes) if indexes else 'ninguno (ya existían)'}")
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Agrega a las tablas de firma electrónica existentes las columnas e índices nuevos
+del modelo.
+create_all solo crea tablas que no existen; no altera las que ya están.
+Idempotente: se puede correr de nuevo sin cambios.
+
+    python migrate_firmas.py
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import Base, engine
+from app import models  # noqa: F401  (registra todas las tablas)
+
+# table, column: hash sha256 del PDF original y del firmado
+COLUMNS = (
+    ("documentos_firma", "archivo_sha256"),
+    ("documentos_firma", "archivo_firmado_sha256"),
+)
+# table, index, columns
+INDEXES = (
+    # Barrido de expiración de documentos abiertos
+    ("documentos_firma", "ix_documentos_firma_status_expira_en", ("status", "expira_en")),
+    # Historial de un documento filtrado por acción
+    ("historial_firmas", "ix_historial_firmas_documento_accion", ("documento_id", "accion")),
+)
+
+
+def add_columns(conn) -> None:
+    for table, column in COLUMNS:
+        existing = {c["name"] for c in inspect(conn).get_columns(table)}
+        if column in existing:
+            continue
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} VARCHAR(64)"))
+        print(f"✅ {table}: columna {column} agregada")
+
+
+def add_indexes(conn) -> None:
+    for table, index, columns in INDEXES:
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({', '.join(columns)})"
+        ))
+        print(f"✅ {table}: índice {index}")
+
+
+def main():
+    print("🔧 Migrando tablas de firma electrónica...")
+    Base.metadata.create_all(bind=engine)
+    try:
+        with engine.begin() as conn:
+            add_columns(conn)
+            add_indexes(conn)
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Mueve las imágenes de firma en base64 (firmantes.firma_imagen y
+firma_requests.signature_base64) al blob store y deja solo el hash sha256 en la fila.
+Idempotente: se puede correr de nuevo sin duplicar blobs.
+
+    python migrate_signature_blobs.py
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+
+from app.core.database import Base, engine
+from app import models  # noqa: F401  (registra todas las tablas)
+from app.services.blob_store import decode_base64_image, signature_blobs
+
+# table, legacy base64 column, hash column
+COLUMNS = (
+    ("firmantes", "firma_imagen", "firma_sha256"),
+    ("firma_requests", "signature_base64", "signature_sha256"),
+)
+BATCH = 500
+
+
+def migrate_table(conn, table: str, legacy: str, column: str) -> int:
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} VARCHAR(64)"))
+    if legacy not in existing:
+        return 0
+
+    moved = 0
+    while True:
+        rows = conn.execute(text(
+            f"SELECT id, {legacy} FROM {table} WHERE {legacy} IS NOT NULL LIMIT {BATCH}"
+        )).all()
+        if not rows:
+            return moved
+        for row_id, value in rows:
+            try:
+                sha256 = signature_blobs.put(decode_base64_image(value))
+            except ValueError:
+                print(f"  ⚠️  {table} {row_id}: imagen inválida, se descarta")
+                sha256 = None
+            conn.execute(
+                text(f"UPDATE {table} SET {column} = :sha, {legacy} = NULL WHERE id = :id"),
+                {"sha": sha256, "id": row_id},
+            )
+            moved += 1
+
+
+def main():
+    print("🔧 Migrando imágenes de firma al blob store...")
+    Base.metadata.create_all(bind=engine)
+    try:
+        for table, legacy, column in COLUMNS:
+            with engine.begin() as conn:
+                moved = migrate_table(conn, table, legacy, column)
+            print(f"✅ {table}: {moved} imágenes movidas")
+        print(f"\n📁 Blob store: {signature_blobs.root}")
+    except Exception as e:
+        print(f"❌ Error en la migración: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Reconstruye las tablas de rollups de KPIs (kpi_quote_rollups, kpi_project_rollups)
+desde cotizaciones y proyectos. Útil tras cargas masivas o scripts que escriben sin
+pasar por SessionLocal.
+
+    python rebuild_kpi_rollups.py
+"""
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import Base, engine, SessionLocal
+from app import models  # noqa: F401  (registra todas las tablas)
+from app.services.kpi_rollups import rebuild_kpi_rollups
+
+def main():
+    print("🔧 Reconstruyendo rollups de KPIs...")
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        result = rebuild_kpi_rollups(db)
+        db.commit()
+        print(f"✅ Rollups reconstruidos: {result['quoteBuckets']} buckets de cotizaciones, "
+              f"{result['projectBuckets']} de proyectos")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Error al reconstruir rollups: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()